@@ -2,8 +2,7 @@
 
 import data_containers as dc
 import radar_plots as rplt
-
-import cProfile, pstats, io
+import profiling
 
 def main(conf_data):
     # Load Data from .mat file
@@ -96,18 +95,7 @@ def main(conf_data):
                                    lst_ref_left,lst_ref_right,lst_ref_both,
                                    selection, output_path,DGPS_xcompensation)
 
-pr = cProfile.Profile()
-pr.enable()
-
 if __name__ == "__main__":
     conf_data = dc.parse_CMDLine("./analysis.cnf")
-
-if conf_data:
-        main(conf_data)
-
-pr.disable()
-s = io.StringIO()
-sortby = 'cumulative'
-ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-ps.print_stats()
-#print (s.getvalue())
+    if conf_data:
+        profiling.run_profiled(main, conf_data)
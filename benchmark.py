@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import scipy.io as sio
+import data_containers as dc
+import track_management as tm
+import scenario_generator as sg
+
+# Data scales of the benchmark: number of MCCs, targets and mean number of clutter detections per MCC
+SCALES = {"small": {"n_mcc": 200, "n_targets": 2, "clutter_density": 2.0},
+          "medium": {"n_mcc": 1000, "n_targets": 4, "clutter_density": 4.0},
+          "large": {"n_mcc": 5000, "n_targets": 8, "clutter_density": 8.0}}
+
+# Number of MCCs processed by per-frame benchmarks
+N_FRAMES = 50
+
+# Modules of the headless tracking core and the longest time in seconds allowed for importing them
+CORE_MODULES = ("data_containers", "track_management", "tracking_filters")
+IMPORT_BUDGET = 1.0
+
+
+def _selection(mcc_tp=None):
+    return {"beam_tp": [0, 1, 2, 3],
+            "mcc_tp": mcc_tp, "x_tp": None, "y_tp": None,
+            "rng_tp": None, "vel_tp": None, "az_tp": None, "trackID_tp": None}
+
+
+def bench_load(ctx):
+    start = time.perf_counter()
+    lst_det = dc.DetectionList()
+    lst_det.append_data_from_m_file(ctx["path"], True, 1.88)
+    return time.perf_counter() - start
+
+
+def bench_select_array(ctx):
+    mcc_start = ctx["lst_det"].get_mcc_interval()[0]
+    start = time.perf_counter()
+    for i in range(mcc_start, mcc_start + N_FRAMES):
+        ctx["lst_det"].get_array_detections_selected(mcc=(i, i))
+    return time.perf_counter() - start
+
+
+def bench_select_lst(ctx):
+    mcc_start = ctx["lst_det"].get_mcc_interval()[0]
+    start = time.perf_counter()
+    for i in range(mcc_start, mcc_start + N_FRAMES):
+        ctx["lst_det"].get_lst_detections_selected(selection=_selection((i, i)))
+    return time.perf_counter() - start
+
+
+def bench_unassigned_new_detection(ctx):
+    gate = dc.Gate(beam=[], x=0, y=0, diffx=0.5, diffy=0.3, dx=0, dy=0, diffdx=0.65, diffdy=0.3,
+                   rvelocity=0, d_rvelocity=0, razimuth=0, d_razimuth=0, rrange=0, d_rrange=0)
+    lst_unassigned = dc.UnAssignedDetectionList(50.0e-3, gate)
+    mcc_start = ctx["lst_det"].get_mcc_interval()[0]
+    lst_frames = ctx["lst_det"].get_lst_detections_selected(mcc=(mcc_start, mcc_start + N_FRAMES // 5))
+    start = time.perf_counter()
+    for det in lst_frames:
+        lst_unassigned.new_detection(det)
+    return time.perf_counter() - start
+
+
+def bench_track_manager(ctx):
+    track_mgmt = tm.TrackManager(visualize=False)
+    mcc_start = ctx["lst_det"].get_mcc_interval()[0]
+    start = time.perf_counter()
+    track_mgmt.track_mcc_range(ctx["lst_det"], _selection(), mcc_start, mcc_start + N_FRAMES)
+    return time.perf_counter() - start
+
+
+def bench_kf_update(ctx, filter_type='kalman_filter'):
+    track = dc.Track(0)
+    track.init_tracker(type=filter_type, init_x=np.array([[10., 1., 5., 0.]]).T)
+    kf = track._tracker
+    zs = np.random.RandomState(1).normal(10., 1., (10 * N_FRAMES, 2, 1))
+    start = time.perf_counter()
+    for z in zs:
+        kf.predict()
+        kf.update(z)
+    return time.perf_counter() - start
+
+
+def bench_kf_update_workspace(ctx):
+    return bench_kf_update(ctx, 'workspace_kalman_filter')
+
+
+def bench_plot_selections(ctx):
+    import radar_plots as rp
+    fname = os.path.join(ctx["tmp_dir"], "plot_selections.eps")
+    start = time.perf_counter()
+    rp.static_plot_selections(ctx["lst_det"], None, _selection(), fname)
+    return time.perf_counter() - start
+
+
+def bench_end_to_end(ctx):
+    start = time.perf_counter()
+    lst_det = dc.DetectionList()
+    lst_det.append_data_from_m_file(ctx["path"], True, 1.88)
+    track_mgmt = tm.TrackManager(visualize=False)
+    mcc_start = lst_det.get_mcc_interval()[0]
+    track_mgmt.track_mcc_range(lst_det, _selection(), mcc_start, mcc_start + N_FRAMES)
+    list_of_tracks = track_mgmt.port_data("tracks_array")
+    sio.savemat(os.path.join(ctx["tmp_dir"], "tracks.mat"), {'track': list_of_tracks if list_of_tracks else []})
+    return time.perf_counter() - start
+
+
+def bench_import_core(ctx):
+    # Measured in a fresh interpreter, modules of this process are already imported
+    script = ("import sys, time; start = time.perf_counter(); import %s; elapsed = time.perf_counter() - start; "
+              "assert 'matplotlib' not in sys.modules, 'matplotlib imported by the core'; print(elapsed)"
+              % ', '.join(CORE_MODULES))
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(output.decode().split()[-1])
+
+
+def check_import_budget(results, budget=IMPORT_BUDGET):
+    """ Returns import times of the core which exceed the budget.
+
+    :param results: results of :meth:`benchmark.run_benchmarks`
+    :param budget: the longest allowed import time in seconds
+    :return: list of tuples (key, time)
+    :rtype: list
+    """
+    return [(key, elapsed) for key, elapsed in sorted(results.items())
+            if key.startswith("import_core@") and elapsed > budget]
+
+
+BENCHMARKS = {"import_core": bench_import_core,
+              "load": bench_load,
+              "select_array": bench_select_array,
+              "select_lst": bench_select_lst,
+              "unassigned_new_detection": bench_unassigned_new_detection,
+              "track_manager": bench_track_manager,
+              "kf_update": bench_kf_update,
+              "kf_update_workspace": bench_kf_update_workspace,
+              "plot_selections": bench_plot_selections,
+              "end_to_end": bench_end_to_end}
+
+
+def run_benchmarks(names, scales, repeat=3, tmp_dir=None):
+    """ Runs selected benchmarks at selected data scales. Every benchmark is repeated and the best time is kept.
+
+    :param names: names of benchmarks to run, see BENCHMARKS
+    :param scales: names of data scales, see SCALES
+    :param repeat: number of repetitions of each benchmark
+    :param tmp_dir: folder for generated data files
+    :return: dictionary of the best times in seconds keyed by 'benchmark@scale'
+    :rtype: dict
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        for scale in scales:
+            ctx = {"tmp_dir": tmp, "path": os.path.join(tmp, "scenario_%s.mat" % scale)}
+            sg.ScenarioGenerator(**SCALES[scale]).write(ctx["path"])
+            ctx["lst_det"] = dc.DetectionList()
+            ctx["lst_det"].append_data_from_m_file(ctx["path"], True, 1.88)
+            for name in names:
+                try:
+                    times = [BENCHMARKS[name](ctx) for _ in range(0, repeat)]
+                except ImportError as err:
+                    print("%-28s %-8s skipped: %s" % (name, scale, err))
+                    continue
+                results["%s@%s" % (name, scale)] = min(times)
+                print("%-28s %-8s %10.6f s" % (name, scale, min(times)))
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """ Compares benchmark results with a baseline.
+
+    :param results: results of :meth:`benchmark.run_benchmarks`
+    :param baseline: results stored as a baseline
+    :param threshold: allowed relative slow-down, i.e. 0.2 means 20 %
+    :return: list of regressions as tuples (key, baseline time, current time)
+    :rtype: list
+    """
+    regressions = []
+    for key, elapsed in sorted(results.items()):
+        if key in baseline and elapsed > baseline[key] * (1 + threshold):
+            regressions.append((key, baseline[key], elapsed))
+    return regressions
+
+
+def parse_CMDLine():
+    parser = argparse.ArgumentParser(
+        description='''
+                            Benchmark of the load - select - track - export pipeline
+                            on synthetic data of several scales.''')
+    parser.add_argument("-b", "--benchmarks", default=','.join(BENCHMARKS),
+                        help="Comma separated list of benchmarks to run, one or more from: %s" % ', '.join(BENCHMARKS))
+    parser.add_argument("-s", "--scales", default="small,medium",
+                        help="Comma separated list of data scales, one or more from: %s" % ', '.join(SCALES))
+    parser.add_argument("-n", "--repeat", type=int, default=3,
+                        help="Number of repetitions of each benchmark, the best time is kept.")
+    parser.add_argument("-o", "--output",
+                        help="Stores results into a given JSON file.")
+    parser.add_argument("--baseline",
+                        help="Compares results with a given JSON baseline file.")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Stores results as a new baseline into a file given by --baseline.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2,
+                        help="Relative slow-down against the baseline which is reported as a regression.")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET,
+                        help="The longest time in seconds allowed for importing the tracking core.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use('Agg')
+
+    argv = parse_CMDLine()
+    results = run_benchmarks(argv.benchmarks.split(','), argv.scales.split(','), argv.repeat)
+
+    over_budget = check_import_budget(results, argv.import_budget)
+    for key, elapsed in over_budget:
+        print("Import of the core %s took %.3f s, the budget is %.3f s" % (key, elapsed, argv.import_budget))
+
+    if argv.output:
+        with open(argv.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if argv.baseline and argv.save_baseline:
+        with open(argv.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Baseline stored in:", argv.baseline)
+    elif argv.baseline:
+        with open(argv.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, argv.threshold)
+        for key, base, elapsed in regressions:
+            print("Regression of %s: %.6f s -> %.6f s (%+.1f %%)" % (key, base, elapsed, 100 * (elapsed / base - 1)))
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline:", argv.baseline)
+
+    if over_budget:
+        sys.exit(1)
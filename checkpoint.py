@@ -0,0 +1,76 @@
+import os
+import gzip
+import pickle
+import logging
+
+CHECKPOINT_VERSION = 5
+
+
+class CheckpointError(Exception): pass
+
+
+def checkpoint_path(folder, scenario, mcc):
+    """ Builds a filename of the checkpoint taken at a given MCC.
+
+    :param folder: folder where checkpoints are stored, the current folder is used if None
+    :param scenario: name of the processed scenario
+    :param mcc: the MCC at which the processing will continue after the checkpoint is restored
+    :return: path to the checkpoint file
+    :rtype: str
+    """
+    fname = 'checkpoint_%s_%08d.ckpt' % (scenario, mcc)
+    return os.path.join(folder, fname) if folder else fname
+
+
+def save_checkpoint(path, mcc, track_managers, scenario=None):
+    """ Stores a snapshot of the complete tracker state into a compressed binary file.
+
+    The snapshot contains all TrackManagers together with their tracks, Kalman filters and lists of unassigned
+    detections. The file is written into a temporary file first and renamed afterwards, so an interrupted job never
+    leaves a broken checkpoint behind.
+
+    :param path: path of the checkpoint file
+    :param mcc: the MCC at which the processing has to continue after the checkpoint is restored
+    :param track_managers: dictionary of TrackManagers to store, i.e. {'LR': track_mgmt_LR}
+    :param scenario: name of the processed scenario
+    :type path: str
+    :type mcc: int
+    :type track_managers: dict
+    :type scenario: str
+    """
+    state = {"version": CHECKPOINT_VERSION,
+             "mcc": mcc,
+             "scenario": scenario,
+             "track_managers": track_managers}
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    logging.getLogger(__name__).info("save_checkpoint: tracker state at MCC %s stored in %s", mcc, path)
+
+
+def load_checkpoint(path, scenario=None, names=None):
+    """ Restores the tracker state stored by :meth:`checkpoint.save_checkpoint`.
+
+    :param path: path of the checkpoint file
+    :param scenario: when given, the checkpoint has to be taken for the same scenario
+    :param names: when given, the checkpoint has to hold TrackManagers of these names, i.e. ['LR', 'RR']
+    :return: the MCC where the processing continues and the dictionary of restored TrackManagers
+    :rtype: (int, dict)
+    """
+    with gzip.open(path, 'rb') as f:
+        state = pickle.load(f)
+
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise CheckpointError("Checkpoint %s has version %s, expected %s" %
+                              (path, state.get("version"), CHECKPOINT_VERSION))
+    if scenario and state["scenario"] and state["scenario"] != scenario:
+        raise CheckpointError("Checkpoint %s was taken for the scenario %s, not for %s" %
+                              (path, state["scenario"], scenario))
+    if names is not None and sorted(state["track_managers"]) != sorted(names):
+        raise CheckpointError("Checkpoint %s holds track managers %s, expected %s" %
+                              (path, sorted(state["track_managers"]), sorted(names)))
+
+    logging.getLogger(__name__).info("load_checkpoint: tracker state restored from %s, processing continues at MCC %s",
+                                     path, state["mcc"])
+    return state["mcc"], state["track_managers"]
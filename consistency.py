@@ -0,0 +1,166 @@
+import logging
+import numpy as np
+import stats
+
+# Kinds of monitored errors: NIS of innovations (y, S) and NEES of state errors (x - x_true, P)
+KINDS = ("nis", "nees")
+
+
+class ConsistencyMonitor(object):
+    def __init__(self, alpha=0.05, buffer_size=256):
+        """ Monitors consistency of tracking filters online. Innovations (and state errors when the truth is known)
+        are buffered and evaluated by one batched solve over all tracks once the buffer fills, only running sums per
+        track are kept afterwards. No history of covariances is stored.
+
+        .. code-block:: Python
+
+            monitor = consistency.ConsistencyMonitor()
+            track_mgmt = track_management.TrackManager(visualize=False, monitor=monitor)
+            track_mgmt.track_mcc_range(lst_det, selection, mcc_start, mcc_end)
+            print(monitor.get_summary("nis"))
+
+        :param alpha: significance level of chi-square bound checks
+        :param buffer_size: number of samples evaluated by one batched solve
+        """
+        self._alpha = alpha
+        self._buffer_size = buffer_size
+        self._bounds = {}
+        self.reset()
+
+    def reset(self):
+        """ Clears buffered samples and running sums.
+        """
+        self._pending = {kind: ([], [], []) for kind in KINDS}
+        self._dim = dict.fromkeys(KINDS)
+        # Running sums per track: number of samples, sum, sum of squares, samples out of bounds, log-likelihood
+        self._sums = {kind: {} for kind in KINDS}
+
+    def add_innovation(self, track, y, S):
+        """ Adds an innovation of one update of a Kalman filter, i.e. KalmanFilter.y and KalmanFilter.S.
+
+        :param track: key of the track, i.e. its index in the TrackManager
+        :param y: innovation (residual) vector
+        :param S: innovation covariance
+        """
+        self._add("nis", track, y, S)
+
+    def add_state_error(self, track, x_err, P):
+        """ Adds an error of a state estimate against the truth, i.e. x - x_true and KalmanFilter.P.
+        """
+        self._add("nees", track, x_err, P)
+
+    def _add(self, kind, track, error, cov):
+        # copies, filters may reuse their buffers of y and S in the next update
+        error = np.array(error, dtype=float).ravel()
+        if self._dim[kind] is None:
+            self._dim[kind] = error.size
+        elif self._dim[kind] != error.size:
+            raise ValueError("Dimension of %s samples is %s, got %s" % (kind, self._dim[kind], error.size))
+        keys, errors, covs = self._pending[kind]
+        keys.append(track)
+        errors.append(error)
+        covs.append(np.array(cov, dtype=float))
+        if len(keys) >= self._buffer_size:
+            self._flush(kind)
+
+    def _get_bounds(self, dof):
+        if dof not in self._bounds:
+            self._bounds[dof] = stats.chi2_bounds(dof, self._alpha)
+        return self._bounds[dof]
+
+    def _flush(self, kind):
+        keys, errors, covs = self._pending[kind]
+        if not keys:
+            return
+        errors = np.array(errors)
+        covs = np.array(covs, dtype=float)
+        values = stats.normalized_squared_error(errors, covs)
+        low, high = self._get_bounds(self._dim[kind])
+        outside = (values < low) | (values > high)
+        if kind == "nis":
+            sign, logdet = np.linalg.slogdet(2 * np.pi * covs)
+            log_likelihood = -0.5 * (values + logdet)
+        else:
+            log_likelihood = np.zeros(values.size)
+
+        tracks, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        sums = np.stack((np.bincount(inverse, minlength=tracks.size),
+                         np.bincount(inverse, values, tracks.size),
+                         np.bincount(inverse, values ** 2, tracks.size),
+                         np.bincount(inverse, outside, tracks.size),
+                         np.bincount(inverse, log_likelihood, tracks.size)), axis=1)
+        for track, track_sums in zip(tracks.tolist(), sums):
+            if track in self._sums[kind]:
+                self._sums[kind][track] += track_sums
+            else:
+                self._sums[kind][track] = track_sums
+        self._pending[kind] = ([], [], [])
+
+    def flush(self):
+        """ Evaluates all buffered samples.
+        """
+        for kind in KINDS:
+            self._flush(kind)
+
+    def get_track_summary(self, kind="nis"):
+        """ Summarizes every track. The mean of a consistent track lies within *bounds*, i.e. within chi-square
+        bounds of the sum of its samples divided by their number.
+
+        +--------------------+-------------------------------------------------------------------+
+        | Key                | Description                                                       |
+        +====================+===================================================================+
+        | n                  | number of samples                                                 |
+        +--------------------+-------------------------------------------------------------------+
+        | mean               | mean NIS or NEES, equals the dimension for a consistent filter    |
+        +--------------------+-------------------------------------------------------------------+
+        | std                | standard deviation of samples                                     |
+        +--------------------+-------------------------------------------------------------------+
+        | outside            | fraction of samples out of the per-sample bounds                  |
+        +--------------------+-------------------------------------------------------------------+
+        | log_likelihood     | sum of log-likelihoods of innovations, zero for NEES              |
+        +--------------------+-------------------------------------------------------------------+
+        | bounds             | bounds of the mean                                                |
+        +--------------------+-------------------------------------------------------------------+
+        | consistent         | True when the mean is within its bounds                           |
+        +--------------------+-------------------------------------------------------------------+
+
+        :param kind: 'nis' or 'nees'
+        :return: dictionaries of statistics keyed by tracks
+        :rtype: dict
+        """
+        self._flush(kind)
+        summary = {}
+        for track, (n, total, total_sq, outside, log_likelihood) in sorted(self._sums[kind].items()):
+            summary[track] = self._summarize(kind, n, total, total_sq, outside, log_likelihood)
+        return summary
+
+    def get_summary(self, kind="nis"):
+        """ Summarizes all samples of a scenario, see :meth:`consistency.ConsistencyMonitor.get_track_summary`. The
+        summary additionally holds the number of tracks and the number of consistent tracks.
+
+        :param kind: 'nis' or 'nees'
+        :rtype: dict
+        """
+        self._flush(kind)
+        if not self._sums[kind]:
+            return {"n": 0, "mean": np.nan, "std": np.nan, "outside": np.nan, "log_likelihood": 0.0,
+                    "bounds": (np.nan, np.nan), "consistent": False, "n_tracks": 0, "n_tracks_consistent": 0}
+        sums = np.sum(list(self._sums[kind].values()), axis=0)
+        summary = self._summarize(kind, *sums)
+        summary["n_tracks"] = len(self._sums[kind])
+        summary["n_tracks_consistent"] = sum(1 for elem in self.get_track_summary(kind).values()
+                                             if elem["consistent"])
+        logging.getLogger(__name__).debug("ConsistencyMonitor.get_summary: %s %s", kind, summary)
+        return summary
+
+    def _summarize(self, kind, n, total, total_sq, outside, log_likelihood):
+        dim = self._dim[kind]
+        mean = total / n
+        low, high = self._get_bounds(int(n) * dim)
+        return {"n": int(n),
+                "mean": float(mean),
+                "std": float(np.sqrt(max(total_sq / n - mean ** 2, 0.0))),
+                "outside": float(outside / n),
+                "log_likelihood": float(log_likelihood),
+                "bounds": (float(low / n), float(high / n)),
+                "consistent": bool(low / n <= mean <= high / n)}
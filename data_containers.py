@@ -1,7 +1,6 @@
 import scipy.io as sio
 import numpy as np
 import numpy.linalg as npla
-from scipy.linalg import block_diag
 import logging
 import configparser
 import argparse
@@ -9,7 +8,7 @@ import itertools
 import copy
 import heapq
 import tracking_filters as tf
-from utils import Q_discrete_white_noise
+import instrumentation as instr
 
 
 
@@ -51,6 +50,8 @@ class DetectionPoint(object):
         self._nodet = nodet_permcc
         self._trackID = trackID
 
+        # the radar is mounted at y = +-car_width/2 of the EGO frame
+        self._sensor_y = self._y_correction_dir * car_width / 2
         self._x = rng * np.cos(azimuth)
         self._y = self._y_correction_dir * (rng * np.sin(azimuth) + car_width / 2)
         self._azimuth = np.arctan(self._y/self._x)
@@ -59,6 +60,29 @@ class DetectionPoint(object):
 
 
 
+    @classmethod
+    def from_attributes(cls, mcc, beam, x, y, rng, azimuth, vel, trackID=0, left=True, nodet=0, sensor_y=0.0):
+        """ Creates a detection from already computed Cartesian and polar attributes, nothing is recalculated. This is
+        the inverse of :meth:`data_containers.DetectionList.get_array_detections` for one detection, *nodet* is the
+        number of detections of its MCC as in the radar file and *sensor_y* the y coordinate of its radar in the EGO
+        frame.
+
+        :rtype: DetectionPoint
+        """
+        detection = cls.__new__(cls)
+        detection._y_correction_dir = 1 if left else -1
+        detection._mcc = mcc
+        detection._beam = beam
+        detection._nodet = nodet
+        detection._sensor_y = sensor_y
+        detection._trackID = trackID
+        detection._x = x
+        detection._y = y
+        detection._azimuth = azimuth
+        detection._rng = rng
+        detection._vel = vel
+        return detection
+
     def set_XY (self,x,y):
         """ For an existing detection sets its *x* and *y* attributes independently. Calculated are values of azimuth and
         range.
@@ -264,7 +288,7 @@ class ReferencePoint(object):
 
 class TrackPoint(object):
     def __init__(self, mcc=0, beam=[], x=0, y=0, dx=0, dy=0,
-                 rvelocity=0, razimuth=0, rrange=0):
+                 rvelocity=0, razimuth=0, rrange=0, sensor_y=0.0):
         """ Creates a Track Point with values of its properties defined in input arguments.
          Class is derived from a python's build-in class **Object**. A creator assigns values of attributes from
          input positional arguments with defined default values.
@@ -292,6 +316,8 @@ class TrackPoint(object):
         :type rvelocity: float
         :param razimuth: an azimuth as measured by RADAR
         :type razimuth: float
+        :param sensor_y: y coordinate of the RADAR which measured the point
+        :type sensor_y: float
         """
         self.mcc = mcc
         self.x = x
@@ -302,6 +328,9 @@ class TrackPoint(object):
         self.razimuth = razimuth
         self.rrange = rrange
         self.rvelocity = rvelocity
+        self.sensor_y = sensor_y
+        # the state [x, dx, y, dy] estimated by the tracker of the track after it took the point
+        self.estimate = None
 
     def get_array(self):
         """ Returns x and y coordinates and their time derivatives in a 4-element numpy array
@@ -331,6 +360,23 @@ class TrackPoint(object):
         z = np.array([self.x, self.y])
         return z.reshape(2, 1)
 
+    def get_polar_z_array(self):
+        """ Returns radar *range*, *azimuth* and *velocity* of the point measured from the mount of its radar, as the
+        radar velocity is. The numpy array is meant to be a measurement vector **z** of polar tracking filters updated
+        with the sensor :meth:`data_containers.TrackPoint.get_sensor_array`, see
+        :meth:`tracking_filters.ExtendedKalmanFilter`.
+
+        :return: numpy array [range, azimuth, rvelocity]
+        """
+        y = self.y - self.sensor_y
+        z = np.array([np.hypot(self.x, y), np.arctan(y / self.x), self.rvelocity])
+        return z.reshape(3, 1)
+
+    def get_sensor_array(self):
+        """ Returns the position [x, y] of the radar which measured the point in the EGO frame.
+        """
+        return np.array([0.0, self.sensor_y])
+
 class Gate(object):
     def __init__(self, beam=[], x=0, y=0, diffx=0, diffy=0, dx=0, dy=0, diffdx=0, diffdy=0,
                  rvelocity=0, d_rvelocity = 0, razimuth=0, d_razimuth=0, rrange=0, d_rrange=0):
@@ -402,16 +448,25 @@ class Gate(object):
         self._rvel = detection._vel
 
     def test_detection_in_gate(self, detection, **kwargs):
-        # TODO: this function probably doesn't work correctly, needs to be verified
+        """ Tests whether the detection lies inside of the gate. Without keyword arguments *x*, *y* and the radar
+        velocity are tested, a gate of zero width in radar velocity (*d_rvelocity* = 0) leaves the velocity
+        unconstrained. Keyword arguments *x*, *y*, *rvel*, *rrng*, *raz* and *beam* select the tested properties,
+        each of them is tested against its own bounds.
+
+        :param detection: the tested detection
+        :type detection: DetectionPoint
+        :return: True if the detection is inside of the gate
+        :rtype: bool
+        """
         if kwargs:
             test_x = self._x - self._diff_x/2 < detection._x < self._x + self._diff_x/2 if 'x' in kwargs else True
             test_y = self._y - self._diff_y/2 < detection._y < self._y + self._diff_y/2 if 'y' in kwargs else True
-            test_vel = self._rvel - self._diff_rvel/2 < detection._vel < self._x + self._diff_rvel/2 \
+            test_vel = self._rvel - self._diff_rvel/2 < detection._vel < self._rvel + self._diff_rvel/2 \
                 if 'rvel' in kwargs else True
             test_rng = self._rrng - self._diff_rrng/2 < detection._rng < self._rrng + self._diff_rrng/2 \
                 if 'rrng' in kwargs else True
             test_az = self._raz - self._diff_raz/2 < detection._azimuth < self._raz + self._diff_raz/2 \
-                if 'rvel' in kwargs else True
+                if 'raz' in kwargs else True
             if 'beam' in kwargs:
                 test_beam = detection._beam in self._beam
             else:
@@ -423,24 +478,32 @@ class Gate(object):
             gate_x_max = self._x + self._diff_x/2
             gate_y_min = self._y - self._diff_y/2
             gate_y_max = self._y + self._diff_y/2
-            gate_rvel_min = self._rvel - self._diff_rvel / 2
-            gate_rvel_max = self._rvel + self._diff_rvel / 2
+            # a gate of zero width in radial velocity does not constrain it
+            if self._diff_rvel:
+                gate_rvel_min = self._rvel - self._diff_rvel / 2
+                gate_rvel_max = self._rvel + self._diff_rvel / 2
+                test_vel = gate_rvel_min < detection._vel < gate_rvel_max
+            else:
+                test_vel = True
             return  (gate_x_min < detection._x < gate_x_max) & \
                     (gate_y_min < detection._y < gate_y_max) & \
-                    (gate_rvel_min < detection._vel < gate_rvel_max)
+                    test_vel
 
     def test_trackpoint_in_gate(self, tp, **kwargs):
+        """ The same as :meth:`data_containers.Gate.test_detection_in_gate` for a track point, keyword arguments
+        *dx* and *dy* are also accepted. Without keyword arguments only *x* and *y* are tested.
+        """
         if kwargs:
             test_x = self._x - self._diff_x/2 < tp.x < self._x + self._diff_x/2 if 'x' in kwargs else True
             test_y = self._y - self._diff_y/2 < tp.y < self._y + self._diff_y/2 if 'y' in kwargs else True
             test_dx = self._dx - self._diff_dx/2 < tp.dx < self._dx + self._diff_dx/2 if 'dx' in kwargs else True
             test_dy = self._dy - self._diff_dy/2 < tp.dy < self._dy + self._diff_dy/2 if 'dy' in kwargs else True
-            test_vel = self._rvel - self._diff_rvel/2 < tp.rvelocity < self._x + self._diff_rvel/2 \
+            test_vel = self._rvel - self._diff_rvel/2 < tp.rvelocity < self._rvel + self._diff_rvel/2 \
                 if 'rvel' in kwargs else True
             test_rng = self._rrng - self._diff_rrng/2 < tp.rrange < self._rrng + self._diff_rrng/2 \
                 if 'rrng' in kwargs else True
             test_az = self._raz - self._diff_raz/2 < tp.razimuth < self._raz + self._diff_raz/2 \
-                if 'rvel' in kwargs else True
+                if 'raz' in kwargs else True
             if 'beam' in kwargs:
                 test_beam = tp.beam in self._beam
             else:
@@ -456,14 +519,16 @@ class Gate(object):
                     (gate_y_min < tp.y < gate_y_max)
 
     def get_detection_dist_from_center(self, detection):
-        c = np.array([self._x,self._y])
+        # centres of gates of tracks are set from states of shape (1,)
+        c = np.ravel([self._x, self._y]).astype(float)
         d = np.array([detection._x, detection._y])
         diff = np.array([self._diff_x, self._diff_y])
         aim = (npla.norm(diff) - npla.norm(c-d)) / npla.norm(diff)
         return aim
 
     def get_trackpoint_dist_from_center(self, tp):
-        c = np.array([self._x,self._y])
+        # centres of gates of tracks are set from states of shape (1,)
+        c = np.ravel([self._x, self._y]).astype(float)
         d = np.array([tp.x, tp.y])
         diff = np.array([self._diff_x, self._diff_y])
         aim = (npla.norm(diff) - npla.norm(c-d)) / npla.norm(diff)
@@ -475,6 +540,63 @@ class Gate(object):
 
 
 
+# Attributes of DetectionPoint keyed by the names used in arrays of detections
+DETECTION_ATTRIBUTES = {"x": "_x", "y": "_y", "rvelocity": "_vel", "razimuth": "_azimuth", "range": "_rng",
+                        "beam": "_beam", "mcc": "_mcc", "trackID": "_trackID"}
+
+
+def detection_histogram(mcc, beam, mcc_interval=None, n_beams=4):
+    """ Counts detections per MCC and per beam in one pass. Detections do not need to be sorted.
+
+    +-----------------+-------------------------------------------------------------------------------------+
+    | Key             | Description                                                                         |
+    +=================+=====================================================================================+
+    | mcc             | MCCs of the interval, (n_mcc,)                                                      |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | counts          | number of detections per MCC, (n_mcc,)                                              |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | counts_per_beam | number of detections per MCC and beam, (n_mcc, n_beams)                             |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | offsets         | detections of the i-th MCC are order[offsets[i]:offsets[i+1]], (n_mcc+1,)           |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | order           | indices of detections sorted by MCC (stable), only detections within the interval   |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | max, max_at     | the largest number of detections in one MCC and the first MCC where it occurs       |
+    +-----------------+-------------------------------------------------------------------------------------+
+    | max_per_beam    | the largest number of detections in one MCC for every beam, (n_beams,)              |
+    +-----------------+-------------------------------------------------------------------------------------+
+
+    :param mcc: MCCs of detections
+    :param beam: beams of detections
+    :param mcc_interval: closed interval of MCCs to count, the interval of *mcc* is used if None
+    :param n_beams: number of beams
+    :return: dictionary of counts, see the table
+    :rtype: dict
+    """
+    mcc = np.asarray(mcc, dtype=np.int64)
+    beam = np.asarray(beam, dtype=np.int64)
+    if mcc_interval is None:
+        mcc_interval = (int(mcc.min()), int(mcc.max())) if mcc.size else (0, -1)
+    n_mcc = max(int(mcc_interval[1]) - int(mcc_interval[0]) + 1, 0)
+
+    inside = np.flatnonzero((mcc_interval[0] <= mcc) & (mcc <= mcc_interval[1]))
+    idx = mcc[inside] - mcc_interval[0]
+    counts_per_beam = np.bincount(idx * n_beams + beam[inside], minlength=n_mcc * n_beams).reshape(n_mcc, n_beams)
+    counts = counts_per_beam.sum(axis=1)
+    offsets = np.zeros(n_mcc + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    histogram = {"mcc": np.arange(mcc_interval[0], mcc_interval[0] + n_mcc),
+                 "counts": counts,
+                 "counts_per_beam": counts_per_beam,
+                 "offsets": offsets,
+                 "order": inside[np.argsort(idx, kind='stable')],
+                 "max": int(counts.max()) if n_mcc else 0,
+                 "max_at": int(mcc_interval[0] + np.argmax(counts)) if n_mcc else None,
+                 "max_per_beam": counts_per_beam.max(axis=0) if n_mcc else np.zeros(n_beams, dtype=np.int64)}
+    return histogram
+
+
 class DetectionList(list):
     def __init__(self):
         super().__init__()
@@ -487,25 +609,52 @@ class DetectionList(list):
         self._trackID_interval = (0, 0)
         logging.getLogger(__name__).debug("DetectionList.__init__: list initialized")
 
+    @classmethod
+    def from_arrays(cls, radar_data):
+        """ Builds a list of detections from arrays with the layout of :meth:`data_containers.DetectionList.get_array_detections`.
+        An optional boolean array *left* marks detections of the left radar, all detections are left ones without it.
+        An optional array *nodet* holds numbers of detections per MCC of the radar file and an optional array
+        *sensor_y* y coordinates of radars in the EGO frame, zeros are used without them.
+
+        :param radar_data: dictionary of arrays of detections
+        :return: the list of detections
+        :rtype: DetectionList
+        """
+        lst_det = cls()
+        n = len(radar_data["mcc"])
+        left = radar_data["left"].tolist() if "left" in radar_data else [True] * n
+        nodet = radar_data["nodet"].tolist() if "nodet" in radar_data else [0] * n
+        sensor_y = radar_data["sensor_y"].tolist() if "sensor_y" in radar_data else [0.0] * n
+        for attributes in zip(radar_data["mcc"].tolist(), radar_data["beam"].tolist(), radar_data["x"].tolist(),
+                              radar_data["y"].tolist(), radar_data["range"].tolist(),
+                              radar_data["razimuth"].tolist(), radar_data["rvelocity"].tolist(),
+                              radar_data["trackID"].tolist(), left, nodet, sensor_y):
+            lst_det.append(DetectionPoint.from_attributes(*attributes))
+        if lst_det:
+            lst_det.calculate_intervals()
+        return lst_det
+
     def append_detection(self, detection_point):
         self.append(detection_point)
         self.calculate_intervals()
 
     def append_data_from_m_file(self, data_path, left, car_width):
-        radar_data = sio.loadmat(data_path)
-        detections = radar_data["Detections"]
-        no_d = len(detections)
-        for itr in range(0, no_d - 1):
-            self.append(DetectionPoint(mcc=int(detections[itr, 0]),
-                                       beam=int(detections[itr, 2]),
-                                       nodet_permcc=int(detections[itr, 3]),
-                                       trackID=0,
-                                       rng=float(detections[itr, 5]),
-                                       vel=float(detections[itr, 6]),
-                                       azimuth=float(detections[itr, 7]),
-                                       left=bool(left),
-                                       car_width=float(car_width)))
-        self.calculate_intervals()
+        with instr.timer("load"):
+            radar_data = sio.loadmat(data_path)
+            detections = radar_data["Detections"]
+            no_d = len(detections)
+            for itr in range(0, no_d - 1):
+                self.append(DetectionPoint(mcc=int(detections[itr, 0]),
+                                           beam=int(detections[itr, 2]),
+                                           nodet_permcc=int(detections[itr, 3]),
+                                           trackID=0,
+                                           rng=float(detections[itr, 5]),
+                                           vel=float(detections[itr, 6]),
+                                           azimuth=float(detections[itr, 7]),
+                                           left=bool(left),
+                                           car_width=float(car_width)))
+            self.calculate_intervals()
+        instr.count("detections_loaded", no_d - 1)
         logging.getLogger(__name__).debug("DetectionList.append_data_from_m_file: points appended = %s", no_d)
 
     def calculate_intervals(self):
@@ -521,10 +670,69 @@ class DetectionList(list):
     def get_mcc_interval(self):
         return self._mcc_interval
 
+    def get_detection_histogram(self, mcc=None):
+        """ Counts detections of the list per MCC and per beam, see :meth:`data_containers.detection_histogram`.
+
+        :param mcc: closed interval of MCCs to count, the whole list is counted if None
+        :return: dictionary of counts, maxima and offsets
+        :rtype: dict
+        """
+        mcc_sel = np.fromiter((elem._mcc for elem in self), dtype=np.int64, count=len(self))
+        beam_sel = np.fromiter((elem._beam for elem in self), dtype=np.int64, count=len(self))
+        return detection_histogram(mcc_sel, beam_sel, mcc)
+
     def get_max_of_detections_per_mcc(self):
-        max_detections_at = max([elem._mcc for elem in self], key=[elem._mcc for elem in self].count)
-        max_no_detections = [elem._mcc for elem in self].count(max_detections_at)
-        return max_no_detections, max_detections_at
+        histogram = self.get_detection_histogram()
+        return histogram["max"], histogram["max_at"]
+
+    def get_detection_tensor(self, channels=("x", "y"), mcc=None, min_slots=20, path=None, chunk_mcc=10000):
+        """ Builds a dense tensor of detections with the shape (len(channels), m, n_mcc). Detections of the i-th MCC
+        of the interval occupy slots 0..k-1 of the column [:, :, i], remaining slots are NaN. The number of slots *m* is
+        the largest number of detections in one MCC, but at least *min_slots*.
+
+        Detections are sorted by MCC once and scattered into the tensor in one vectorized pass per chunk of MCCs.
+        When *path* is given, the tensor is streamed into a .npy file chunk by chunk and a read-only memory map of
+        the file is returned, so the whole tensor never has to fit into memory.
+
+        :param channels: keys of :meth:`data_containers.DetectionList.get_array_detections` stored in the tensor,
+                         i.e. "x", "y", "rvelocity", "razimuth", "range", "beam"
+        :param mcc: closed interval of MCCs, the whole list is used if None
+        :param min_slots: the smallest number of slots per MCC
+        :param path: path of a .npy file the tensor is streamed into, the tensor is kept in memory if None
+        :param chunk_mcc: number of MCCs written at once when streaming
+        :return: the tensor
+        :rtype: numpy.array or numpy.memmap
+        """
+        histogram = self.get_detection_histogram(mcc)
+        order = histogram["order"]
+        offsets = histogram["offsets"]
+        n_mcc = histogram["mcc"].size
+        m = max(histogram["max"], min_slots)
+
+        values = np.empty((len(channels), order.size))
+        for c, channel in enumerate(channels):
+            attribute = DETECTION_ATTRIBUTES[channel]
+            values[c] = np.fromiter((getattr(self[n], attribute) for n in order), dtype=float, count=order.size)
+        column = np.repeat(np.arange(n_mcc), histogram["counts"])
+        slot = np.arange(order.size) - offsets[column]
+
+        if path is None:
+            tensor = np.full((len(channels), m, n_mcc), np.nan)
+            tensor[:, slot, column] = values
+            return tensor
+
+        tensor = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(len(channels), m, n_mcc))
+        for i in range(0, n_mcc, chunk_mcc):
+            j = min(i + chunk_mcc, n_mcc)
+            block = np.full((len(channels), m, j - i), np.nan)
+            d = slice(offsets[i], offsets[j])
+            block[:, slot[d], column[d] - i] = values[:, d]
+            tensor[:, :, i:j] = block
+        tensor.flush()
+        del tensor
+        logging.getLogger(__name__).debug("DetectionList.get_detection_tensor: tensor of %s MCCs streamed into %s",
+                                          n_mcc, path)
+        return np.load(path, mmap_mode='r')
 
     def get_array_detections_selected(self, **kwarg):
         if 'beam' in kwarg:
@@ -674,6 +882,77 @@ class DetectionList(list):
                       "mcc": np.array(mcc_sel)}
         return radar_data
 
+    def describe(self, by='beam', columns=("rvelocity", "razimuth", "range", "x", "y"), selection=None,
+                 mcc_bucket=100):
+        """ Computes count, min, max and mean of selected columns for every group of detections in one vectorized
+        pass. Detections are grouped by
+
+        +---------+-----------------------------------------------------------------------------+
+        | by      | Group key                                                                   |
+        +=========+=============================================================================+
+        | beam    | the beam of a detection                                                     |
+        +---------+-----------------------------------------------------------------------------+
+        | radar   | 'L' for detections of the left radar, 'R' for the right one                 |
+        +---------+-----------------------------------------------------------------------------+
+        | mcc     | the first MCC of a bucket of *mcc_bucket* consecutive MCCs                  |
+        +---------+-----------------------------------------------------------------------------+
+        | trackID | the ID of the track the detection has been assigned to                      |
+        +---------+-----------------------------------------------------------------------------+
+
+        .. code-block:: Python
+
+            stats = lst_det.describe(by='beam')
+            stats[0]["rvelocity"]["max"]
+
+        :param by: the grouping key, see the table
+        :param columns: keys of :meth:`data_containers.DetectionList.get_array_detections` to describe
+        :param selection: a selection structure, only detections within it are described, None entries are not
+                          constrained
+        :param mcc_bucket: number of MCCs in one bucket when grouped by MCC
+        :return: dictionary keyed by groups, each group holds 'count' and a dictionary with keys 'min', 'max' and
+                 'mean' for every column
+        :rtype: dict
+        """
+        data = self.get_array_detections()
+        if by == 'radar':
+            left = np.fromiter((elem._y_correction_dir > 0 for elem in self), dtype=bool, count=len(self))
+            data["radar"] = np.where(left, 'L', 'R')
+        if selection:
+            intervals = (("mcc", "mcc_tp"), ("x", "x_tp"), ("y", "y_tp"), ("range", "rng_tp"),
+                         ("rvelocity", "vel_tp"), ("razimuth", "az_tp"), ("trackID", "trackID_tp"))
+            keep = np.ones(len(self), dtype=bool)
+            if selection.get("beam_tp"):
+                keep &= np.isin(data["beam"], selection["beam_tp"])
+            for key, key_tp in intervals:
+                if selection.get(key_tp):
+                    keep &= (selection[key_tp][0] <= data[key]) & (data[key] <= selection[key_tp][1])
+            data = {key: value[keep] for key, value in data.items()}
+
+        if by == 'mcc':
+            mcc_start = self._mcc_interval[0]
+            keys = mcc_start + (data["mcc"] - mcc_start) // mcc_bucket * mcc_bucket
+        elif by in ('beam', 'radar', 'trackID'):
+            keys = data[by]
+        else:
+            raise ValueError("Detections cannot be grouped by %s, use beam, radar, mcc or trackID" % by)
+
+        stats = {}
+        if not keys.size:
+            return stats
+        order = np.argsort(keys, kind='stable')
+        groups, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        for group, count in zip(groups, counts):
+            stats[group.item()] = {"count": int(count)}
+        for column in columns:
+            values = data[column][order].astype(float)
+            minima = np.minimum.reduceat(values, starts)
+            maxima = np.maximum.reduceat(values, starts)
+            means = np.add.reduceat(values, starts) / counts
+            for n, group in enumerate(groups):
+                stats[group.item()][column] = {"min": float(minima[n]), "max": float(maxima[n]),
+                                               "mean": float(means[n])}
+        return stats
+
     def get_lst_detections_selected(self, **kwarg):
         if 'beam' in kwarg:
             beam = kwarg['beam']
@@ -727,16 +1006,18 @@ class DetectionList(list):
 
         lst_selected_detection = DetectionList()
 
-        for elem in self:
-            if (elem._beam in beam and
-                            mcc_i[0] <= elem._mcc <= mcc_i[1] and
-                            trackID_i[0] <= elem._trackID <= trackID_i[1] and
-                            x_i[0] <= elem._x <= x_i[1] and
-                            y_i[0] <= elem._y <= y_i[1] and
-                            rng_i[0] <= elem._rng <= rng_i[1] and
-                            vel_i[0] <= elem._vel <= vel_i[1] and
-                            az_i[0] <= elem._azimuth <= az_i[1]):
-                lst_selected_detection.append(elem)
+        with instr.timer("select"):
+            for elem in self:
+                if (elem._beam in beam and
+                                mcc_i[0] <= elem._mcc <= mcc_i[1] and
+                                trackID_i[0] <= elem._trackID <= trackID_i[1] and
+                                x_i[0] <= elem._x <= x_i[1] and
+                                y_i[0] <= elem._y <= y_i[1] and
+                                rng_i[0] <= elem._rng <= rng_i[1] and
+                                vel_i[0] <= elem._vel <= vel_i[1] and
+                                az_i[0] <= elem._azimuth <= az_i[1]):
+                    lst_selected_detection.append(elem)
+        instr.count("detections_selected", len(lst_selected_detection))
 
         if lst_selected_detection:
             logging.getLogger(__name__).debug("DetectionList.get_lst_detections_selected: number of detections selected is %s MCCs from %s to %s",
@@ -810,8 +1091,108 @@ class DetectionList(list):
         self._mcc_interval = (min([elem._mcc for elem in self]), max([elem._mcc for elem in self]))
 
 
+class RaggedDetections(object):
+    def __init__(self, mcc_start, offsets, columns):
+        """ Stores detections of consecutive MCCs in a compressed sparse row layout. Every column holds values of all
+        detections sorted by MCC, detections of the i-th MCC are at positions offsets[i]:offsets[i+1]. Unlike the
+        dense NaN-padded tensor the layout has no padding, and detections of any MCC are accessed in O(1).
+
+        :param mcc_start: the first MCC
+        :param offsets: offsets of MCCs into columns, (n_mcc + 1,)
+        :param columns: dictionary of flat columns, i.e. {'x': ..., 'y': ...}
+        :type mcc_start: int
+        :type offsets: numpy.array
+        :type columns: dict
+        """
+        self._mcc_start = int(mcc_start)
+        self._offsets = np.asarray(offsets, dtype=np.int64).ravel()
+        self._columns = {key: np.asarray(value).ravel() for key, value in columns.items()}
+
+    @classmethod
+    def from_detection_list(cls, lst_det, channels=("x", "y"), mcc=None):
+        """ Builds the ragged layout from a list of detections.
+
+        :param lst_det: list of detections
+        :param channels: keys of :meth:`data_containers.DetectionList.get_array_detections` to store
+        :param mcc: closed interval of MCCs, the whole list is used if None
+        :type lst_det: DetectionList
+        :return: detections in the ragged layout
+        :rtype: RaggedDetections
+        """
+        histogram = lst_det.get_detection_histogram(mcc)
+        order = histogram["order"]
+        columns = {}
+        for channel in channels:
+            dtype = float if channel in ("x", "y", "rvelocity", "razimuth", "range") else np.int64
+            columns[channel] = np.fromiter((getattr(lst_det[n], DETECTION_ATTRIBUTES[channel]) for n in order),
+                                           dtype=dtype, count=order.size)
+        mcc_start = histogram["mcc"][0] if histogram["mcc"].size else 0
+        return cls(mcc_start, histogram["offsets"], columns)
+
+    def __len__(self):
+        return self._offsets.size - 1
+
+    def get_mcc_interval(self):
+        return self._mcc_start, self._mcc_start + len(self) - 1
+
+    def get_counts(self):
+        return np.diff(self._offsets)
+
+    def get_columns(self):
+        return self._columns
+
+    def get_mcc(self, mcc):
+        """ Returns detections of one MCC as views into the flat columns.
+
+        :param mcc: the MCC
+        :type mcc: int
+        :return: dictionary of arrays keyed by column names, empty arrays if the MCC is out of the stored interval
+        :rtype: dict
+        """
+        i = mcc - self._mcc_start
+        if not 0 <= i < len(self):
+            return {key: value[0:0] for key, value in self._columns.items()}
+        d = slice(self._offsets[i], self._offsets[i + 1])
+        return {key: value[d] for key, value in self._columns.items()}
+
+    def save(self, path):
+        """ Stores the detections into a .mat file (MATLAB) or a .npz file according to the extension of *path*.
+        Offsets are zero based, detections of the i-th MCC (counted from 1) in MATLAB are at
+        offsets(i)+1:offsets(i+1).
+
+        :param path: path of the output file
+        """
+        data = dict(self._columns)
+        data["mcc_start"] = self._mcc_start
+        data["offsets"] = self._offsets
+        if path.endswith('.npz'):
+            data["columns"] = np.array(sorted(self._columns))
+            np.savez(path, **data)
+        else:
+            data["columns"] = np.array(sorted(self._columns), dtype=object)
+            sio.savemat(path, data)
+        logging.getLogger(__name__).debug("RaggedDetections.save: %s detections of %s MCCs stored in %s",
+                                          self._offsets[-1], len(self), path)
+
+    @classmethod
+    def load(cls, path):
+        """ Loads detections stored by :meth:`data_containers.RaggedDetections.save`.
+
+        :param path: path of a .mat or a .npz file
+        :return: detections in the ragged layout
+        :rtype: RaggedDetections
+        """
+        if path.endswith('.npz'):
+            with np.load(path) as data:
+                names = [str(name) for name in data["columns"]]
+                return cls(int(data["mcc_start"]), data["offsets"], {name: data[name] for name in names})
+        data = sio.loadmat(path)
+        names = [str(np.ravel(name)[0]) for name in np.ravel(data["columns"])]
+        return cls(int(np.ravel(data["mcc_start"])[0]), data["offsets"], {name: data[name] for name in names})
+
+
 class UnAssignedDetectionList(DetectionList):
-    def __init__(self, Tsampling, gate):
+    def __init__(self, Tsampling, gate, track_gate=None, projection_dist=2, projection_vel=.2):
         """
         Creates a new list of unassigned detections. Class is derived from a build-in class **List**. Sets dimensions
         of a gate which will be used when deciding whether or not the detection fits the estimated position and a new
@@ -819,12 +1200,21 @@ class UnAssignedDetectionList(DetectionList):
 
         :param Tsampling: Sampling period of the radar
         :param gate: Pattern defining dimensions of the decision-gate, center-values are zeroized, assigned are dimensions only.
+        :param track_gate: Pattern of the gate of newly created tracks, see :meth:`data_containers.Track`
+        :param projection_dist: the largest distance of two detections which can be projected
+        :param projection_vel: the largest difference of radar velocities of two detections which can be projected
 
         :type Tsampling: float
         :type gate: Gate
+        :type track_gate: Gate
+        :type projection_dist: float
+        :type projection_vel: float
         """
         super().__init__()
         self._Tsampling = Tsampling
+        self._track_gate = track_gate
+        self._projection_dist = projection_dist
+        self._projection_vel = projection_vel
         self._lst_tracks_possible = []
         self._gate = Gate(beam=[], x=0, y=0, diffx=gate._diff_x, diffy=gate._diff_y, dx=0, dy=0,
                           diffdx=0, diffdy=0, rvelocity=0, d_rvelocity = gate._diff_rvel, razimuth=0,
@@ -848,7 +1238,7 @@ class UnAssignedDetectionList(DetectionList):
         :rtype: DetectionPoint
         """
 
-        if det2.test_in_range_of (det1,dist=2,vel=.2,mcc='newer'):
+        if det2.test_in_range_of(det1, dist=self._projection_dist, vel=self._projection_vel, mcc='newer'):
             projected_point = DetectionPoint()
             x = 2 * det2._x - det1._x
             y = 2 * det2._y - det1._y
@@ -913,7 +1303,9 @@ class UnAssignedDetectionList(DetectionList):
 
     def new_detection(self, detection):
         """
-        Tests whether or not the list of unassigned detections can form a new track.
+        Tests whether or not the list of unassigned detections can form a new track. A track is started from the
+        best projection of two unassigned detections which has the *detection* inside of its gate, see
+        :meth:`data_containers.UnAssignedDetectionList.test_det_in_gate_3points`.
 
         :param detection: The detection which is going to be tested.
         :type detection: DetectionPoint
@@ -923,6 +1315,7 @@ class UnAssignedDetectionList(DetectionList):
         logger.debug("\t at x: %s, y: %s", detection._x, detection._y)
         aim = []
         if len(self)>1:
+            instr.count("permutations", len(self) * (len(self) - 1))
             for det1, det2 in itertools.permutations(self,2):
                 logger.debug("UnAssignedDetectionList.new_detection: number of unassigned detections in a list: %s ",
                              len(self))
@@ -930,7 +1323,7 @@ class UnAssignedDetectionList(DetectionList):
                 logger.debug("\t\t\t\t\t det1 x: %s, y: %s", det1._x, det1._y)
                 logger.debug("\t\t\t\t\t det2 x: %s, y: %s", det2._x, det2._y)
                 tri_combined = self.test_det_in_gate_3points(detection, det1, det2)
-                if tri_combined:
+                if tri_combined and tri_combined['dist'] > 0:
                     aim.append(tri_combined)
                     logger.debug("\t Detection is in a gate with distance %s.", aim[-1]['dist'])
                 else:
@@ -940,7 +1333,7 @@ class UnAssignedDetectionList(DetectionList):
                 logger.debug("\t\t\tThere is %s combinations where detection fit in a gate.",len(aim))
                 max_aim = heapq.nlargest(1, aim, key=lambda s: s['dist'])
                 logger.debug("\t maximum distance is %s.", max_aim[0]['dist'])
-                new_track = Track(45)
+                new_track = Track(45, self._track_gate)
                 new_track.append_detection(max_aim[0]['det1'])
                 new_track.append_detection(max_aim[0]['det2'])
                 new_track.append_detection(max_aim[0]['det3'])
@@ -984,7 +1377,8 @@ class ReferenceList(list):
         self._mccR_interval = (0, 0)
 
     def append_from_m_file(self, data_path):
-        DGPS_data = sio.loadmat(data_path)
+        # Fields are flattened, scalars are read from row and column vectors alike
+        DGPS_data = {key: np.ravel(value) for key, value in sio.loadmat(data_path).items() if not key.startswith('__')}
         no_dL = len(DGPS_data["MCC_LeftRadar"])
         no_dR = len(DGPS_data["MCC_RightRadar"])
         no_d = max(no_dL, no_dR)
@@ -1011,6 +1405,25 @@ class ReferenceList(list):
         self._mccL_interval = (min([elem._mccL for elem in self]), max([elem._mccL for elem in self]))
         self._mccR_interval = (min([elem._mccR for elem in self]), max([elem._mccR for elem in self]))
 
+    @classmethod
+    def from_arrays(cls, DGPS_data):
+        """ Builds a list of references from arrays with the layout of
+        :meth:`data_containers.ReferenceList.get_array_references_selected`.
+
+        :param DGPS_data: dictionary of arrays of references
+        :return: the list of references
+        :rtype: ReferenceList
+        """
+        lst_ref = cls()
+        keys = ("mccL", "mccR", "TAR_dist", "TAR_distX", "TAR_distY", "TAR_velX", "TAR_velY", "TAR_hdg",
+                "EGO_velX", "EGO_velY", "EGO_accX", "EGO_accY", "EGO_hdg")
+        for attributes in zip(*[DGPS_data[key].tolist() for key in keys]):
+            lst_ref.append(ReferencePoint(*attributes))
+        if lst_ref:
+            lst_ref._mccL_interval = (int(DGPS_data["mccL"].min()), int(DGPS_data["mccL"].max()))
+            lst_ref._mccR_interval = (int(DGPS_data["mccR"].min()), int(DGPS_data["mccR"].max()))
+        return lst_ref
+
     def get_mccL_interval(self):
         return self._mccL_interval
 
@@ -1083,18 +1496,26 @@ class ReferenceList(list):
 
 
 class Track(list):
-    def __init__(self, trackID):
+    def __init__(self, trackID, gate=None):
         """
         Class Track is derived from a pyhon's build-in List. Contains TrackPoints objects :meth:`data_containers.TrackPoint`.
         Attribute *_active* indicates current status of the track.
 
         :param trackID: Identification number of the track
+        :param gate: Pattern defining dimensions of the predicted gate, a gate of 2 x 2 m is used if None
         :type trackID: int
+        :type gate: Gate
         """
         super().__init__()
         self._tracker = None
-        self._predicted_gate = Gate(beam=[], x=0, y=0, diffx=2, diffy=2, dx=0, dy=0, diffdx=0, diffdy=0,
-                 rvelocity=0, d_rvelocity = 0, razimuth=0, d_razimuth=0, rrange=0, d_rrange=0)
+        if gate is None:
+            self._predicted_gate = Gate(beam=[], x=0, y=0, diffx=2, diffy=2, dx=0, dy=0, diffdx=0, diffdy=0,
+                     rvelocity=0, d_rvelocity = 0, razimuth=0, d_razimuth=0, rrange=0, d_rrange=0)
+        else:
+            self._predicted_gate = Gate(beam=[], x=0, y=0, diffx=gate._diff_x, diffy=gate._diff_y, dx=0, dy=0,
+                                        diffdx=gate._diff_dx, diffdy=gate._diff_dy, rvelocity=0,
+                                        d_rvelocity=gate._diff_rvel, razimuth=0, d_razimuth=gate._diff_raz,
+                                        rrange=0, d_rrange=gate._diff_rrng)
         self._trackID = trackID
         self._velx_interval = (0, 0)
         self._x_interval = (0, 0)
@@ -1163,7 +1584,9 @@ class Track(list):
                                y=detection._y,
                                razimuth=detection._azimuth,
                                rvelocity=detection._vel,
-                               beam=detection._beam))
+                               rrange=detection._rng,
+                               beam=detection._beam,
+                               sensor_y=detection._sensor_y))
         self._y_interval = (min([elem.y for elem in self]), max([elem.y for elem in self]))
         self._x_interval = (min([elem.x for elem in self]), max([elem.x for elem in self]))
         self._rvelocity_interval = (min([elem.rvelocity for elem in self]), max([elem.rvelocity for elem in self]))
@@ -1229,23 +1652,23 @@ class Track(list):
             aim = 0
         return aim
 
-    def init_tracker(self,type='kalman_filter', dim_x=4, dim_z=2, dt=50.0e-3, init_x=np.array([[0, 0, 0, 0]]).T):
+    def init_tracker(self,type='kalman_filter', dim_x=4, dim_z=2, dt=50.0e-3, init_x=np.array([[0, 0, 0, 0]]).T,
+                     q_var=0.001, r_x=0.2, r_y=0.1, r_polar=(0.04, 3.0e-4, 0.01)):
+        """ Creates a constant velocity Kalman filter of the track.
+
+        :param type: type of the filter, a key of :attr:`tracking_filters.FILTER_TYPES`
+        :param q_var: variance of the process noise, see :meth:`utils.Q_discrete_white_noise`
+        :param r_x: variance of measurements of x in m^2
+        :param r_y: variance of measurements of y in m^2
+        :param r_polar: variances of polar measurements, used by polar filters
+        :return: False if the tracker already exists
+        """
         if not(self._tracker):
-            self._tracker = tf.KalmanFilter(dim_x=dim_x, dim_z=dim_z)
-
-            self._tracker.F = np.array([[1, dt, 0, 0],
-                                        [0, 1, 0, 0],
-                                        [0, 0, 1, dt],
-                                        [0, 0, 0, 1]])
-            q = Q_discrete_white_noise(dim=2, dt=dt, var=0.001)
-            self._tracker.Q = block_diag(q, q)
-            self._tracker.x = init_x
-            self._tracker.P = np.eye(4) * 5.0
-            self._tracker.H = np.array([[1, 0, 0, 0],
-                                        [0, 0, 1, 0]])
-            self._tracker.R = np.array([[0.2, 0],[0, 0.1]])
+            self._tracker = tf.constant_velocity_filter(dt, q_var, r_x, r_y, x=init_x, filter_type=type,
+                                                        r_polar=r_polar)
             self._predicted_gate._x = self._tracker.x[0]
             self._predicted_gate._y = self._tracker.x[2]
+            self._store_estimate(self[:1])
             logging.getLogger(__name__).debug("Track.init_tracker: Tracker initialized with: ")
             logging.getLogger(__name__).debug("\t state vector x:\t %02.5f", self._tracker.x[0])
             logging.getLogger(__name__).debug("\t \t \t \t \t \t %02.5f", self._tracker.x[1])
@@ -1255,25 +1678,74 @@ class Track(list):
         else:
             return False
 
+    def get_measurement(self, trackpoint):
+        """ Returns the measurement of the tracker taken from a point of the track together with the position of the
+        radar which measured it. Polar filters take radar range, azimuth and velocity measured from the radar, the
+        others take x and y.
+
+        :param trackpoint: a point of the track
+        :type trackpoint: TrackPoint
+        :return: the measurement z and the position [x, y] of the radar in the EGO frame
+        :rtype: (numpy.array, numpy.array)
+        """
+        if self._tracker.polar:
+            return trackpoint.get_polar_z_array(), trackpoint.get_sensor_array()
+        return trackpoint.get_z_array(), trackpoint.get_sensor_array()
+
+    def _update(self, trackpoint):
+        z, sensor = self.get_measurement(trackpoint)
+        if self._tracker.polar:
+            self._tracker.update(z, sensor=sensor)
+        else:
+            self._tracker.update(z)
+
+    def _store_estimate(self, trackpoints):
+        # the estimate is the same for points taken by one update
+        estimate = np.ravel(self._tracker.x)[:4].astype(float)
+        for elem in trackpoints:
+            elem.estimate = estimate
+
     def start_tracker(self):
         # TODO error - 'DetectionPoint' object has no attribute 'get_z_array'
-        self._tracker.update(self[1].get_z_array())
+        self._update(self[1])
+        self._store_estimate(self[1:2])
         self._tracker.predict()
-        self._tracker.update(self[2].get_z_array())
+        self._update(self[2])
+        self._store_estimate(self[2:3])
         self._last_update = self[2].mcc
         self._predicted_gate._x = self._tracker.x[0]
         self._predicted_gate._y = self._tracker.x[2]
+        self._predicted_gate._rvel = self[2].rvelocity
         logging.getLogger(__name__).debug("Track.start_tracker: Tracker started, current posteriori")
         logging.getLogger(__name__).debug(" \t\t x = %02.5f",
                                           self._predicted_gate.get_center_array()[0])
         logging.getLogger(__name__).debug(" \t\t y = %02.5f",
                                           self._predicted_gate.get_center_array()[1])
 
-    def update_tracker(self):
-        self._tracker.update(self[-1].get_z_array())
+    def update_tracker(self, n_points=1):
+        """ Updates the tracker by the last *n_points* points of the track. Points of several sensors appended in the
+        same MCC are fused by one update when the tracker supports it, see
+        :meth:`tracking_filters.InformationFilter.update_multiple`. The predicted gate is centred at the estimated
+        position and at the radar velocity of the last point.
+        """
+        with instr.timer("kf_update"):
+            if n_points > 1 and hasattr(self._tracker, "update_multiple"):
+                self._tracker.update_multiple([elem.get_z_array() for elem in self[-n_points:]])
+            else:
+                for elem in self[-n_points:]:
+                    self._update(elem)
+        self.tracker_updated(n_points)
+
+    def tracker_updated(self, n_points=1):
+        """ Stores the estimate of the tracker updated by the last *n_points* points of the track into these points
+        and moves the predicted gate to it. It is called by :meth:`data_containers.Track.update_tracker` or after the
+        tracker was updated together with trackers of other tracks, see :meth:`tracking_filters.update_filters`.
+        """
+        self._store_estimate(self[-n_points:])
         self._last_update = self[-1].mcc
         self._predicted_gate._x = self._tracker.x[0]
         self._predicted_gate._y = self._tracker.x[2]
+        self._predicted_gate._rvel = self[-1].rvelocity
         logging.getLogger(__name__).debug("Track.update_tracker: Tracker's update cycle called, current posteriori")
         logging.getLogger(__name__).debug(" \t\t x = %02.5f",
                                           self._predicted_gate.get_center_array()[0])
@@ -1281,7 +1753,14 @@ class Track(list):
                                           self._predicted_gate.get_center_array()[1])
 
     def predict(self):
-        self._tracker.predict()
+        with instr.timer("kf_predict"):
+            self._tracker.predict()
+        self.tracker_predicted()
+
+    def tracker_predicted(self):
+        """ Moves the predicted gate to the prediction of the tracker, see
+        :meth:`data_containers.Track.tracker_updated`.
+        """
         self._predicted_gate._x = self._tracker.x[0]
         self._predicted_gate._y = self._tracker.x[2]
         logging.getLogger(__name__).debug("Track.predict: Tracker's predict cycle called, current apriori")
@@ -1306,6 +1785,9 @@ class Track(list):
         razimuth_sel = [elem.razimuth for elem in self]
         rvelocity_sel = [elem.rvelocity for elem in self]
         beam_sel = [elem.beam for elem in self]
+        # points without an estimate of the tracker have NaN estimates
+        estimate_sel = [elem.estimate if elem.estimate is not None else np.full(4, np.nan) for elem in self]
+        estimate_sel = np.reshape(estimate_sel, (len(self), 4))
 
         track_data = {"active":self._active,
                       "mcc": np.array(mcc_sel),
@@ -1313,7 +1795,11 @@ class Track(list):
                       "rvelocity": np.array(rvelocity_sel),
                       "x": np.array(x_sel),
                       "y": np.array(y_sel),
-                      "beam": np.array(beam_sel)}
+                      "beam": np.array(beam_sel),
+                      "x_est": estimate_sel[:, 0],
+                      "dx_est": estimate_sel[:, 1],
+                      "y_est": estimate_sel[:, 2],
+                      "dy_est": estimate_sel[:, 3]}
         return track_data
 
     def set_predicted_gate(self, predicted_gate):
@@ -1355,14 +1841,50 @@ def cnf_file_parser(cnf_file):
     # Read data-preprocessor settings
     radar_select = config.get('DataProcessSettings', 'radar')
     number_of_mcc = config.get('DataProcessSettings', 'number_of_mcc')
+    tensor_channels = config.get('DataProcessSettings', 'tensor_channels', fallback='x,y')
+    stream_chunk_mcc = int(config.get('DataProcessSettings', 'stream_chunk_mcc', fallback='0'))
+    export_format = config.get('DataProcessSettings', 'export_format', fallback='dense')
 
     data_preprocessor_settings = {
         "radar_select": radar_select,
-        "number_of_mcc": number_of_mcc}
+        "number_of_mcc": number_of_mcc,
+        "tensor_channels": [s.strip() for s in tensor_channels.split(',')],
+        "stream_chunk_mcc": stream_chunk_mcc,
+        "export_format": export_format}
 
     return conf_data, data_preprocessor_settings
 
 
+def cnf_tracking_parser(cnf_file):
+    """ Reads parameters of the track management from the sections [Track_management] and [TrackerKF] of the
+    configuration file. Keys of the returned dictionary are names of the options, see
+    :attr:`track_management.TRACKING_PARAMETERS`, values are converted to types of their defaults. Missing sections
+    give an empty dictionary.
+
+    :param cnf_file: path of the configuration file
+    :return: dictionary of parameters
+    :rtype: dict
+    :raises ValueError: when an option is not a tracking parameter or its value cannot be converted
+    """
+    import track_management as tm
+
+    config = configparser.ConfigParser()
+    config.read(cnf_file)  # "./analysis.cnf"
+
+    params = {}
+    for section in ('Track_management', 'TrackerKF'):
+        if config.has_section(section):
+            for key, value in config.items(section):
+                if key not in tm.TRACKING_PARAMETERS:
+                    raise ValueError("Unknown option %s in the section [%s] of %s" % (key, section, cnf_file))
+                try:
+                    params[key] = type(tm.TRACKING_PARAMETERS[key])(value)
+                except ValueError:
+                    raise ValueError("Option %s in the section [%s] of %s must be %s, got %s" %
+                                     (key, section, cnf_file, type(tm.TRACKING_PARAMETERS[key]).__name__, value))
+    return params
+
+
 def cnf_datapaths_parser(cnf_file, scenario):
     config = configparser.ConfigParser()
     config.read(cnf_file)  # "./analysis.cnf"
@@ -1420,9 +1942,41 @@ def parse_CMDLine(cnf_file):
     #      Ploting option
     parser.add_argument("-p", "--plot",
                         help="Set the plot options.")
+    #      Checkpointing of the tracker state
+    parser.add_argument("-c", "--checkpoint", type=int,
+                        help="Stores a snapshot of the complete tracker state every given number of MCCs.")
+    parser.add_argument("--resume",
+                        help="Restores the tracker state from a given checkpoint file and continues from its MCC.")
+    #      Per-stage timers and counters
+    parser.add_argument("-i", "--instrument",
+                        help="Collects per-stage timers and counters and stores them into a given .csv or .json file.")
+    #      Profiling
+    parser.add_argument("--profile", choices=["off", "cprofile", "sampling"], default="off",
+                        help="Profiles the script with cProfile or with a stack sampler, off by default.")
+    parser.add_argument("--profile-output",
+                        help="Prefix of profile output files, profile_<scenario> is used by default.")
+    parser.add_argument("--profile-top", type=int, default=30,
+                        help="Number of functions listed in the profile summary.")
+    #      Parallel rendering of movie frames
+    parser.add_argument("-w", "--workers", type=int,
+                        help="Renders movie frames in a given number of parallel processes.")
+    parser.add_argument("--movie",
+                        help="Pipes rendered frames into ffmpeg and stores the movie into a given file.")
+    #      Time-sharded parallel tracking
+    parser.add_argument("-j", "--shards", type=int,
+                        help="Splits the MCC range into a given number of shards tracked in parallel processes, "
+                             "every loaded radar is tracked on its own.")
+    parser.add_argument("--overlap", type=int, default=50,
+                        help="Number of warm-up MCCs preceding each shard, tracks are stitched within this region.")
+    parser.add_argument("--fuse", action="store_true",
+                        help="With -r B, tracks both radars by one fused track manager instead of separate ones.")
     #      Select a scenario
     argv = parser.parse_args()
 
+    if argv.shards and (argv.checkpoint or argv.resume or argv.fuse):
+        print("Time-sharded tracking (-j, --shards) cannot be combined with -c (--checkpoint), --resume or --fuse.")
+        quit()
+
     if argv.beam:
         beams_tp = [int(s) for s in argv.beam.split(',')]
         beams_tp.sort()
@@ -1482,7 +2036,21 @@ def parse_CMDLine(cnf_file):
                          "radar_tp": radar_tp,
                          "plot_tp": plot_tp,
                          "output_folder": output,
-                         "number_of_mcc_to_process": number_of_mcc_to_process}
+                         "number_of_mcc_to_process": number_of_mcc_to_process,
+                         "tensor_channels": data_preprocessor_settings["tensor_channels"],
+                         "stream_chunk_mcc": data_preprocessor_settings["stream_chunk_mcc"],
+                         "export_format": data_preprocessor_settings["export_format"],
+                         "checkpoint_every": argv.checkpoint,
+                         "resume_from": argv.resume,
+                         "instrument": argv.instrument,
+                         "profile": argv.profile,
+                         "profile_output": argv.profile_output,
+                         "profile_top": argv.profile_top,
+                         "workers": argv.workers,
+                         "movie": argv.movie,
+                         "shards": argv.shards,
+                         "shards_overlap": argv.overlap,
+                         "fuse": argv.fuse}
 
         if radar_tp == "L":
             conf_data_out["filename_RightRadar"] = None
@@ -1,8 +1,31 @@
 #!/usr/bin/env python
 import data_containers as dc
+import profiling
+import mcc_summary as ms
 import radar_plots as rplt
 
+def print_stats(name, stats):
+    """ Prints statistics of detections of one radar computed by :meth:`data_containers.DetectionList.describe`.
+
+    :param name: name of the radar, 'LR' or 'RR'
+    :param stats: statistics of the radar, None if it has no detections within the selection
+    """
+    if not stats:
+        print(name, ": no detections within the selection")
+        return
+    print(name, ": N of Det: ", stats["count"], "starting MCC: ", int(stats["mcc"]["min"]), "ending MCC: ",
+          int(stats["mcc"]["max"]))
+    print(name, ": min vel: ", stats["rvelocity"]["min"], "max vel: ", stats["rvelocity"]["max"])
+    print(name, ": min az: ", stats["razimuth"]["min"], "max az: ", stats["razimuth"]["max"])
+    print(name, ": min rng: ", stats["range"]["min"], "max rng: ", stats["range"]["max"])
+    print(name, ": min x: ", stats["x"]["min"], "max x: ", stats["x"]["max"])
+    print(name, ": min y: ", stats["y"]["min"], "max y: ", stats["y"]["max"])
+
 def main(conf_data):
+    lst_det_left = None
+    lst_det_right = None
+    pyramid_left = None
+    pyramid_right = None
 
     selection = {"beam_tp":conf_data["beams_tp"],
                  "mcc_tp":None, "x_tp":None, "y_tp":None,
@@ -15,17 +38,12 @@ def main(conf_data):
         leftradar_path = ''.join(l)
 
         lst_det_left = dc.DetectionList()
-        lst_det_left.append_from_m_file(leftradar_path, True, conf_data["EGO_car_width"])
-
-        LR_data = lst_det_left.get_array_detections_selected(selection=selection)
+        lst_det_left.append_data_from_m_file(leftradar_path, True, conf_data["EGO_car_width"])
+        pyramid_left = ms.load_or_build(lst_det_left, leftradar_path)
 
-        print("LR : N of Det: ", len(LR_data["mcc"]), "starting MCC: ", min(LR_data["mcc"]), "ending MCC: ",
-              max(LR_data["mcc"]))
-        print("LR : min vel: ", min(LR_data["velocity"]), "max vel: ", max(LR_data["velocity"]))
-        print("LR : min az: ", min(LR_data["azimuth"]), "max az: ", max(LR_data["azimuth"]))
-        print("LR : min rng: ", min(LR_data["range"]), "max rng: ", max(LR_data["range"]))
-        print("LR : min x: ", min(LR_data["x"]), "max x: ", max(LR_data["x"]))
-        print("LR : min y: ", min(LR_data["y"]), "max y: ", max(LR_data["y"]))
+        LR_stats = lst_det_left.describe(by='radar', columns=("mcc", "rvelocity", "razimuth", "range", "x", "y"),
+                                         selection=selection).get("L")
+        print_stats("LR", LR_stats)
 
     if conf_data["filename_RightRadar"]:
         l = []
@@ -34,17 +52,12 @@ def main(conf_data):
         rightradar_path = ''.join(l)
 
         lst_det_right = dc.DetectionList()
-        lst_det_right.append_from_m_file(rightradar_path, False, conf_data["EGO_car_width"])
+        lst_det_right.append_data_from_m_file(rightradar_path, False, conf_data["EGO_car_width"])
+        pyramid_right = ms.load_or_build(lst_det_right, rightradar_path)
 
-        RR_data = lst_det_right.get_array_detections_selected(selection=selection)
-
-        print("RR : N of Det: ", len(RR_data["mcc"]), "starting MCC: ", min(RR_data["mcc"]), "ending MCC: ",
-                  max(RR_data["mcc"]))
-        print("RR : min vel: ", min(RR_data["velocity"]), "max vel: ", max(RR_data["velocity"]))
-        print("RR : min az: ", min(RR_data["azimuth"]), "max az: ", max(RR_data["azimuth"]))
-        print("RR : min rng: ", min(RR_data["range"]), "max rng: ", max(RR_data["range"]))
-        print("RR : min x: ", min(RR_data["x"]), "max x: ", max(RR_data["x"]))
-        print("RR : min y: ", min(RR_data["y"]), "max y: ", max(RR_data["y"]))
+        RR_stats = lst_det_right.describe(by='radar', columns=("mcc", "rvelocity", "razimuth", "range", "x", "y"),
+                                          selection=selection).get("R")
+        print_stats("RR", RR_stats)
 
     if conf_data["output_folder"]:
         l = []
@@ -55,9 +68,19 @@ def main(conf_data):
     else:
         output_path = None
 
-    rplt.static_plot_selections(lst_det_left, lst_det_right, selection, output_path)
+    if conf_data["plot_tp"] == "overview":
+        mcc_interval = [lst_det.get_mcc_interval() for lst_det in (lst_det_left, lst_det_right) if lst_det]
+        if mcc_interval:
+            rplt.static_plot_mcc_overview(pyramid_left, pyramid_right,
+                                          (min(elem[0] for elem in mcc_interval),
+                                           max(elem[1] for elem in mcc_interval)),
+                                          output_path)
+        else:
+            print("No detections to plot an overview of")
+    else:
+        rplt.static_plot_selections(lst_det_left, lst_det_right, selection, output_path)
 
 if __name__ == "__main__":
     conf_data = dc.parse_CMDLine("./analysis.cnf")
     if conf_data:
-        main(conf_data)
+        profiling.run_profiled(main, conf_data)
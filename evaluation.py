@@ -0,0 +1,178 @@
+import logging
+import numpy as np
+
+# Metrics of a scenario, see evaluate_tracks
+SCENARIO_METRICS = ("rmse_pos", "rmse_vel", "gospa", "coverage", "switches", "fragments", "longest")
+
+
+def get_reference_arrays(references, mcc_key='mccL', xcompensation=0.0):
+    """ Converts DGPS references into arrays ordered by MCC of a given radar. Positions are compensated by
+    *DGPS_xcompensation* as in :meth:`radar_plots.static_plotREF_selections`, velocities are relative to the EGO car.
+
+    :param references: list of references or its shared view
+    :param mcc_key: 'mccL' or 'mccR', the radar whose MCCs the references are aligned to
+    :param xcompensation: DGPS_xcompensation of the scenario
+    :type references: ReferenceList
+    :return: dictionary with keys mcc, x, y, dx, dy
+    :rtype: dict
+    """
+    DGPS_data = references.get_array_references_selected()
+    order = np.argsort(DGPS_data[mcc_key], kind='stable')
+    return {"mcc": DGPS_data[mcc_key][order],
+            "x": np.abs(DGPS_data["TAR_distX"][order] + xcompensation),
+            "y": DGPS_data["TAR_distY"][order],
+            "dx": DGPS_data["TAR_velX"][order] - DGPS_data["EGO_velX"][order],
+            "dy": DGPS_data["TAR_velY"][order] - DGPS_data["EGO_velY"][order]}
+
+
+def asof_join(mcc, ref_mcc, max_lag=0):
+    """ Joins MCCs to the latest reference at or before them (as-of join) by a binary search in sorted references.
+
+    :param mcc: MCCs to join
+    :param ref_mcc: MCCs of references sorted in ascending order
+    :param max_lag: the largest allowed difference of MCCs, 0 requires the same MCC
+    :return: indices of joined references and a mask of MCCs which have a reference within *max_lag*
+    :rtype: (numpy.array, numpy.array)
+    """
+    index = np.searchsorted(ref_mcc, mcc, side='right') - 1
+    valid = index >= 0
+    index = np.maximum(index, 0)
+    if ref_mcc.size:
+        valid &= (mcc - ref_mcc[index]) <= max_lag
+    else:
+        valid[:] = False
+    return index, valid
+
+
+def concatenate_tracks(tracks):
+    """ Concatenates tracks ported by :meth:`track_management.TrackManager.port_data` into flat arrays. Positions
+    and velocities of a track point are the state estimated by the tracker of the track after it took the point (keys
+    x_est, dx_est, y_est, dy_est of :meth:`data_containers.Track.get_array_trackpoints`), they are NaN for points
+    without an estimate.
+
+    :param tracks: list of tracks, each of them a dictionary of arrays
+    :return: dictionary with keys track, mcc, x, y, dx, dy
+    :rtype: dict
+    """
+    if not tracks:
+        return {key: np.zeros(0) for key in ("track", "mcc", "x", "y", "dx", "dy")}
+    points = {"track": np.repeat(np.arange(len(tracks)), [np.size(track["mcc"]) for track in tracks]),
+              "mcc": np.concatenate([np.ravel(track["mcc"]) for track in tracks])}
+    for key in ("x", "y", "dx", "dy"):
+        points[key] = np.concatenate([np.ravel(track[key + "_est"]) for track in tracks]).astype(float)
+    return points
+
+
+def evaluate_tracks(tracks, references, mcc_key='mccL', xcompensation=0.0, mcc_interval=None, gate=2.0, c=5.0,
+                    p=2, max_lag=0):
+    """ Scores tracks against DGPS references of one target. Every track point is joined to the reference of its
+    MCC (see :meth:`evaluation.asof_join`), all metrics are computed on the joined arrays without loops over points.
+    Points are scored by the state estimated by the tracker, see :meth:`evaluation.concatenate_tracks`; points
+    without an estimate are left out of all metrics but n_points.
+
+    Per-track metrics:
+
+    +-----------+-----------------------------------------------------------------------+
+    | Key       | Description                                                           |
+    +===========+=======================================================================+
+    | n_points  | number of points of the track                                         |
+    +-----------+-----------------------------------------------------------------------+
+    | n_joined  | number of points which have a reference                               |
+    +-----------+-----------------------------------------------------------------------+
+    | rmse_pos  | RMSE of positions of joined points in meters                          |
+    +-----------+-----------------------------------------------------------------------+
+    | rmse_vel  | RMSE of velocities of joined points in meters per second              |
+    +-----------+-----------------------------------------------------------------------+
+    | on_target | fraction of joined points closer to the reference than *gate*         |
+    +-----------+-----------------------------------------------------------------------+
+
+    Metrics of the scenario are computed from the closest on-target point of every reference MCC:
+
+    +-----------+-----------------------------------------------------------------------+
+    | Key       | Description                                                           |
+    +===========+=======================================================================+
+    | rmse_pos  | RMSE of positions of the closest on-target points                     |
+    +-----------+-----------------------------------------------------------------------+
+    | rmse_vel  | RMSE of velocities of the closest on-target points                    |
+    +-----------+-----------------------------------------------------------------------+
+    | gospa     | mean GOSPA distance (alpha = 2) over reference MCCs and MCCs of       |
+    |           | points without a reference, which are all false estimates             |
+    +-----------+-----------------------------------------------------------------------+
+    | coverage  | fraction of reference MCCs which have an on-target point              |
+    +-----------+-----------------------------------------------------------------------+
+    | switches  | number of changes of the track which follows the reference            |
+    +-----------+-----------------------------------------------------------------------+
+    | fragments | number of continuous segments of the reference followed by one track  |
+    +-----------+-----------------------------------------------------------------------+
+    | longest   | number of reference MCCs of the longest segment                       |
+    +-----------+-----------------------------------------------------------------------+
+
+    :param tracks: tracks ported by :meth:`track_management.TrackManager.port_data` ("tracks_array")
+    :param references: list of references or its shared view
+    :param mcc_key: 'mccL' or 'mccR', the radar which produced the tracks
+    :param xcompensation: DGPS_xcompensation of the scenario
+    :param mcc_interval: closed interval of evaluated MCCs, the span of tracks is used if None
+    :param gate: the largest distance in meters of an on-target point from the reference
+    :param c: cut-off distance of GOSPA in meters
+    :param p: order of GOSPA
+    :return: dictionary with keys 'tracks' (list of per-track dictionaries) and 'scenario'
+    :rtype: dict
+    """
+    ref = get_reference_arrays(references, mcc_key, xcompensation)
+    points = concatenate_tracks(tracks)
+    n_tracks = len(tracks) if tracks else 0
+    if mcc_interval is None:
+        mcc_interval = (points["mcc"].min(), points["mcc"].max()) if points["mcc"].size else (0, -1)
+    in_interval = (mcc_interval[0] <= ref["mcc"]) & (ref["mcc"] <= mcc_interval[1])
+    ref = {key: value[in_interval] for key, value in ref.items()}
+    n_ref = ref["mcc"].size
+
+    scored = np.isfinite(points["x"]) & np.isfinite(points["y"]) & np.isfinite(points["dx"]) & \
+        np.isfinite(points["dy"]) & (mcc_interval[0] <= points["mcc"]) & (points["mcc"] <= mcc_interval[1])
+    index, valid = asof_join(points["mcc"], ref["mcc"], max_lag)
+    unjoined_mcc = points["mcc"][scored & ~valid]
+    valid &= scored
+    track = points["track"][valid].astype(int)
+    index = index[valid]
+    pos_err2 = (points["x"][valid] - ref["x"][index]) ** 2 + (points["y"][valid] - ref["y"][index]) ** 2
+    vel_err2 = (points["dx"][valid] - ref["dx"][index]) ** 2 + (points["dy"][valid] - ref["dy"][index]) ** 2
+    on_target = pos_err2 < gate ** 2
+
+    # Per-track sums
+    n_points = np.bincount(points["track"].astype(int), minlength=n_tracks)
+    n_joined = np.bincount(track, minlength=n_tracks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse_pos = np.sqrt(np.bincount(track, pos_err2, minlength=n_tracks) / n_joined)
+        rmse_vel = np.sqrt(np.bincount(track, vel_err2, minlength=n_tracks) / n_joined)
+        on_target_ratio = np.bincount(track, on_target, minlength=n_tracks) / n_joined
+    per_track = [{"n_points": int(n_points[n]), "n_joined": int(n_joined[n]), "rmse_pos": float(rmse_pos[n]),
+                  "rmse_vel": float(rmse_vel[n]), "on_target": float(on_target_ratio[n])} for n in range(n_tracks)]
+
+    # The closest on-target point of every reference MCC
+    hit = np.flatnonzero(on_target)
+    order = hit[np.lexsort((pos_err2[hit], index[hit]))]
+    covered, first = np.unique(index[order], return_index=True)
+    best = order[first]
+    best_track = track[best]
+    breaks = (np.diff(covered) > 1) | (np.diff(best_track) != 0)
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1)) if covered.size else np.zeros(0, dtype=int)
+    lengths = covered[np.append(starts[1:] - 1, covered.size - 1)] - covered[starts] + 1 if covered.size else []
+
+    # GOSPA with one reference per MCC: the closest estimate is assigned, the others are false estimates
+    m = np.bincount(index, minlength=n_ref)
+    d_min = np.full(n_ref, float(c))
+    np.minimum.at(d_min, index, np.sqrt(pos_err2))
+    gospa = np.where(m > 0, d_min ** p + c ** p / 2.0 * (m - 1), c ** p / 2.0) ** (1.0 / p)
+    # MCCs without a reference only have false estimates
+    n_false = np.unique(unjoined_mcc, return_counts=True)[1]
+    gospa = np.concatenate((gospa, (c ** p / 2.0 * n_false) ** (1.0 / p)))
+
+    scenario = {"rmse_pos": float(np.sqrt(pos_err2[best].mean())) if best.size else np.nan,
+                "rmse_vel": float(np.sqrt(vel_err2[best].mean())) if best.size else np.nan,
+                "gospa": float(gospa.mean()) if gospa.size else np.nan,
+                "coverage": covered.size / n_ref if n_ref else np.nan,
+                "switches": int(np.count_nonzero(np.diff(best_track))),
+                "fragments": int(starts.size),
+                "longest": int(np.max(lengths)) if len(lengths) else 0}
+    logging.getLogger(__name__).debug("evaluate_tracks: %s tracks against %s references, %s", n_tracks, n_ref, scenario)
+    return {"tracks": per_track, "scenario": scenario}
@@ -2,7 +2,10 @@
 
 import data_containers as dc
 import track_management as tm
-import radar_plots as rp
+import checkpoint as ckpt
+import track_sharding as ts
+import instrumentation as instr
+import profiling
 import numpy as np
 import logging
 import logging.config
@@ -49,8 +52,15 @@ def main(config_data):
     # measurement contains only 2D vector (rho, theta)
     used_tracker_type = {'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2}
 
+    if config_data["instrument"]:
+        instr.enable()
+
     track_mgmt_LR = tm.TrackManager(tracker_type=used_tracker_type)
     track_mgmt_RR = tm.TrackManager(tracker_type=used_tracker_type)
+    # Both radars are tracked by one list of tracks, detections seen by both are fused.
+    fused = config_data["fuse"] and config_data["filename_LeftRadar"] and config_data["filename_RightRadar"]
+    if fused:
+        track_mgmt_B = tm.FusedTrackManager(tracker_type=dict(used_tracker_type, filter_type='information_filter'))
 
 
 
@@ -59,6 +69,8 @@ def main(config_data):
             logger.info("Beams %d will be processed: %d times", n_beams, config_data["beams_tp"].count(n_beams))
 
     # Load Data from .mat files
+    lst_det_LR = None
+    lst_det_RR = None
     if config_data["filename_LeftRadar"]:
         logger.info(76 * '=')
         logger.info("Left Radar Data:")
@@ -111,6 +123,18 @@ def main(config_data):
     if config_data["number_of_mcc_to_process"]:
         mcc_end = min(mcc_start + int(config_data["number_of_mcc_to_process"]),mcc_end)
         logger.debug('Number of processed MCCs from cnf file: %s.', config_data["number_of_mcc_to_process"])
+    if config_data["resume_from"]:
+        # The tracker state is restored from a snapshot, already processed MCCs are skipped.
+        if fused:
+            mcc_start, track_managers = ckpt.load_checkpoint(config_data["resume_from"], config_data["scenario"],
+                                                             ["B"])
+            track_mgmt_B = track_managers["B"]
+        else:
+            # Only the left radar is tracked without fusion, see the filtering loop.
+            mcc_start, track_managers = ckpt.load_checkpoint(config_data["resume_from"], config_data["scenario"],
+                                                             ["LR"])
+            track_mgmt_LR = track_managers["LR"]
+        logger.info('Tracker state restored from: %s', config_data["resume_from"])
     logger.info('Processing will start at: %d, end: %d, dMCC=%d.',
                     mcc_start,
                     mcc_end,
@@ -118,6 +142,47 @@ def main(config_data):
 
 
     logger.debug('Inside of the MCC interval from %s to %s: ', mcc_start, mcc_end)
+
+    if config_data["shards"]:
+        # Offline reprocessing, shards of the MCC interval are tracked in parallel and stitched together. Every
+        # loaded radar is tracked on its own, tracks of the first one are stored as 'track', tracks of the right
+        # radar as 'track_RR' when both are loaded.
+        tracks = {}
+        for name, lst_det in (("LR", lst_det_LR), ("RR", lst_det_RR)):
+            if lst_det is None:
+                continue
+            logger.info('Time-sharded tracking of %s: %d shards, overlap %d MCCs.',
+                        name, config_data["shards"], config_data["shards_overlap"])
+            tracks["track_" + name if tracks else "track"] = ts.track_sharded(lst_det, selection, mcc_start, mcc_end,
+                                                                              config_data["shards"],
+                                                                              config_data["shards_overlap"],
+                                                                              tracker_type=used_tracker_type)
+        sio.savemat("tracks.mat", tracks)
+        return
+    if fused:
+        logger.info('Fused tracking of both radars by an information filter.')
+        lst_det_B = dc.DetectionList()
+        lst_det_B.extend(lst_det_LR)
+        lst_det_B.extend(lst_det_RR)
+        lst_det_B.calculate_intervals()
+        instr.begin_mcc()
+        # The MCC range is tracked in chunks between checkpoints.
+        mcc_chunk = config_data["checkpoint_every"] or max(mcc_end - mcc_start, 1)
+        for mcc_from in range(mcc_start, mcc_end, mcc_chunk):
+            mcc_to = min(mcc_from + mcc_chunk, mcc_end)
+            track_mgmt_B.track_mcc_range(lst_det_B, selection, mcc_from, mcc_to)
+            if config_data["checkpoint_every"] and (mcc_to - mcc_start) % config_data["checkpoint_every"] == 0:
+                ckpt.save_checkpoint(ckpt.checkpoint_path(config_data["output_folder"], config_data["scenario"],
+                                                          mcc_to),
+                                     mcc_to,
+                                     {"B": track_mgmt_B},
+                                     config_data["scenario"])
+        with instr.timer("export"):
+            list_of_tracks = track_mgmt_B.port_data("tracks_array")
+            sio.savemat("tracks.mat", {'track': list_of_tracks})
+        if config_data["instrument"]:
+            instr.export(config_data["instrument"])
+        return
     mcc_step = 1
 
     # Prepare options to plot results
@@ -129,6 +194,7 @@ def main(config_data):
 
     #----------------- Filtering loop
     i_prev = mcc_start
+    instr.begin_mcc()
     for i in range(mcc_start, mcc_end, mcc_step):  # number of frames
 
         selection["mcc_tp"] = (i_prev, i)
@@ -161,9 +227,21 @@ def main(config_data):
         # This line is redundant if only one mcc is being processed per loop cycle.
         # However if mcc_step is different than 1, it might be a good idea to keep it here:
         i_prev = i + 1
+        instr.end_mcc(i)
+
+        if config_data["checkpoint_every"] and (i - mcc_start + 1) % config_data["checkpoint_every"] == 0:
+            ckpt.save_checkpoint(ckpt.checkpoint_path(config_data["output_folder"], config_data["scenario"], i_prev),
+                                 i_prev,
+                                 {"LR": track_mgmt_LR},
+                                 config_data["scenario"])
+
+    with instr.timer("export"):
+        list_of_tracks = track_mgmt_LR.port_data("tracks_array")
+        sio.savemat("tracks.mat", {'track':list_of_tracks})
 
-    list_of_tracks = track_mgmt_LR.port_data("tracks_array")
-    sio.savemat("tracks.mat", {'track':list_of_tracks})
+    if config_data["instrument"]:
+        instr.export(config_data["instrument"])
+        logger.info("Timers and counters stored in: %s", config_data["instrument"])
 
 #     TODO: graphical representation of the results
 
@@ -171,6 +249,6 @@ if __name__ == "__main__":
     config_data = dc.parse_CMDLine("./analysis.cnf")
     if config_data:
         try:
-            main(config_data)
+            profiling.run_profiled(main, config_data)
         except NoLoggerConfiguration:
             print("The log file cannot be created. Specify it's filename in a main config file.")
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import data_containers as dc
+import profiling
 import tracking_filters as tf
 import radar_plots as rplt
 import numpy as np
@@ -69,4 +70,4 @@ def main(conf_data):
 if __name__ == "__main__":
     conf_data = dc.parse_CMDLine("./analysis.cnf")
     if conf_data:
-        main(conf_data)
+        profiling.run_profiled(main, conf_data)
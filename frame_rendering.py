@@ -0,0 +1,121 @@
+import io
+import os
+import shutil
+import logging
+import subprocess
+import multiprocessing
+import shared_dataset as sd
+
+# State of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(lst_det_left, lst_det_right, beams, dpi):
+    import matplotlib
+    matplotlib.use('Agg')
+    import radar_plots as rplt
+    _worker["renderer"] = rplt.GridHistRenderer(lst_det_left, lst_det_right, beams, interactive=False, dpi=dpi)
+
+
+def _publish(lst_det):
+    # Workers attach to detections in shared memory instead of receiving pickled lists
+    return sd.publish_detections(lst_det) if lst_det else None
+
+
+def _unlink(*shared):
+    for shared_det in shared:
+        if shared_det is not None:
+            shared_det.unlink()
+
+
+def _render_file(frame):
+    mcc_interval, fname_det = frame
+    _worker["renderer"].render(mcc_interval, fname_det)
+    return fname_det
+
+
+def _render_bytes(mcc_interval):
+    buffer = io.BytesIO()
+    _worker["renderer"].render(mcc_interval, buffer)
+    return buffer.getvalue()
+
+
+def get_frames(mcc_start, mcc_end, mcc_step=1):
+    """ Builds MCC intervals of movie frames in the same way as movie_grabber_gridAxes does, every frame shows
+    detections since the previous frame.
+
+    :return: list of closed MCC intervals
+    :rtype: list of tuple
+    """
+    frames = []
+    i_prev = mcc_start
+    for i in range(mcc_start, mcc_end, mcc_step):
+        frames.append((i_prev, i))
+        i_prev = i
+    return frames
+
+
+def find_encoder():
+    """ Returns the path of the ffmpeg executable or None when it is not installed.
+    """
+    return shutil.which("ffmpeg")
+
+
+def render_frames(lst_det_left, lst_det_right, beams, frames, output_folder, processes=None, dpi=100):
+    """ Renders frames in parallel into numbered PNG files _tmp<mcc>.png. The list of frames is partitioned into
+    contiguous chunks, every worker process renders its chunks by its own Agg canvas.
+
+    :param lst_det_left: detections of the left radar or None
+    :param lst_det_right: detections of the right radar or None
+    :param beams: beams to plot
+    :param frames: MCC intervals of frames, see :meth:`frame_rendering.get_frames`
+    :param output_folder: folder of the output files
+    :param processes: number of worker processes, number of CPUs is used if None
+    :param dpi: resolution of frames
+    :return: list of written files
+    :rtype: list of str
+    """
+    jobs = [(frame, os.path.join(output_folder, '_tmp%08d.png' % frame[1])) for frame in frames]
+    processes = processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(jobs) // (4 * processes))
+    shared_left, shared_right = _publish(lst_det_left), _publish(lst_det_right)
+    try:
+        with multiprocessing.Pool(processes, _init_worker, (shared_left, shared_right, beams, dpi)) as pool:
+            files = pool.map(_render_file, jobs, chunksize)
+    finally:
+        _unlink(shared_left, shared_right)
+    logging.getLogger(__name__).info("render_frames: %s frames rendered by %s processes into %s",
+                                     len(files), processes, output_folder)
+    return files
+
+
+def encode_movie(lst_det_left, lst_det_right, beams, frames, fname_movie, processes=None, dpi=100, fps=20,
+                 encoder=None):
+    """ Renders frames in parallel and pipes them in order into ffmpeg, no frame is stored on a disk.
+
+    :param fname_movie: path of the output movie, its container is given by the extension, i.e. .mp4
+    :param fps: frames per second of the movie
+    :param encoder: path of the ffmpeg executable, found on the PATH if None
+    :return: return code of the encoder
+    :rtype: int
+    """
+    encoder = encoder or find_encoder()
+    if not encoder:
+        raise RuntimeError("ffmpeg was not found, frames can be rendered into files by render_frames")
+    command = [encoder, '-y', '-loglevel', 'error', '-f', 'image2pipe', '-c:v', 'png', '-framerate', str(fps),
+               '-i', '-', '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', fname_movie]
+    processes = processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(frames) // (4 * processes))
+    shared_left, shared_right = _publish(lst_det_left), _publish(lst_det_right)
+    try:
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg:
+            with multiprocessing.Pool(processes, _init_worker, (shared_left, shared_right, beams, dpi)) as pool:
+                # imap keeps the order of frames while workers render ahead
+                for frame in pool.imap(_render_bytes, frames, chunksize):
+                    ffmpeg.stdin.write(frame)
+            ffmpeg.stdin.close()
+            ffmpeg.wait()
+    finally:
+        _unlink(shared_left, shared_right)
+    logging.getLogger(__name__).info("encode_movie: %s frames encoded into %s", len(frames), fname_movie)
+    return ffmpeg.returncode
@@ -0,0 +1,218 @@
+import csv
+import json
+import time
+import collections
+import numpy as np
+
+# Instrumentation is disabled by default, timers and counters cost one function call then.
+_enabled = False
+
+_timer_totals = collections.defaultdict(float)
+_timer_calls = collections.defaultdict(int)
+_counter_totals = collections.defaultdict(int)
+
+_mcc_timers = collections.defaultdict(float)
+_mcc_counters = collections.defaultdict(int)
+_per_mcc_timers = collections.defaultdict(list)
+_per_mcc_counters = collections.defaultdict(list)
+_per_mcc = []
+_mcc_tick = None
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer(object):
+    def __init__(self, name):
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        _timer_totals[self._name] += elapsed
+        _timer_calls[self._name] += 1
+        _mcc_timers[self._name] += elapsed
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable():
+    """ Enables timers and counters and starts measuring of the first MCC.
+    """
+    global _enabled, _mcc_tick
+    _enabled = True
+    _mcc_tick = time.perf_counter()
+
+
+def disable():
+    """ Disables timers and counters, already collected values are kept.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """ Clears all collected values.
+    """
+    global _mcc_tick
+    for values in (_timer_totals, _timer_calls, _counter_totals, _mcc_timers, _mcc_counters,
+                   _per_mcc_timers, _per_mcc_counters):
+        values.clear()
+    del _per_mcc[:]
+    _mcc_tick = time.perf_counter() if _enabled else None
+
+
+def timer(name):
+    """ Returns a context manager which measures the time spent within its block under a given name.
+
+    .. code-block:: Python
+
+        with instrumentation.timer("kf_update"):
+            kf.update(z)
+
+    :param name: name of the measured stage
+    :type name: str
+    """
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def count(name, n=1):
+    """ Adds *n* to a counter of a given name.
+
+    :param name: name of the counter
+    :param n: increment
+    :type name: str
+    :type n: int
+    """
+    if _enabled:
+        _counter_totals[name] += n
+        _mcc_counters[name] += n
+
+
+def begin_mcc():
+    """ Starts measurements of per-MCC statistics, times collected before (i.e. loading of data) are kept
+    in totals only.
+    """
+    global _mcc_tick
+    _mcc_timers.clear()
+    _mcc_counters.clear()
+    _mcc_tick = time.perf_counter()
+
+
+def end_mcc(mcc):
+    """ Closes measurements of one MCC. The latency of the whole MCC, times of all stages and counters collected
+    since the previous call are stored as one sample of per-MCC statistics.
+
+    :param mcc: the MCC which has just been processed
+    :type mcc: int
+    """
+    global _mcc_tick
+    if not _enabled:
+        return
+    now = time.perf_counter()
+    _per_mcc.append((mcc, now - _mcc_tick))
+    for name in _timer_totals:
+        _per_mcc_timers[name].append(_mcc_timers[name])
+    for name in _counter_totals:
+        _per_mcc_counters[name].append(_mcc_counters[name])
+    _mcc_timers.clear()
+    _mcc_counters.clear()
+    _mcc_tick = now
+
+
+def histogram(name=None, bins=20):
+    """ Computes a histogram of per-MCC latencies.
+
+    :param name: name of a stage, the latency of whole MCCs is used if None
+    :param bins: number of bins or bin edges, see numpy.histogram
+    :return: counts and bin edges
+    :rtype: (numpy.array, numpy.array)
+    """
+    samples = [elem[1] for elem in _per_mcc] if name is None else _per_mcc_timers[name]
+    return np.histogram(np.asarray(samples, dtype=float), bins=bins)
+
+
+def get_summary():
+    """ Returns totals of all timers and counters together with statistics of their per-MCC values.
+
+    :return: dictionary with keys 'timers', 'counters' and 'mcc'
+    :rtype: dict
+    """
+    mcc_latency = np.asarray([elem[1] for elem in _per_mcc], dtype=float)
+    timers = {}
+    for name in sorted(_timer_totals):
+        per_mcc = np.asarray(_per_mcc_timers[name], dtype=float)
+        timers[name] = {"calls": _timer_calls[name],
+                        "total_s": _timer_totals[name],
+                        "mean_per_mcc_s": float(per_mcc.mean()) if per_mcc.size else 0.0,
+                        "p95_per_mcc_s": float(np.percentile(per_mcc, 95)) if per_mcc.size else 0.0,
+                        "max_per_mcc_s": float(per_mcc.max()) if per_mcc.size else 0.0}
+    counters = {}
+    for name in sorted(_counter_totals):
+        per_mcc = np.asarray(_per_mcc_counters[name], dtype=float)
+        counters[name] = {"total": _counter_totals[name],
+                          "mean_per_mcc": float(per_mcc.mean()) if per_mcc.size else 0.0,
+                          "max_per_mcc": float(per_mcc.max()) if per_mcc.size else 0.0}
+    mcc = {"number_of_mcc": int(mcc_latency.size),
+           "total_s": float(mcc_latency.sum()),
+           "mean_s": float(mcc_latency.mean()) if mcc_latency.size else 0.0,
+           "p95_s": float(np.percentile(mcc_latency, 95)) if mcc_latency.size else 0.0,
+           "max_s": float(mcc_latency.max()) if mcc_latency.size else 0.0}
+    return {"timers": timers, "counters": counters, "mcc": mcc}
+
+
+def export_json(path, bins=20):
+    """ Writes the summary together with histograms of per-MCC latencies into a JSON file.
+    """
+    summary = get_summary()
+    summary["histograms"] = {}
+    for name in [None] + sorted(_timer_totals):
+        counts, edges = histogram(name, bins)
+        summary["histograms"][name or "mcc"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+def export_csv(path):
+    """ Writes per-MCC latencies, stage times and counters into a CSV file, one row per MCC.
+    """
+    timer_names = sorted(_per_mcc_timers)
+    counter_names = sorted(_per_mcc_counters)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["mcc", "latency_s"] + ["%s_s" % name for name in timer_names] + counter_names)
+        for n, (mcc, latency) in enumerate(_per_mcc):
+            row = [mcc, latency]
+            row += [_sample(_per_mcc_timers[name], n, len(_per_mcc)) for name in timer_names]
+            row += [_sample(_per_mcc_counters[name], n, len(_per_mcc)) for name in counter_names]
+            writer.writerow(row)
+
+
+def export(path):
+    """ Writes collected values into a CSV or a JSON file according to the extension of *path*.
+    """
+    if path.endswith('.csv'):
+        export_csv(path)
+    else:
+        export_json(path)
+
+
+def _sample(samples, n, n_mcc):
+    # Stages and counters which appear later in a run have fewer samples, they are aligned to the last MCC
+    offset = n_mcc - len(samples)
+    return samples[n - offset] if n >= offset else 0
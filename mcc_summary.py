@@ -0,0 +1,287 @@
+import os
+import hashlib
+import logging
+import tempfile
+import numpy as np
+
+# Columns summarized in every bucket by their minima, maxima and histograms
+SUMMARY_COLUMNS = ("x", "y", "rvelocity")
+# Summaries of data files in read-only folders are stored here, see load_or_build
+SUMMARY_CACHE_FOLDER = os.path.join(tempfile.gettempdir(), "mcc_summary")
+
+
+def summary_path(data_path, folder=None):
+    """ Builds the path of a summary stored alongside a data file, i.e. data.mat -> data_summary.npz. A summary
+    stored in another *folder* has a hash of the absolute path of the data file in its name, i.e.
+    data.mat -> data_<hash>_summary.npz, so data files of the same name do not share it.
+
+    :param data_path: path of the radar data file
+    :param folder: folder of the summary, the folder of the data file if None
+    :return: path of the summary file
+    :rtype: str
+    """
+    if folder is None:
+        return os.path.splitext(data_path)[0] + '_summary.npz'
+    name = os.path.splitext(os.path.basename(data_path))[0]
+    digest = hashlib.md5(os.path.abspath(data_path).encode()).hexdigest()[:8]
+    return os.path.join(folder, "%s_%s_summary.npz" % (name, digest))
+
+
+class MCCSummaryPyramid(object):
+    def __init__(self, mcc_start, bucket_sizes, levels, edges):
+        """ Creates a pyramid of per-bucket summaries of detections. Level *k* splits the recording into buckets of
+        *bucket_sizes[k]* consecutive MCCs starting at *mcc_start*. Every level holds arrays indexed by buckets:
+
+        +-----------------+---------------------------------------------------------------------+
+        | Key             | Description                                                         |
+        +=================+=====================================================================+
+        | counts          | number of detections, (n_buckets,)                                  |
+        +-----------------+---------------------------------------------------------------------+
+        | counts_per_beam | number of detections per beam, (n_buckets, n_beams)                 |
+        +-----------------+---------------------------------------------------------------------+
+        | <col>_min       | minimum of the column, NaN for empty buckets, (n_buckets,)          |
+        +-----------------+---------------------------------------------------------------------+
+        | <col>_max       | maximum of the column, NaN for empty buckets, (n_buckets,)          |
+        +-----------------+---------------------------------------------------------------------+
+        | <col>_hist      | histogram of the column with bins given by edges, (n_buckets, bins) |
+        +-----------------+---------------------------------------------------------------------+
+
+        where <col> is one of SUMMARY_COLUMNS.
+
+        :param mcc_start: the first MCC of the first bucket
+        :param bucket_sizes: sizes of buckets of levels ordered from the finest one, each size is a multiple of the
+                             previous one
+        :param levels: list of dictionaries of per-bucket arrays, one per level
+        :param edges: dictionary of histogram bin edges keyed by column names
+        """
+        self._mcc_start = int(mcc_start)
+        self._bucket_sizes = tuple(int(size) for size in bucket_sizes)
+        self._levels = levels
+        self._edges = edges
+
+    @classmethod
+    def from_detection_list(cls, lst_det, bucket_sizes=(10, 100, 1000), bins=32, n_beams=4):
+        """ Builds the pyramid in one pass over detections. The finest level is computed from detections, every
+        coarser level is reduced from the previous one. The pyramid of an empty list has no buckets.
+
+        :param lst_det: list of detections
+        :param bucket_sizes: sizes of buckets in MCCs ordered from the finest level
+        :param bins: number of histogram bins of every column
+        :param n_beams: number of beams, see :meth:`data_containers.detection_histogram`
+        :type lst_det: DetectionList
+        :return: the pyramid
+        :rtype: MCCSummaryPyramid
+        """
+        bucket_sizes = sorted(bucket_sizes)
+        for finer, coarser in zip(bucket_sizes[:-1], bucket_sizes[1:]):
+            if coarser % finer:
+                raise ValueError("Bucket size %s is not a multiple of %s" % (coarser, finer))
+
+        data = lst_det.get_array_detections()
+        mcc = data["mcc"].astype(np.int64)
+        size = bucket_sizes[0]
+        if mcc.size:
+            mcc_start, mcc_end = int(mcc.min()), int(mcc.max())
+            n_buckets = (mcc_end - mcc_start) // bucket_sizes[-1] * (bucket_sizes[-1] // size) + \
+                bucket_sizes[-1] // size
+        else:
+            mcc_start, n_buckets = 0, 0
+        bucket = (mcc - mcc_start) // size
+
+        level = {"counts": np.bincount(bucket, minlength=n_buckets),
+                 "counts_per_beam": np.bincount(bucket * n_beams + data["beam"].astype(np.int64),
+                                                minlength=n_buckets * n_beams).reshape(-1, n_beams)}
+        edges = {}
+        for column in SUMMARY_COLUMNS:
+            values = data[column]
+            minima = np.full(n_buckets, np.inf)
+            maxima = np.full(n_buckets, -np.inf)
+            np.minimum.at(minima, bucket, values)
+            np.maximum.at(maxima, bucket, values)
+            edges[column] = np.linspace(values.min(), values.max(), bins + 1) if values.size else np.zeros(bins + 1)
+            idx = np.clip(np.searchsorted(edges[column], values, side='right') - 1, 0, bins - 1)
+            level[column + "_min"] = minima
+            level[column + "_max"] = maxima
+            level[column + "_hist"] = np.bincount(bucket * bins + idx, minlength=n_buckets * bins).reshape(-1, bins)
+
+        levels = [level]
+        for finer, coarser in zip(bucket_sizes[:-1], bucket_sizes[1:]):
+            levels.append(cls._reduce_level(levels[-1], coarser // finer))
+        for level in levels:
+            for column in SUMMARY_COLUMNS:
+                level[column + "_min"][np.isinf(level[column + "_min"])] = np.nan
+                level[column + "_max"][np.isinf(level[column + "_max"])] = np.nan
+        logging.getLogger(__name__).debug("MCCSummaryPyramid.from_detection_list: %s detections summarized in levels %s",
+                                          data["mcc"].size, bucket_sizes)
+        return cls(mcc_start, bucket_sizes, levels, edges)
+
+    @staticmethod
+    def _reduce_level(level, factor):
+        starts = np.arange(0, level["counts"].size, factor)
+        reduced = {}
+        for key, value in level.items():
+            if key.endswith("_min"):
+                reduced[key] = np.minimum.reduceat(value, starts)
+            elif key.endswith("_max"):
+                reduced[key] = np.maximum.reduceat(value, starts)
+            else:
+                reduced[key] = np.add.reduceat(value, starts, axis=0)
+        return reduced
+
+    def get_bucket_sizes(self):
+        return self._bucket_sizes
+
+    def get_edges(self, column):
+        return self._edges[column]
+
+    def get_bins(self):
+        return self._edges[SUMMARY_COLUMNS[0]].size - 1
+
+    def get_n_beams(self):
+        return self._levels[0]["counts_per_beam"].shape[1]
+
+    def get_level(self, bucket_size):
+        """ Returns per-bucket arrays of one level together with the first MCCs of its buckets.
+
+        :param bucket_size: size of buckets of the level
+        :return: dictionary of per-bucket arrays with an additional key 'mcc'
+        :rtype: dict
+        """
+        level = dict(self._levels[self._bucket_sizes.index(bucket_size)])
+        level["mcc"] = self._mcc_start + bucket_size * np.arange(level["counts"].size)
+        return level
+
+    def choose_level(self, mcc_interval, max_buckets=500):
+        """ Chooses the finest level which covers an interval of MCCs by at most *max_buckets* buckets.
+
+        :param mcc_interval: closed interval of MCCs
+        :param max_buckets: the largest number of buckets, i.e. points of an overview plot
+        :return: size of buckets of the chosen level
+        :rtype: int
+        """
+        for size in self._bucket_sizes:
+            if (mcc_interval[1] - mcc_interval[0]) // size + 1 <= max_buckets:
+                return size
+        return self._bucket_sizes[-1]
+
+    def query(self, mcc_interval):
+        """ Summarizes detections within a closed interval of MCCs. The interval is covered by the largest buckets
+        which fit into it, its ends by buckets of finer levels. MCCs which do not fill a whole bucket of the finest
+        level are answered by the whole bucket, so the ends of the interval are rounded out to the finest level.
+
+        :param mcc_interval: closed interval of MCCs
+        :return: dictionary with the same keys as levels have, see :class:`mcc_summary.MCCSummaryPyramid`
+        :rtype: dict
+        """
+        parts = []
+        self._cover(mcc_interval[0] - self._mcc_start, mcc_interval[1] + 1 - self._mcc_start,
+                    len(self._bucket_sizes) - 1, parts)
+
+        summary = {"counts": 0, "counts_per_beam": np.zeros(self.get_n_beams(), dtype=np.int64)}
+        for column in SUMMARY_COLUMNS:
+            summary[column + "_min"] = np.nan
+            summary[column + "_max"] = np.nan
+            summary[column + "_hist"] = np.zeros(self._edges[column].size - 1, dtype=np.int64)
+        for n_level, first, last in parts:
+            level = self._levels[n_level]
+            summary["counts"] += int(level["counts"][first:last].sum())
+            summary["counts_per_beam"] += level["counts_per_beam"][first:last].sum(axis=0)
+            # minima and maxima of empty buckets are NaN, parts without detections keep the summary NaN
+            empty = not level["counts"][first:last].any()
+            for column in SUMMARY_COLUMNS:
+                if not empty:
+                    summary[column + "_min"] = np.fmin(summary[column + "_min"],
+                                                       np.nanmin(level[column + "_min"][first:last]))
+                    summary[column + "_max"] = np.fmax(summary[column + "_max"],
+                                                       np.nanmax(level[column + "_max"][first:last]))
+                summary[column + "_hist"] += level[column + "_hist"][first:last].sum(axis=0)
+        return summary
+
+    def _cover(self, start, end, n_level, parts):
+        # Appends (level, first bucket, last bucket) triples which cover MCC offsets [start, end)
+        n_buckets = self._levels[n_level]["counts"].size
+        size = self._bucket_sizes[n_level]
+        if n_level == 0:
+            first, last = max(start // size, 0), min(-(-end // size), n_buckets)
+            if first < last:
+                parts.append((0, first, last))
+            return
+        first, last = max(-(-start // size), 0), min(end // size, n_buckets)
+        if first >= last:
+            self._cover(start, end, n_level - 1, parts)
+            return
+        parts.append((n_level, first, last))
+        self._cover(start, first * size, n_level - 1, parts)
+        self._cover(last * size, end, n_level - 1, parts)
+
+    def save(self, path):
+        """ Stores the pyramid into a .npz file, see :meth:`mcc_summary.summary_path`.
+        """
+        data = {"mcc_start": self._mcc_start, "bucket_sizes": np.array(self._bucket_sizes), "bins": self.get_bins(),
+                "n_beams": self.get_n_beams()}
+        for column, edges in self._edges.items():
+            data["edges_" + column] = edges
+        for size, level in zip(self._bucket_sizes, self._levels):
+            for key, value in level.items():
+                data["L%d_%s" % (size, key)] = value
+        np.savez_compressed(path, **data)
+
+    @classmethod
+    def load(cls, path):
+        """ Loads a pyramid stored by :meth:`mcc_summary.MCCSummaryPyramid.save`. Raises ValueError when the file
+        does not hold the settings of the pyramid or they do not match its arrays.
+        """
+        with np.load(path) as data:
+            if "bins" not in data.files or "n_beams" not in data.files:
+                raise ValueError("Summary %s does not hold bins and n_beams" % path)
+            bucket_sizes = [int(size) for size in data["bucket_sizes"]]
+            edges = {column: data["edges_" + column] for column in SUMMARY_COLUMNS}
+            levels = []
+            for size in bucket_sizes:
+                prefix = "L%d_" % size
+                levels.append({key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)})
+            pyramid = cls(int(data["mcc_start"]), bucket_sizes, levels, edges)
+            if (pyramid.get_bins(), pyramid.get_n_beams()) != (int(data["bins"]), int(data["n_beams"])):
+                raise ValueError("Summary %s does not match its bins and n_beams" % path)
+            return pyramid
+
+
+def load_or_build(lst_det, data_path, bucket_sizes=(10, 100, 1000), bins=32, n_beams=4,
+                  cache_folder=SUMMARY_CACHE_FOLDER):
+    """ Loads the pyramid stored alongside a data file, builds and stores it when it does not exist, is older than
+    the data file or was built with other settings. When the folder of the data file is read-only, the pyramid is
+    stored in *cache_folder*, see :meth:`mcc_summary.summary_path`; it is only returned if it cannot be stored at all.
+
+    :param lst_det: detections loaded from *data_path*
+    :param data_path: path of the radar data file
+    :param bucket_sizes: sizes of buckets in MCCs ordered from the finest level
+    :param bins: number of histogram bins of every column
+    :param n_beams: number of beams, see :meth:`data_containers.detection_histogram`
+    :param cache_folder: folder of summaries of data files in read-only folders
+    :return: the pyramid
+    :rtype: MCCSummaryPyramid
+    """
+    paths = (summary_path(data_path), summary_path(data_path, cache_folder))
+    settings = (tuple(sorted(bucket_sizes)), bins, n_beams)
+    for path in paths:
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_path):
+            try:
+                pyramid = MCCSummaryPyramid.load(path)
+            except ValueError as err:
+                logging.getLogger(__name__).info("load_or_build: %s", err)
+                continue
+            if (pyramid.get_bucket_sizes(), pyramid.get_bins(), pyramid.get_n_beams()) == settings:
+                return pyramid
+    pyramid = MCCSummaryPyramid.from_detection_list(lst_det, bucket_sizes, bins, n_beams)
+    for path in paths:
+        try:
+            if not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+                os.makedirs(os.path.dirname(os.path.abspath(path)))
+            pyramid.save(path)
+        except OSError as err:
+            logging.getLogger(__name__).warning("load_or_build: summary of %s not stored in %s: %s", data_path, path,
+                                                err)
+            continue
+        logging.getLogger(__name__).info("load_or_build: summary of %s stored in %s", data_path, path)
+        break
+    return pyramid
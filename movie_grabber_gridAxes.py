@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 
 import data_containers as dc
+import profiling
 import radar_plots as rplt
+import frame_rendering as fr
 import numpy as np
 
 
@@ -53,6 +55,19 @@ def main(conf_data):
     mcc_step = 1
 
     ###### Movie starts here:
+    if conf_data["movie"]:
+        frames = fr.get_frames(mcc_start, mcc_end, mcc_step)
+        fr.encode_movie(lst_det_left, lst_det_right, selection["beam_tp"], frames, conf_data["movie"],
+                        conf_data["workers"])
+        return
+    if conf_data["workers"] and conf_data["output_folder"]:
+        frames = fr.get_frames(mcc_start, mcc_end, mcc_step)
+        fr.render_frames(lst_det_left, lst_det_right, selection["beam_tp"], frames, conf_data["output_folder"],
+                         conf_data["workers"])
+        return
+
+    renderer = rplt.GridHistRenderer(lst_det_left, lst_det_right, selection["beam_tp"],
+                                     interactive=not conf_data["output_folder"])
     i_prev = mcc_start
     for i in range(mcc_start, mcc_end, mcc_step):  # number of frames frames
         if conf_data["output_folder"]:
@@ -64,7 +79,7 @@ def main(conf_data):
         else:
             output_path = None
         selection["mcc_tp"] = (i_prev,i)
-        rplt.static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, output_path)
+        renderer.render(selection["mcc_tp"], output_path)
 
         i_prev = i
 
@@ -72,4 +87,4 @@ def main(conf_data):
 if __name__ == "__main__":
     conf_data = dc.parse_CMDLine("./analysis.cnf")
     if conf_data:
-        main(conf_data)
+        profiling.run_profiled(main, conf_data)
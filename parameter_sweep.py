@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+import os
+import csv
+import time
+import logging
+import argparse
+import itertools
+import configparser
+import multiprocessing
+import numpy as np
+import data_containers as dc
+import track_management as tm
+import shared_dataset as sd
+import evaluation as ev
+import consistency
+
+# Columns of the results table which follow the swept parameters
+RESULT_COLUMNS = ("n_tracks", "mean_track_length", "assigned_ratio") + ev.SCENARIO_METRICS + \
+                 ("nis_mean", "nis_outside", "nis_consistent", "runtime_s", "mcc_per_s")
+
+# Scenarios shared by worker processes, set by _init_worker
+_worker = {}
+
+
+def expand_grid(grid):
+    """ Builds all combinations of values of swept parameters.
+
+    :param grid: lists of values keyed by names of parameters, see :attr:`track_management.TRACKING_PARAMETERS`
+    :return: list of configurations
+    :rtype: list of dict
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def sample_random(grid, n_samples, seed=0):
+    """ Draws configurations uniformly from the ranges spanned by listed values of every parameter. Parameters
+    whose listed values are integers are drawn as integers.
+
+    :param grid: lists of values keyed by names of parameters
+    :param n_samples: number of configurations
+    :param seed: seed of the random generator
+    :return: list of configurations
+    :rtype: list of dict
+    """
+    rnd = np.random.RandomState(seed)
+    configurations = [{} for _ in range(0, n_samples)]
+    for name in sorted(grid):
+        low, high = min(grid[name]), max(grid[name])
+        if all(float(value).is_integer() for value in grid[name]):
+            values = rnd.randint(int(low), int(high) + 1, n_samples)
+        else:
+            values = rnd.uniform(low, high, n_samples)
+        for configuration, value in zip(configurations, values):
+            configuration[name] = value.item()
+    return configurations
+
+
+def _init_worker(scenarios, selection, tracker_type, Tsampling):
+    _worker["scenarios"] = scenarios
+    _worker["selection"] = selection
+    _worker["tracker_type"] = tracker_type
+    _worker["Tsampling"] = Tsampling
+
+
+def evaluate_configuration(lst_det, mcc_interval, params, selection, tracker_type, Tsampling=50.0e-3,
+                           lst_ref=None, xcompensation=0.0):
+    """ Tracks one scenario with one configuration of the track management and measures the result. When DGPS
+    references are given, tracks are scored by :meth:`evaluation.evaluate_tracks` and its scenario metrics are
+    added, they are NaN otherwise.
+
+    +-------------------+---------------------------------------------------------------+
+    | Key               | Description                                                   |
+    +===================+===============================================================+
+    | n_tracks          | number of created tracks                                      |
+    +-------------------+---------------------------------------------------------------+
+    | mean_track_length | mean number of points of a track                              |
+    +-------------------+---------------------------------------------------------------+
+    | assigned_ratio    | fraction of processed detections which belong to some track   |
+    +-------------------+---------------------------------------------------------------+
+    | runtime_s         | time spent by the tracking                                    |
+    +-------------------+---------------------------------------------------------------+
+    | mcc_per_s         | number of processed MCCs per second                           |
+    +-------------------+---------------------------------------------------------------+
+    | nis_mean          | mean NIS of all updates of tracks, 2 for consistent filters   |
+    +-------------------+---------------------------------------------------------------+
+    | nis_outside       | fraction of updates out of chi-square bounds of NIS           |
+    +-------------------+---------------------------------------------------------------+
+    | nis_consistent    | fraction of tracks with the mean NIS within its bounds        |
+    +-------------------+---------------------------------------------------------------+
+
+    :param lst_det: detections of the scenario
+    :param mcc_interval: the first MCC to process and the MCC where the processing stops
+    :param params: parameters of the track management, see :meth:`track_management.TrackManager.from_params`
+    :param selection: a selection structure constraining detections which enter the tracker
+    :param lst_ref: DGPS references of the scenario or None
+    :param xcompensation: DGPS_xcompensation of the scenario
+    :return: dictionary of metrics
+    :rtype: dict
+    """
+    monitor = consistency.ConsistencyMonitor()
+    track_mgmt = tm.TrackManager.from_params(params, tracker_type, Tsampling, visualize=False,
+                                             monitor=monitor)
+    start = time.perf_counter()
+    track_mgmt.track_mcc_range(lst_det, selection, mcc_interval[0], mcc_interval[1])
+    runtime = time.perf_counter() - start
+
+    n_detections = len(lst_det.get_array_detections_selected(mcc=(mcc_interval[0], mcc_interval[1] - 1))["mcc"])
+    lengths = [len(track) for track in track_mgmt]
+    metrics = {"n_tracks": len(lengths),
+               "mean_track_length": float(np.mean(lengths)) if lengths else 0.0,
+               "assigned_ratio": sum(lengths) / n_detections if n_detections else 0.0,
+               "runtime_s": runtime,
+               "mcc_per_s": (mcc_interval[1] - mcc_interval[0]) / runtime if runtime else 0.0}
+    nis = monitor.get_summary("nis")
+    metrics.update({"nis_mean": nis["mean"], "nis_outside": nis["outside"],
+                    "nis_consistent": nis["n_tracks_consistent"] / nis["n_tracks"] if nis["n_tracks"] else np.nan})
+    if lst_ref is not None:
+        metrics.update(ev.evaluate_tracks(track_mgmt.port_data("tracks_array"), lst_ref, 'mccL', xcompensation,
+                                          (mcc_interval[0], mcc_interval[1] - 1))["scenario"])
+    else:
+        metrics.update({name: np.nan for name in ev.SCENARIO_METRICS})
+    return metrics
+
+
+def _run_job(job):
+    n_config, params, name = job
+    lst_det, mcc_interval, lst_ref, xcompensation = _worker["scenarios"][name]
+    row = {"config": n_config, "scenario": name}
+    row.update(params)
+    row.update(evaluate_configuration(lst_det, mcc_interval, params, _worker["selection"],
+                                      _worker["tracker_type"], _worker["Tsampling"], lst_ref, xcompensation))
+    logging.getLogger(__name__).info("_run_job: configuration %s of %s done in %.3f s",
+                                     n_config, name, row["runtime_s"])
+    return row
+
+
+def run_sweep(scenarios, configurations, selection, processes=None,
+              tracker_type={'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2}, Tsampling=50.0e-3):
+    """ Evaluates every configuration on every scenario in parallel worker processes. Scenarios are loaded once by
+    the caller and published into shared memory, workers attach to them without a copy and jobs carry only
+    parameters.
+
+    :param scenarios: tuples (detections, MCC interval, references or None, DGPS_xcompensation) keyed by names of
+                      scenarios, see :meth:`parameter_sweep.load_scenarios`
+    :param configurations: list of configurations, see :meth:`parameter_sweep.expand_grid`
+    :param selection: a selection structure constraining detections which enter the tracker
+    :param processes: number of worker processes, number of CPUs is used if None
+    :return: results table, one row per configuration and scenario
+    :rtype: list of dict
+    """
+    jobs = [(n_config, params, name) for n_config, params in enumerate(configurations) for name in sorted(scenarios)]
+    logging.getLogger(__name__).info("run_sweep: %s configurations on %s scenarios, %s jobs",
+                                     len(configurations), len(scenarios), len(jobs))
+    shared = {name: (sd.publish_detections(lst_det), mcc_interval,
+                     sd.publish_references(lst_ref) if lst_ref else None, xcompensation)
+              for name, (lst_det, mcc_interval, lst_ref, xcompensation) in scenarios.items()}
+    try:
+        with multiprocessing.Pool(processes, _init_worker, (shared, selection, tracker_type, Tsampling)) as pool:
+            return pool.map(_run_job, jobs, chunksize=1)
+    finally:
+        for shared_det, _, shared_ref, _ in shared.values():
+            shared_det.unlink()
+            if shared_ref is not None:
+                shared_ref.unlink()
+
+
+def write_results(rows, path):
+    """ Stores the results table into a CSV file, swept parameters precede metrics.
+    """
+    columns = ["config", "scenario"]
+    columns += sorted(set(key for row in rows for key in row) - set(columns) - set(RESULT_COLUMNS))
+    columns += [name for name in RESULT_COLUMNS if any(name in row for row in rows)]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def cnf_sweep_parser(cnf_file):
+    """ Reads the section [Sweep] of the configuration file. Options named as tracking parameters (see
+    :attr:`track_management.TRACKING_PARAMETERS`) hold comma separated values to sweep.
+
+    :param cnf_file: path of the configuration file
+    :return: settings of the sweep with the key 'grid' holding swept values
+    :rtype: dict
+    """
+    config = configparser.ConfigParser()
+    config.read(cnf_file)  # "./analysis.cnf"
+
+    settings = {"scenarios": [s.strip() for s in config.get('Sweep', 'scenarios').split(',') if s.strip()],
+                "mode": config.get('Sweep', 'mode', fallback='grid'),
+                "n_samples": int(config.get('Sweep', 'n_samples', fallback='20')),
+                "seed": int(config.get('Sweep', 'seed', fallback='0')),
+                "number_of_mcc": int(config.get('Sweep', 'number_of_mcc', fallback='0')),
+                "grid": {}}
+    for key, value in config.items('Sweep'):
+        if key in tm.TRACKING_PARAMETERS:
+            settings["grid"][key] = [type(tm.TRACKING_PARAMETERS[key])(s) for s in value.replace(' ', '').split(',')]
+    return settings
+
+
+def load_scenarios(cnf_file, names, dataset="new", number_of_mcc=0):
+    """ Loads detections of the left radar and DGPS references of every scenario. A name is either a scenario
+    defined in the configuration file or a path to a radar .mat file. References of a path are read from the file
+    <prefix>_DGPS.mat next to it (the layout written by scenario_generator), where the prefix is the path without
+    '_LeftRadar_RADAR.mat' or without the extension.
+
+    :return: tuples (detections, MCC interval, references or None, DGPS_xcompensation) keyed by names of scenarios
+    :rtype: dict
+    """
+    conf_data, _ = dc.cnf_file_parser(cnf_file)
+    path_data_folder = conf_data["path_new_data"] if dataset == "new" else conf_data["path_old_data"]
+    scenarios = {}
+    for name in names:
+        if name in conf_data["list_of_scenarios"]:
+            data_filenames = dc.cnf_datapaths_parser(cnf_file, name)
+            path = path_data_folder + data_filenames["filename_LeftRadar"]
+            dgps = data_filenames["filename_LeftDGPS"] or data_filenames["filename_BothDGPS"]
+            path_dgps = path_data_folder + dgps if dgps else None
+            xcompensation = float(data_filenames["DGPS_xcompensation"] or 0)
+        else:
+            path = name
+            prefix = name[:-len('_LeftRadar_RADAR.mat')] if name.endswith('_LeftRadar_RADAR.mat') else \
+                os.path.splitext(name)[0]
+            path_dgps = prefix + '_DGPS.mat' if os.path.exists(prefix + '_DGPS.mat') else None
+            xcompensation = 0.0
+        lst_det = dc.DetectionList()
+        lst_det.append_data_from_m_file(path, True, conf_data["EGO_car_width"])
+        mcc_start, mcc_end = lst_det.get_mcc_interval()
+        if number_of_mcc:
+            mcc_end = min(mcc_start + number_of_mcc, mcc_end)
+        lst_ref = None
+        if path_dgps:
+            lst_ref = dc.ReferenceList()
+            lst_ref.append_from_m_file(path_dgps)
+        scenarios[os.path.splitext(os.path.basename(name))[0]] = (lst_det, (mcc_start, mcc_end), lst_ref,
+                                                                  xcompensation)
+    return scenarios
+
+
+def parse_CMDLine():
+    parser = argparse.ArgumentParser(
+        description='''
+                            Parameter sweep of gates and memories of the track management
+                            evaluated on scenarios in parallel processes. The sweep is
+                            configured in the section [Sweep] of the configuration file.''')
+    parser.add_argument("-c", "--config", default="./analysis.cnf",
+                        help="Path of the configuration file.")
+    parser.add_argument("-d", "--dataset", default="new",
+                        help="Selects a dataset to process, the new one or the old one.")
+    parser.add_argument("-j", "--processes", type=int,
+                        help="Number of worker processes, number of CPUs is used by default.")
+    parser.add_argument("-o", "--output", default="sweep_results.csv",
+                        help="Stores the results table into a given CSV file.")
+    parser.add_argument("--from-cnf", action="store_true",
+                        help="Parameters which are not swept are read from [Track_management] and [TrackerKF].")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    argv = parse_CMDLine()
+    settings = cnf_sweep_parser(argv.config)
+    if settings["mode"] == "random":
+        configurations = sample_random(settings["grid"], settings["n_samples"], settings["seed"])
+    else:
+        configurations = expand_grid(settings["grid"])
+    if argv.from_cnf:
+        base = dc.cnf_tracking_parser(argv.config)
+        configurations = [dict(base, **configuration) for configuration in configurations]
+
+    selection = {"beam_tp": [0, 1, 2, 3],
+                 "mcc_tp": None, "x_tp": None, "y_tp": None,
+                 "rng_tp": None, "vel_tp": None, "az_tp": None, "trackID_tp": None}
+    scenarios = load_scenarios(argv.config, settings["scenarios"], argv.dataset, settings["number_of_mcc"])
+    rows = run_sweep(scenarios, configurations, selection, argv.processes)
+    write_results(rows, argv.output)
+
+    names = sorted(settings["grid"])
+    print(("%-6s %-12s " + "%12s " * len(names) + "%8s %10s %8s %8s %8s %8s %10s") %
+          tuple(["config", "scenario"] + names + ["tracks", "assigned", "RMSE", "GOSPA", "coverage", "time",
+                                                  "MCC/s"]))
+    for row in rows:
+        print(("%-6s %-12s " + "%12.4g " * len(names) + "%8d %10.3f %8.3f %8.3f %8.3f %8.3f %10.1f") %
+              tuple([row["config"], row["scenario"]] + [row[name] for name in names] +
+                    [row["n_tracks"], row["assigned_ratio"], row["rmse_pos"], row["gospa"], row["coverage"],
+                     row["runtime_s"], row["mcc_per_s"]]))
+    print("Results stored in:", argv.output)
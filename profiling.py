@@ -0,0 +1,136 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import collections
+
+PROFILE_MODES = ("off", "cprofile", "sampling")
+
+
+class _StackSampler(object):
+    def __init__(self, thread_id, interval):
+        """ Periodically samples the call stack of a given thread from a background thread.
+
+        :param thread_id: identifier of the sampled thread
+        :param interval: sampling period in seconds
+        """
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.stacks = collections.Counter()
+        self.n_samples = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s:%s)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.n_samples += 1
+
+
+def write_collapsed(stacks, path):
+    """ Writes stacks in the collapsed format, one line 'root;caller;callee count' per distinct stack. The file can
+    be fed directly into flamegraph.pl, speedscope or similar flame graph tools.
+
+    :param stacks: counts of samples keyed by tuples of frames ordered from the root
+    :param path: path of the output file
+    """
+    with open(path, 'w') as f:
+        for stack, n in sorted(stacks.items()):
+            f.write("%s %d\n" % (';'.join(stack), n))
+
+
+def summarize_samples(stacks, top=30):
+    """ Formats the top-N functions of a sampled profile ordered by their own samples.
+
+    :param stacks: counts of samples keyed by tuples of frames ordered from the root
+    :param top: number of listed functions
+    :return: text of the summary
+    :rtype: str
+    """
+    own = collections.Counter()
+    total = collections.Counter()
+    for stack, n in stacks.items():
+        own[stack[-1]] += n
+        for frame in set(stack):
+            total[frame] += n
+    n_samples = sum(stacks.values()) or 1
+    lines = ["%8s %8s %8s  %s" % ("own", "own%", "total%", "function")]
+    for frame, n in own.most_common(top):
+        lines.append("%8d %7.1f%% %7.1f%%  %s" % (n, 100.0 * n / n_samples, 100.0 * total[frame] / n_samples, frame))
+    return '\n'.join(lines)
+
+
+def run_profiled(func, conf_data, *args, **kwargs):
+    """ Calls *func* with *conf_data* and remaining arguments under the profiler selected by the command line
+    option --profile. Nothing is measured when the option is 'off'.
+
+    +-----------+-------------------------------------------------------------------------------+
+    | Mode      | Output files (prefix given by --profile-output)                               |
+    +===========+===============================================================================+
+    | off       | none                                                                          |
+    +-----------+-------------------------------------------------------------------------------+
+    | cprofile  | <prefix>.prof (pstats dump, e.g. for snakeviz), <prefix>.txt (top-N summary)  |
+    +-----------+-------------------------------------------------------------------------------+
+    | sampling  | <prefix>.collapsed (flame graph input), <prefix>.txt (top-N summary)          |
+    +-----------+-------------------------------------------------------------------------------+
+
+    :param func: the entry function of a script, usually main
+    :param conf_data: configuration returned by :meth:`data_containers.parse_CMDLine`
+    :return: the return value of *func*
+    """
+    mode = conf_data.get("profile") or "off"
+    if mode == "off":
+        return func(conf_data, *args, **kwargs)
+
+    logger = logging.getLogger(__name__)
+    prefix = conf_data.get("profile_output") or "profile_%s" % conf_data.get("scenario", "run")
+    top = conf_data.get("profile_top") or 30
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(conf_data, *args, **kwargs)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(prefix + ".prof")
+            s = io.StringIO()
+            pstats.Stats(profiler, stream=s).sort_stats('cumulative').print_stats(top)
+            with open(prefix + ".txt", 'w') as f:
+                f.write(s.getvalue())
+            logger.info("run_profiled: cProfile stats stored in %s.prof and %s.txt", prefix, prefix)
+
+    elif mode == "sampling":
+        sampler = _StackSampler(threading.get_ident(), conf_data.get("profile_interval") or 1.0e-3)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            return func(conf_data, *args, **kwargs)
+        finally:
+            sampler.stop()
+            write_collapsed(sampler.stacks, prefix + ".collapsed")
+            with open(prefix + ".txt", 'w') as f:
+                f.write("%d samples in %.3f s\n" % (sampler.n_samples, time.perf_counter() - start))
+                f.write(summarize_samples(sampler.stacks, top) + '\n')
+            logger.info("run_profiled: %s stack samples stored in %s.collapsed and %s.txt",
+                        sampler.n_samples, prefix, prefix)
+    else:
+        raise ValueError("Unknown profile mode %s, expected one of %s" % (mode, ', '.join(PROFILE_MODES)))
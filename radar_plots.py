@@ -6,29 +6,12 @@ import matplotlib.patches as patches
 import mpl_toolkits.axes_grid.axes_size as Size
 from mpl_toolkits.axes_grid import Divider
 import matplotlib
+from matplotlib.colors import LogNorm
 import copy
+from data_containers import detection_histogram
 
-def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fname_det):
-    """
-
-    :param lst_det_left:
-    :param lst_det_right:
-    :param selection:
-    :param fname_det:
-    """
-    # Plot starts here:
-    cms = matplotlib.cm
-    color_map_left = cms.Blues
-    color_map_right = cms.RdPu
-
-    if fname_det:
-        f1 = plt.figure(1, (23, 13), dpi=1200)
-    else:
-        f1 = plt.figure(1, (15, 8))
-
-    vel_range = range(-90, 70)
-
-    f1.clf()
+def _grid_hist_axes(f1):
+    # Seven axes of the grid-hist layout: x-y plot, four velocity histograms, azimuth-range and azimuth-velocity
     # the rect parameter is ignored as we set the axes_locator
     rect = (0.05, 0.07, 0.9, 0.87)
     f1ax = [f1.add_axes(rect, label="%d" % i) for i in range(7)]
@@ -57,6 +40,31 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
     f1ax[4].grid(True)
     f1ax[5].grid(True)
     f1ax[6].grid(True)
+    return f1ax
+
+
+def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fname_det):
+    """
+
+    :param lst_det_left:
+    :param lst_det_right:
+    :param selection:
+    :param fname_det:
+    """
+    # Plot starts here:
+    cms = matplotlib.cm
+    color_map_left = cms.Blues
+    color_map_right = cms.RdPu
+
+    if fname_det:
+        f1 = plt.figure(1, (23, 13), dpi=1200)
+    else:
+        f1 = plt.figure(1, (15, 8))
+
+    vel_range = range(-90, 70)
+
+    f1.clf()
+    f1ax = _grid_hist_axes(f1)
 
     number_of_dets_left = 0
     number_of_dets_left_processed = 0
@@ -70,6 +78,10 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
             LR_data_exists = True
             f1ax[2].hist(LR_data["rvelocity"], vel_range, color=color_map_left(0.4), normed=1)
             number_of_dets_left = np.size(LR_data["mcc"])
+            LR_histogram = detection_histogram(LR_data["mcc"], LR_data["beam"])
+            # a beam listed twice in beam_tp is counted once
+            number_of_dets_left_processed = int(
+                LR_histogram["counts_per_beam"][:, np.unique(selection["beam_tp"])].sum())
 
             if selection["beam_tp"].count(0):
                 selection_tp = copy.deepcopy(selection)
@@ -83,7 +95,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_left(0.2), marker='o', ls='None', label='Left RDR, beam 0')
                 f1ax[5].plot(-180 * LR0_data["razimuth"] / np.pi, LR0_data["range"],
                              color=color_map_left(0.2), marker='o', ls='None', label='Left RDR, beam 0')
-                number_of_dets_left_processed += np.size(LR0_data["mcc"])
 
             if selection["beam_tp"].count(1):
                 selection_tp = copy.deepcopy(selection)
@@ -97,7 +108,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_left(0.4), marker='o', ls='None', label='Left RDR, beam 1')
                 f1ax[5].plot(-180 * LR1_data["razimuth"] / np.pi, LR1_data["range"],
                              color=color_map_left(0.4), marker='o', ls='None', label='Left RDR, beam 1')
-                number_of_dets_left_processed += np.size(LR1_data["mcc"])
 
             if selection["beam_tp"].count(2):
                 selection_tp = copy.deepcopy(selection)
@@ -111,7 +121,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_left(0.6), marker='o', ls='None', label='Left RDR, beam 2')
                 f1ax[5].plot(-180 * LR2_data["azimuth"] / np.pi, LR2_data["range"],
                              color=color_map_left(0.6), marker='o', ls='None', label='Left RDR, beam 2')
-                number_of_dets_left_processed += np.size(LR2_data["mcc"])
 
             if selection["beam_tp"].count(3):
                 selection_tp = copy.deepcopy(selection)
@@ -125,7 +134,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_left(0.8), marker='o', ls='None', label='Left RDR, beam 3')
                 f1ax[5].plot(-180 * LR3_data["razimuth"] / np.pi, LR3_data["range"],
                              color=color_map_left(0.8), marker='o', ls='None', label='Left RDR, beam 3')
-                number_of_dets_left_processed += np.size(LR3_data["mcc"])
 
             plt.draw()
         else:
@@ -138,6 +146,10 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
             RR_data_exists = True
             f1ax[4].hist(RR_data["velocity"], vel_range, color=color_map_left(0.4), normed=1)
             number_of_dets_right = np.size(RR_data["mcc"])
+            RR_histogram = detection_histogram(RR_data["mcc"], RR_data["beam"])
+            # a beam listed twice in beam_tp is counted once
+            number_of_dets_right_processed = int(
+                RR_histogram["counts_per_beam"][:, np.unique(selection["beam_tp"])].sum())
 
             if selection["beam_tp"].count(0):
                 selection_tp = copy.deepcopy(selection)
@@ -151,7 +163,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_right(0.2), marker='o', ls='None', label='Right RDR, beam 0')
                 f1ax[5].plot(-180 * RR0_data["azimuth"] / np.pi, RR0_data["range"],
                              color=color_map_right(0.2), marker='o', ls='None', label='Right RDR, beam 0')
-                number_of_dets_right_processed += np.size(RR0_data["mcc"])
 
             if selection["beam_tp"].count(1):
                 selection_tp = copy.deepcopy(selection)
@@ -165,7 +176,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_right(0.4), marker='o', ls='None', label='Right RDR, beam 1')
                 f1ax[5].plot(-180 * RR1_data["azimuth"] / np.pi, RR1_data["range"],
                              color=color_map_right(0.4), marker='o', ls='None', label='Right RDR, beam 1')
-                number_of_dets_right_processed += np.size(RR1_data["mcc"])
 
             if selection["beam_tp"].count(2):
                 selection_tp = copy.deepcopy(selection)
@@ -179,7 +189,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_right(0.6), marker='o', ls='None', label='Right RDR, beam 2')
                 f1ax[5].plot(-180 * RR2_data["azimuth"] / np.pi, RR2_data["range"],
                              color=color_map_right(0.6), marker='o', ls='None', label='Right RDR, beam 2')
-                number_of_dets_right_processed += np.size(RR2_data["mcc"])
 
             if selection["beam_tp"].count(3):
                 selection_tp = copy.deepcopy(selection)
@@ -193,7 +202,6 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
                              color=color_map_right(0.8), marker='o', ls='None', label='Right RDR, beam 3')
                 f1ax[5].plot(-180 * RR3_data["azimuth"] / np.pi, RR3_data["range"],
                              color=color_map_right(0.8), marker='o', ls='None', label='Right RDR, beam 3')
-                number_of_dets_right_processed += np.size(RR3_data["mcc"])
 
             plt.draw()
         else:
@@ -227,7 +235,212 @@ def static_plot_grid_hist_selections(lst_det_left, lst_det_right, selection, fna
         print("Nothing to plot for MCC:", selection["mcc_tp"])
 
 
-def static_plot_selections(lst_det_left, lst_det_right, selection, fname_det):
+class GridHistRenderer(object):
+    def __init__(self, lst_det_left, lst_det_right, beams=(0, 1, 2, 3), interactive=False, dpi=100):
+        """ Renders frames of the grid-hist layout of :meth:`radar_plots.static_plot_grid_hist_selections`
+        incrementally. The figure, its axes and all artists are created once, every frame only replaces data of
+        lines (set_data) and heights of histogram bars. Detections of a frame are sliced from arrays sorted by MCC
+        through per-MCC offsets, so a frame costs O(detections of the frame).
+
+        In the interactive mode frames are drawn by blitting, only the changing artists are redrawn over a cached
+        background.
+
+        :param lst_det_left: detections of the left radar or None
+        :param lst_det_right: detections of the right radar or None
+        :param beams: beams to plot
+        :param interactive: TRUE to show frames on screen with blitting, FALSE to render them for files only
+        :param dpi: resolution of stored frames
+        """
+        cms = matplotlib.cm
+        self._beams = list(beams)
+        self._interactive = interactive
+        self._dpi = dpi
+        self._vel_edges = np.arange(-90, 70)
+
+        if interactive:
+            self._f1 = plt.figure(1, (15, 8))
+        else:
+            self._f1 = plt.figure(1, (23, 13))
+        self._f1.clf()
+        f1ax = _grid_hist_axes(self._f1)
+        self._f1ax = f1ax
+        for ax in f1ax[1:5]:
+            ax.set_xlim(self._vel_edges[0], self._vel_edges[-1])
+            ax.set_ylim(0, 1)
+
+        self._radars = []
+        for lst_det, color_map, radar, ax_sep, ax_all in ((lst_det_left, cms.Blues, 'Left', f1ax[1], f1ax[2]),
+                                                          (lst_det_right, cms.RdPu, 'Right', f1ax[3], f1ax[4])):
+            if not lst_det:
+                self._radars.append(None)
+                continue
+            data = lst_det.get_array_detections()
+            histogram = detection_histogram(data["mcc"], data["beam"])
+            frame_data = {key: data[key][histogram["order"]] for key in ("x", "y", "razimuth", "range",
+                                                                          "rvelocity", "beam")}
+            frame_data["mcc_start"] = histogram["mcc"][0]
+            frame_data["offsets"] = histogram["offsets"]
+
+            artists = {"xy": {}, "az_rng": {}, "az_vel": {}, "hist": {}}
+            for beam in self._beams:
+                color = color_map(0.2 * (beam + 1))
+                label = '%s RDR, beam %d' % (radar, beam)
+                artists["xy"][beam], = f1ax[0].plot([], [], color=color, marker='o', ls='None', label=label)
+                artists["az_rng"][beam], = f1ax[5].plot([], [], color=color, marker='o', ls='None', label=label)
+                artists["az_vel"][beam], = f1ax[6].plot([], [], color=color, marker='o', ls='None', label=label)
+                artists["hist"][beam] = ax_sep.bar(self._vel_edges[:-1], np.zeros(self._vel_edges.size - 1), 1,
+                                                   align='edge', color=color, alpha=0.6, label='beam %d' % beam)
+            artists["hist_all"] = ax_all.bar(self._vel_edges[:-1], np.zeros(self._vel_edges.size - 1), 1,
+                                             align='edge', color=color_map(0.4))
+            self._radars.append((frame_data, artists))
+
+        f1ax[0].legend(loc='upper right', bbox_to_anchor=(1.0, 1.0))
+        f1ax[0].set_xlabel('x [meters]')
+        f1ax[0].set_ylabel('y [meters]')
+        f1ax[1].set_ylabel('Left RDR, separate')
+        f1ax[1].set_xlabel('Velocity $v(mcc)$ [m/s]')
+        f1ax[2].set_ylabel('Left RDR, all')
+        f1ax[3].set_ylabel('Right RDR, separate')
+        f1ax[4].set_ylabel('Right RDR, all')
+        f1ax[5].set_xlabel('Azimuth [deg]')
+        f1ax[5].set_ylabel('Range [meters]')
+        f1ax[6].set_ylabel('Velocity [km h$^{-1}$]')
+        self._title = self._f1.suptitle('', fontsize=14, fontweight='bold')
+
+        self._background = None
+        if interactive:
+            for artist in self._get_artists():
+                artist.set_animated(True)
+            plt.show(block=False)
+            self._f1.canvas.draw()
+            self._background = self._f1.canvas.copy_from_bbox(self._f1.bbox)
+
+    def _get_artists(self):
+        artists = [self._title]
+        for radar in self._radars:
+            if radar:
+                for beam in self._beams:
+                    artists += [radar[1]["xy"][beam], radar[1]["az_rng"][beam], radar[1]["az_vel"][beam]]
+                    artists += list(radar[1]["hist"][beam])
+                artists += list(radar[1]["hist_all"])
+        return artists
+
+    def render(self, mcc_interval, fname_det=None):
+        """ Renders one frame with detections of a closed interval of MCCs.
+
+        :param mcc_interval: closed interval of MCCs
+        :param fname_det: the frame is stored into the file if given
+        :return: numbers of detections of the left and the right radar in selected beams
+        :rtype: (int, int)
+        """
+        number_of_dets = [0, 0]
+        for n, radar in enumerate(self._radars):
+            if not radar:
+                continue
+            frame_data, artists = radar
+            i = min(max(mcc_interval[0] - frame_data["mcc_start"], 0), frame_data["offsets"].size - 1)
+            j = min(max(mcc_interval[1] + 1 - frame_data["mcc_start"], 0), frame_data["offsets"].size - 1)
+            d = slice(frame_data["offsets"][i], frame_data["offsets"][j])
+            beam = frame_data["beam"][d]
+            in_beams = np.isin(beam, self._beams)
+            number_of_dets[n] = int(np.count_nonzero(in_beams))
+
+            velocity = frame_data["rvelocity"][d]
+            azimuth = -180 * frame_data["razimuth"][d] / np.pi
+            for b in self._beams:
+                sel = beam == b
+                artists["xy"][b].set_data(frame_data["x"][d][sel], frame_data["y"][d][sel])
+                artists["az_rng"][b].set_data(azimuth[sel], frame_data["range"][d][sel])
+                artists["az_vel"][b].set_data(azimuth[sel], velocity[sel])
+                self._set_heights(artists["hist"][b], velocity[sel])
+            self._set_heights(artists["hist_all"], velocity[in_beams])
+
+        self._title.set_text("MCC: %08d Num of Det In Selected Beams: L=%d R=%d" % (mcc_interval[0],
+                                                                                   number_of_dets[0],
+                                                                                   number_of_dets[1]))
+        if self._interactive:
+            canvas = self._f1.canvas
+            canvas.restore_region(self._background)
+            for artist in self._get_artists():
+                self._f1.draw_artist(artist)
+            canvas.blit(self._f1.bbox)
+            canvas.flush_events()
+        if fname_det:
+            self._f1.savefig(fname_det, format='png', dpi=self._dpi)
+        return number_of_dets[0], number_of_dets[1]
+
+    def _set_heights(self, bars, values):
+        # Normalized histogram as drawn by hist(..., normed=1), bins have the unit width
+        counts = np.histogram(values, self._vel_edges)[0]
+        heights = counts / counts.sum() if counts.sum() else counts
+        for rect, height in zip(bars, heights):
+            rect.set_height(height)
+
+
+# Extents of planes rasterized by plot_density, the same as axes of detection plots
+DENSITY_EXTENTS = {"xy": (-40, 100, -80, 80)}
+
+
+def plot_density(ax, u, v, extent, color_map, bins=(280, 320), label=None):
+    """ Draws points as a density raster instead of individual markers. Points are binned by a 2D histogram and
+    the histogram is drawn as one mesh of cells with a logarithmic color scale, empty bins stay transparent. The cost
+    of drawing does not depend on the number of points. A mesh is used instead of an image, the PostScript backend
+    resamples images to the dpi of the figure, which does not fit into memory at 1200 dpi.
+
+    :param ax: axes to draw into
+    :param u: horizontal coordinates of points, i.e. x or azimuth
+    :param v: vertical coordinates of points, i.e. y, range or velocity
+    :param extent: (u_min, u_max, v_min, v_max) of the raster, see DENSITY_EXTENTS
+    :param color_map: color map of the raster
+    :param bins: number of bins along u and v
+    :param label: legend label
+    :return: the mesh
+    """
+    counts, u_edges, v_edges = np.histogram2d(u, v, bins=bins, range=[extent[:2], extent[2:]])
+    mesh = ax.pcolormesh(u_edges, v_edges, np.ma.masked_equal(counts.T, 0), cmap=color_map, norm=LogNorm(),
+                         alpha=0.8)
+    if label:
+        ax.plot([], [], color=color_map(0.7), marker='s', ls='None', label=label)
+    return mesh
+
+
+def plot_detections_selected(ax, lst_det_left, lst_det_right, selection, color_map_left, color_map_right,
+                             density_threshold=50000):
+    """ Draws selected detections of both radars into x-y axes. Every radar is scanned once, detections are drawn
+    per beam as markers or, when more than *density_threshold* detections of both radars are selected, as density
+    rasters, see :func:`radar_plots.plot_density`.
+
+    :param ax: axes to draw into
+    :param lst_det_left: detections of the left radar or None
+    :param lst_det_right: detections of the right radar or None
+    :param selection: selection of detections, see :meth:`data_containers.DetectionList.get_array_detections_selected`
+    :param density_threshold: the largest number of detections drawn as markers, markers are always drawn if None
+    :return: numbers of drawn detections of the left and of the right radar
+    :rtype: tuple
+    """
+    radars = [(lst_det.get_array_detections_selected(selection=selection), color_map, radar)
+              for lst_det, color_map, radar in ((lst_det_left, color_map_left, 'Left'),
+                                                (lst_det_right, color_map_right, 'Right')) if lst_det]
+    density = density_threshold is not None and \
+        sum(np.size(data["mcc"]) for data, _, _ in radars) > density_threshold
+
+    numbers_of_dets = {'Left': 0, 'Right': 0}
+    for data, color_map, radar in radars:
+        if density:
+            plot_density(ax, data["x"], data["y"], DENSITY_EXTENTS["xy"], color_map, label='%s RDR, density' % radar)
+            numbers_of_dets[radar] = np.size(data["mcc"])
+        else:
+            for beam in range(0, 4):
+                if selection["beam_tp"].count(beam):
+                    in_beam = data["beam"] == beam
+                    ax.plot(data["x"][in_beam], data["y"][in_beam], color=color_map(0.2 * (beam + 1)), marker='o',
+                            ls='None', label='%s RDR, beam %d' % (radar, beam))
+                    numbers_of_dets[radar] += np.count_nonzero(in_beam)
+        plt.draw()
+    return numbers_of_dets['Left'], numbers_of_dets['Right']
+
+
+def static_plot_selections(lst_det_left, lst_det_right, selection, fname_det, density_threshold=50000):
     # Plot starts here:
     cms = matplotlib.cm
     color_map_left = cms.Blues
@@ -243,81 +456,8 @@ def static_plot_selections(lst_det_left, lst_det_right, selection, fname_det):
     f1ax1.axis([-40, 100, -80, 80])
     plt.title('Detections', loc='left')
 
-    number_of_dets_left_processed = 0
-    number_of_dets_right_processed = 0
-    # Left radar plot
-    if lst_det_left:
-        if selection["beam_tp"].count(0):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [0]
-            LR0_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-
-            f1ax1.plot(LR0_data["x"], LR0_data["y"],
-                       color=color_map_left(0.2), marker='o', ls='None', label='Left RDR, beam 0')
-            number_of_dets_left_processed += np.size(LR0_data["mcc"])
-
-        if selection["beam_tp"].count(1):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [1]
-            LR1_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR1_data["x"], LR1_data["y"],
-                       color=color_map_left(0.4), marker='o', ls='None', label='Left RDR, beam 1')
-            number_of_dets_left_processed += np.size(LR1_data["mcc"])
-
-        if selection["beam_tp"].count(2):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [2]
-            LR2_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR2_data["x"], LR2_data["y"],
-                       color=color_map_left(0.6), marker='o', ls='None', label='Left RDR, beam 2')
-            number_of_dets_left_processed += np.size(LR2_data["mcc"])
-
-        if selection["beam_tp"].count(3):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [3]
-            LR3_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR3_data["x"], LR3_data["y"],
-                       color=color_map_left(0.8), marker='o', ls='None', label='Left RDR, beam 3')
-            number_of_dets_left_processed += np.size(LR3_data["mcc"])
-
-        plt.draw()
-
-    # Right radar plot
-    if lst_det_right:
-
-        if selection["beam_tp"].count(0):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [0]
-            RR0_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR0_data["x"], RR0_data["y"],
-                       color=color_map_right(0.2), marker='o', ls='None', label='Right RDR, beam 0')
-            number_of_dets_right_processed += np.size(RR0_data["mcc"])
-
-        if selection["beam_tp"].count(1):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [1]
-            RR1_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR1_data["x"], RR1_data["y"],
-                       color=color_map_right(0.4), marker='o', ls='None', label='Right RDR, beam 1')
-            number_of_dets_right_processed += np.size(RR1_data["mcc"])
-
-        if selection["beam_tp"].count(2):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [2]
-            RR2_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR2_data["x"], RR2_data["y"],
-                       color=color_map_right(0.6), marker='o', ls='None', label='Right RDR, beam 2')
-            number_of_dets_right_processed += np.size(RR2_data["mcc"])
-
-        if selection["beam_tp"].count(3):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [3]
-            RR3_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR3_data["x"], RR3_data["y"],
-                       color=color_map_right(0.8), marker='o', ls='None', label='Right RDR, beam 3')
-            number_of_dets_right_processed += np.size(RR3_data["mcc"])
-
-        plt.draw()
+    number_of_dets_left_processed, number_of_dets_right_processed = plot_detections_selected(
+        f1ax1, lst_det_left, lst_det_right, selection, color_map_left, color_map_right, density_threshold)
 
     lgd2 = f1ax1.legend(loc='upper right', bbox_to_anchor=(1.0, 1.0))
 
@@ -333,9 +473,78 @@ def static_plot_selections(lst_det_left, lst_det_right, selection, fname_det):
         plt.show()
 
 
+def static_plot_mcc_overview(pyramid_left, pyramid_right, mcc_interval, fname_det, max_buckets=500):
+    """ Plots an overview of a whole recording from summary pyramids, see :class:`mcc_summary.MCCSummaryPyramid`.
+    The level with at most *max_buckets* buckets within the interval is used, so the plot costs O(buckets) instead
+    of O(detections).
+
+    :param pyramid_left: summary of the left radar or None
+    :param pyramid_right: summary of the right radar or None
+    :param mcc_interval: closed interval of MCCs to plot
+    :param fname_det: the plot is stored into the file if given, shown otherwise
+    :param max_buckets: the largest number of buckets plotted per radar
+    """
+    cms = matplotlib.cm
+    color_map_left = cms.Blues
+    color_map_right = cms.RdPu
+
+    if fname_det:
+        f1 = plt.figure(1, (23, 13), dpi=1200)
+    else:
+        f1 = plt.figure(1, (15, 8))
+    f1ax = [f1.add_subplot(311), f1.add_subplot(312), f1.add_subplot(313)]
+    for ax in f1ax:
+        ax.grid(True)
+
+    number_of_dets_left = 0
+    number_of_dets_right = 0
+    for pyramid, color_map, radar in ((pyramid_left, color_map_left, 'Left'),
+                                      (pyramid_right, color_map_right, 'Right')):
+        if not pyramid:
+            continue
+        size = pyramid.choose_level(mcc_interval, max_buckets)
+        level = pyramid.get_level(size)
+        inside = (mcc_interval[0] - size < level["mcc"]) & (level["mcc"] <= mcc_interval[1])
+        mcc = level["mcc"][inside]
+
+        bottom = np.zeros(mcc.size)
+        for beam in range(0, level["counts_per_beam"].shape[1]):
+            counts = level["counts_per_beam"][inside, beam] / size
+            f1ax[0].bar(mcc, counts, size, bottom=bottom, align='edge', color=color_map(0.2 * (beam + 1)),
+                        label='%s RDR, beam %d' % (radar, beam))
+            bottom += counts
+        f1ax[1].fill_between(mcc, level["rvelocity_min"][inside], level["rvelocity_max"][inside], step='post',
+                             color=color_map(0.6), alpha=0.5, label='%s RDR' % radar)
+        edges = pyramid.get_edges("rvelocity")
+        f1ax[2].imshow(np.log1p(level["rvelocity_hist"][inside].T), aspect='auto', origin='lower',
+                       cmap=color_map, alpha=0.7,
+                       extent=(mcc[0], mcc[-1] + size, edges[0], edges[-1]) if mcc.size else None)
+        summary = pyramid.query(mcc_interval)
+        if radar == 'Left':
+            number_of_dets_left = summary["counts"]
+        else:
+            number_of_dets_right = summary["counts"]
+
+    f1ax[0].legend(loc='upper right', bbox_to_anchor=(1.0, 1.0))
+    f1ax[0].set_ylabel('Detections per MCC')
+    f1ax[1].legend(loc='upper right', bbox_to_anchor=(1.0, 1.0))
+    f1ax[1].set_ylabel('Velocity min-max [m/s]')
+    f1ax[2].set_ylabel('Velocity [m/s]')
+    f1ax[2].set_xlabel('MCC')
+
+    tit = "MCC: %08d - %08d Num of Det: L=%d R=%d" % (mcc_interval[0], mcc_interval[1],
+                                                     number_of_dets_left, number_of_dets_right)
+    f1.suptitle(tit, fontsize=14, fontweight='bold')
+
+    if fname_det:
+        f1.savefig(fname_det, format='eps', dpi=1200)
+    else:
+        plt.show()
+
+
 def static_plotREF_selections(lst_det_left, lst_det_right,
                               lst_ref_left, lst_ref_right, lst_ref_both,
-                              selection, fname_det, DGPS_xcompensation):
+                              selection, fname_det, DGPS_xcompensation, density_threshold=50000):
     # Plot starts here:
     cms = matplotlib.cm
     color_map_left = cms.Blues
@@ -352,81 +561,8 @@ def static_plotREF_selections(lst_det_left, lst_det_right,
     f1ax1.axis([-40, 100, -80, 80])
     plt.title('Detections', loc='left')
 
-    number_of_dets_left_processed = 0
-    number_of_dets_right_processed = 0
-    # Left radar plot
-    if lst_det_left:
-        if selection["beam_tp"].count(0):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [0]
-            LR0_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-
-            f1ax1.plot(LR0_data["x"], LR0_data["y"],
-                       color=color_map_left(0.2), marker='o', ls='None', label='Left RDR, beam 0')
-            number_of_dets_left_processed += np.size(LR0_data["mcc"])
-
-        if selection["beam_tp"].count(1):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [1]
-            LR1_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR1_data["x"], LR1_data["y"],
-                       color=color_map_left(0.4), marker='o', ls='None', label='Left RDR, beam 1')
-            number_of_dets_left_processed += np.size(LR1_data["mcc"])
-
-        if selection["beam_tp"].count(2):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [2]
-            LR2_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR2_data["x"], LR2_data["y"],
-                       color=color_map_left(0.6), marker='o', ls='None', label='Left RDR, beam 2')
-            number_of_dets_left_processed += np.size(LR2_data["mcc"])
-
-        if selection["beam_tp"].count(3):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [3]
-            LR3_data = lst_det_left.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(LR3_data["x"], LR3_data["y"],
-                       color=color_map_left(0.8), marker='o', ls='None', label='Left RDR, beam 3')
-            number_of_dets_left_processed += np.size(LR3_data["mcc"])
-
-        plt.draw()
-
-    # Right radar plot
-    if lst_det_right:
-
-        if selection["beam_tp"].count(0):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [0]
-            RR0_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR0_data["x"], RR0_data["y"],
-                       color=color_map_right(0.2), marker='o', ls='None', label='Right RDR, beam 0')
-            number_of_dets_right_processed += np.size(RR0_data["mcc"])
-
-        if selection["beam_tp"].count(1):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [1]
-            RR1_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR1_data["x"], RR1_data["y"],
-                       color=color_map_right(0.4), marker='o', ls='None', label='Right RDR, beam 1')
-            number_of_dets_right_processed += np.size(RR1_data["mcc"])
-
-        if selection["beam_tp"].count(2):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [2]
-            RR2_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR2_data["x"], RR2_data["y"],
-                       color=color_map_right(0.6), marker='o', ls='None', label='Right RDR, beam 2')
-            number_of_dets_right_processed += np.size(RR2_data["mcc"])
-
-        if selection["beam_tp"].count(3):
-            selection_tp = copy.deepcopy(selection)
-            selection_tp["beam_tp"] = [3]
-            RR3_data = lst_det_right.get_array_detections_selected(selection=selection_tp)
-            f1ax1.plot(RR3_data["x"], RR3_data["y"],
-                       color=color_map_right(0.8), marker='o', ls='None', label='Right RDR, beam 3')
-            number_of_dets_right_processed += np.size(RR3_data["mcc"])
-
-        plt.draw()
+    number_of_dets_left_processed, number_of_dets_right_processed = plot_detections_selected(
+        f1ax1, lst_det_left, lst_det_right, selection, color_map_left, color_map_right, density_threshold)
 
     # Reference plot
     if lst_ref_left:
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import numpy as np
+import scipy.io as sio
+
+
+class ScenarioGenerator(object):
+    def __init__(self, n_targets=1, n_mcc=1000, mcc_start=1000, clutter_density=2.0,
+                 beam_probabilities=(0.25, 0.25, 0.25, 0.25), p_detection=0.9,
+                 sigma_rng=0.1, sigma_az=0.01, sigma_vel=0.1, Tsampling=50.0e-3, car_width=1.88, seed=0):
+        """ Creates a generator of synthetic radar scenarios with a known ground truth. Targets move along straight
+        lines with constant velocities in the EGO car's coordinate system, clutter detections are spread uniformly
+        within the field of view of the radar.
+
+        Generated files have exactly the layout read by :meth:`data_containers.DetectionList.append_data_from_m_file`
+        and :meth:`data_containers.ReferenceList.append_from_m_file`.
+
+        :param n_targets: number of targets
+        :param n_mcc: duration of the scenario in MCCs
+        :param mcc_start: the first MCC of the scenario
+        :param clutter_density: mean number of clutter detections per MCC
+        :param beam_probabilities: probabilities with which a detection is assigned to beams 0, 1, 2 and 3
+        :param p_detection: probability of detection of a target in one MCC
+        :param sigma_rng: standard deviation of the range noise in meters
+        :param sigma_az: standard deviation of the azimuth noise in radians
+        :param sigma_vel: standard deviation of the radar velocity noise in meters per second
+        :param Tsampling: sampling period of the radar
+        :param car_width: the width of the EGO car, see :meth:`data_containers.DetectionPoint`
+        :param seed: seed of the random generator, the same seed gives the same scenario
+
+        :type n_targets: int
+        :type n_mcc: int
+        :type mcc_start: int
+        :type clutter_density: float
+        :type beam_probabilities: tuple of floats
+        :type p_detection: float
+        :type sigma_rng: float
+        :type sigma_az: float
+        :type sigma_vel: float
+        :type Tsampling: float
+        :type car_width: float
+        :type seed: int
+        """
+        self._n_targets = n_targets
+        self._n_mcc = n_mcc
+        self._mcc_start = mcc_start
+        self._clutter_density = clutter_density
+        self._beam_probabilities = np.asarray(beam_probabilities, dtype=float) / np.sum(beam_probabilities)
+        self._p_detection = p_detection
+        self._sigma_rng = sigma_rng
+        self._sigma_az = sigma_az
+        self._sigma_vel = sigma_vel
+        self._Tsampling = Tsampling
+        self._car_width = car_width
+        self._rnd = np.random.RandomState(seed)
+        self._truth = None
+
+    def get_truth(self):
+        """ Returns the ground truth of targets in the EGO car's coordinate system. Arrays *x*, *y*, *dx* and *dy*
+        have the shape (n_targets, n_mcc).
+
+        :return: dictionary with keys mcc, x, y, dx, dy
+        :rtype: dict
+        """
+        if self._truth is None:
+            mcc = np.arange(self._mcc_start, self._mcc_start + self._n_mcc)
+            t = (mcc - self._mcc_start) * self._Tsampling
+            x0 = self._rnd.uniform(-30, 80, (self._n_targets, 1))
+            y0 = self._rnd.uniform(2, 60, (self._n_targets, 1))
+            dx = self._rnd.normal(0, 5, (self._n_targets, 1))
+            dy = self._rnd.normal(0, 1, (self._n_targets, 1))
+            self._truth = {"mcc": mcc,
+                           "x": x0 + dx * t,
+                           "y": y0 + dy * t,
+                           "dx": np.repeat(dx, self._n_mcc, axis=1),
+                           "dy": np.repeat(dy, self._n_mcc, axis=1)}
+        return self._truth
+
+    def _to_radar(self, x, y, dx, dy, left):
+        # Inverse of the transformation in DetectionPoint.__init__
+        y_correction_dir = 1 if left else -1
+        yr = y_correction_dir * y - self._car_width / 2
+        dyr = y_correction_dir * dy
+        rng = np.hypot(x, yr)
+        azimuth = np.arctan2(yr, x)
+        vel = (x * dx + yr * dyr) / rng
+        return rng, azimuth, vel
+
+    def get_detections(self, left=True):
+        """ Generates detections of targets and clutter as a 'Detections' matrix. Columns 0, 2, 3, 5, 6 and 7
+        hold *mcc*, *beam*, *number of detections in the MCC*, *range*, *velocity* and *azimuth*.
+        Targets outside of the field of view of +/-90 degrees are not detected.
+
+        The last row of the matrix is a terminating row of zeros, DetectionList does not read it.
+
+        :param left: TRUE for the left radar, FALSE for the right one
+        :type left: bool
+        :return: the 'Detections' matrix sorted by MCC
+        :rtype: numpy.array
+        """
+        truth = self.get_truth()
+        rng, azimuth, vel = self._to_radar(truth["x"], truth["y"], truth["dx"], truth["dy"], left)
+        mcc = np.broadcast_to(truth["mcc"], rng.shape)
+        visible = ((self._rnd.uniform(size=rng.shape) < self._p_detection) &
+                   (np.abs(azimuth) < np.pi / 2) & (rng > 0.5))
+        n_targets = np.count_nonzero(visible)
+        t_mcc = mcc[visible]
+        t_rng = rng[visible] + self._rnd.normal(0, self._sigma_rng, n_targets)
+        t_az = azimuth[visible] + self._rnd.normal(0, self._sigma_az, n_targets)
+        t_vel = vel[visible] + self._rnd.normal(0, self._sigma_vel, n_targets)
+
+        n_clutter_per_mcc = self._rnd.poisson(self._clutter_density, self._n_mcc)
+        c_mcc = np.repeat(truth["mcc"], n_clutter_per_mcc)
+        n_clutter = c_mcc.size
+        c_rng = self._rnd.uniform(1, 80, n_clutter)
+        c_az = self._rnd.uniform(-np.pi / 2, np.pi / 2, n_clutter)
+        c_vel = self._rnd.normal(0, 10, n_clutter)
+
+        d_mcc = np.concatenate((t_mcc, c_mcc))
+        order = np.argsort(d_mcc, kind='stable')
+        n = d_mcc.size
+        nodet = np.bincount(d_mcc - self._mcc_start, minlength=self._n_mcc)
+
+        detections = np.zeros((n + 1, 8))
+        detections[:n, 0] = d_mcc[order]
+        detections[:n, 2] = self._rnd.choice(4, n, p=self._beam_probabilities)
+        detections[:n, 3] = nodet[d_mcc[order] - self._mcc_start]
+        detections[:n, 5] = np.concatenate((t_rng, c_rng))[order]
+        detections[:n, 6] = np.concatenate((t_vel, c_vel))[order]
+        detections[:n, 7] = np.concatenate((t_az, c_az))[order]
+        logging.getLogger(__name__).debug("ScenarioGenerator.get_detections: %s target and %s clutter detections",
+                                          n_targets, n_clutter)
+        return detections
+
+    def get_references(self, target=0, xcompensation=0.0):
+        """ Generates DGPS references of one target. *TARGET_distX* is stored without the *DGPS_xcompensation*
+        of the scenario, so the compensated value equals the true *x* of the target.
+
+        :param target: index of the target measured by DGPS
+        :param xcompensation: DGPS_xcompensation of the scenario
+        :return: dictionary of DGPS fields, each of them is a column vector
+        :rtype: dict
+        """
+        truth = self.get_truth()
+        x = truth["x"][target]
+        y = truth["y"][target]
+        zeros = np.zeros(self._n_mcc)
+        fields = {"MCC_LeftRadar": truth["mcc"],
+                  "MCC_RightRadar": truth["mcc"],
+                  "TARGET_dist": np.hypot(x, y),
+                  "TARGET_distX": x - xcompensation,
+                  "TARGET_distY": y,
+                  "TARGET_AbsVel_x": truth["dx"][target],
+                  "TARGET_AbsVel_y": truth["dy"][target],
+                  "TARGET_Heading": np.arctan2(truth["dy"][target], truth["dx"][target]),
+                  "EGO_AbsVel_x": zeros,
+                  "EGO_AbsVel_y": zeros,
+                  "EGO_Acc_x": zeros,
+                  "EGO_Acc_y": zeros,
+                  "EGO_Heading": zeros}
+        # ReferenceList reads all rows except the last one, the last reference is repeated
+        return {key: np.append(value, value[-1]).reshape(-1, 1) for key, value in fields.items()}
+
+    def write(self, path_radar, path_dgps=None, path_truth=None, left=True, xcompensation=0.0):
+        """ Writes the scenario into .mat files.
+
+        :param path_radar: path of the radar file
+        :param path_dgps: path of the DGPS file, not written if None
+        :param path_truth: path of the ground truth file, not written if None
+        :param left: TRUE for the left radar, FALSE for the right one
+        :param xcompensation: DGPS_xcompensation of the scenario
+        """
+        sio.savemat(path_radar, {"Detections": self.get_detections(left)})
+        if path_dgps:
+            sio.savemat(path_dgps, self.get_references(xcompensation=xcompensation))
+        if path_truth:
+            sio.savemat(path_truth, self.get_truth())
+
+
+def parse_CMDLine():
+    parser = argparse.ArgumentParser(
+        description='''
+                            Python script scenario_generator writes a synthetic
+                            scenario with a known ground truth in the layout of
+                            recorded radar and DGPS files.''')
+    parser.add_argument("-o", "--output", default="./",
+                        help="Sets path to the folder where output files will be stored.")
+    parser.add_argument("-s", "--scenario", default="SYNTH",
+                        help="Name of the scenario, used as a prefix of the output files.")
+    parser.add_argument("-t", "--targets", type=int, default=1, help="Number of targets.")
+    parser.add_argument("-n", "--mcc", type=int, default=1000, help="Duration of the scenario in MCCs.")
+    parser.add_argument("-c", "--clutter", type=float, default=2.0, help="Mean number of clutter detections per MCC.")
+    parser.add_argument("-b", "--beams", default="0.25,0.25,0.25,0.25",
+                        help="Probabilities of beams 0,1,2,3 separated by commas.")
+    parser.add_argument("--pd", type=float, default=0.9, help="Probability of detection of a target.")
+    parser.add_argument("--noise", default="0.1,0.01,0.1",
+                        help="Standard deviations of range, azimuth and velocity noise separated by commas.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    argv = parse_CMDLine()
+    sigma_rng, sigma_az, sigma_vel = [float(s) for s in argv.noise.split(',')]
+    for left, radar in ((True, "LeftRadar"), (False, "RightRadar")):
+        generator = ScenarioGenerator(n_targets=argv.targets, n_mcc=argv.mcc, clutter_density=argv.clutter,
+                                      beam_probabilities=[float(s) for s in argv.beams.split(',')],
+                                      p_detection=argv.pd, sigma_rng=sigma_rng, sigma_az=sigma_az,
+                                      sigma_vel=sigma_vel, seed=argv.seed)
+        prefix = argv.output + argv.scenario
+        if left:
+            generator.write(prefix + "_LeftRadar_RADAR.mat", prefix + "_DGPS.mat", prefix + "_truth.mat", left=left)
+        else:
+            generator.write(prefix + "_RightRadar_RADAR.mat", left=left)
+    print("Scenario", argv.scenario, "written to", argv.output)
@@ -0,0 +1,258 @@
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+import data_containers as dc
+import instrumentation as instr
+
+# Offsets of columns within a shared block are aligned to this number of bytes
+ALIGNMENT = 64
+
+# Columns of the selection structure and keyword arguments of selections keyed by names of columns
+_SELECTION_KEYS = (("x", "x_tp", "x"), ("y", "y_tp", "y"), ("range", "rng_tp", "rng"), ("rvelocity", "vel_tp", "vel"),
+                   ("razimuth", "az_tp", "az"), ("trackID", "trackID_tp", "trackID"))
+
+# Columns of references, see data_containers.ReferenceList.get_array_references_selected
+REFERENCE_KEYS = ("mccL", "mccR", "TAR_dist", "TAR_distX", "TAR_distY", "TAR_velX", "TAR_velY", "TAR_hdg",
+                  "EGO_velX", "EGO_velY", "EGO_accX", "EGO_accY", "EGO_hdg")
+
+
+def _interval(value):
+    return value if len(value) == 2 else (value, value)
+
+
+class SharedColumns(object):
+    def __init__(self, shm, layout, owner=False):
+        """ Read-only numpy columns stored in one block of OS shared memory. Instances are created by
+        :meth:`shared_dataset.SharedColumns.publish` in the process which owns the data and by
+        :meth:`shared_dataset.SharedColumns.attach` in other processes. Pickling an instance transfers only the name
+        of the block and the layout of columns, the unpickled instance attaches to the same memory without a copy.
+
+        Arrays returned by an instance are views into the shared block, they must not be used after
+        :meth:`shared_dataset.SharedColumns.close`.
+
+        :param shm: the shared memory block
+        :param layout: list of tuples (name, dtype, shape, offset) of columns
+        :param owner: True in the process which created the block, only the owner unlinks it
+        :type shm: multiprocessing.shared_memory.SharedMemory
+        """
+        self._shm = shm
+        self._layout = layout
+        self._owner = owner
+        self._columns = {}
+        for name, dtype, shape, offset in layout:
+            column = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            column.flags.writeable = False
+            self._columns[name] = column
+
+    @classmethod
+    def publish(cls, columns):
+        """ Copies columns into a new block of shared memory.
+
+        :param columns: dictionary of numpy arrays
+        :return: the owning instance
+        :rtype: SharedColumns
+        """
+        layout = []
+        size = 0
+        for name, value in columns.items():
+            value = np.asarray(value)
+            layout.append((name, value.dtype.str, value.shape, size))
+            size += -(-value.nbytes // ALIGNMENT) * ALIGNMENT
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, dtype, shape, offset in layout:
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)[...] = columns[name]
+        logging.getLogger(__name__).debug("SharedColumns.publish: %s columns of %s bytes published in %s",
+                                          len(layout), size, shm.name)
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        """ Attaches to columns published by another process.
+
+        :param handle: the handle returned by :meth:`shared_dataset.SharedColumns.get_handle`
+        :rtype: SharedColumns
+        """
+        name, layout = handle
+        return cls(shared_memory.SharedMemory(name=name), layout)
+
+    def get_handle(self):
+        """ Returns a small picklable handle which identifies the block and its columns.
+        """
+        return self._shm.name, self._layout
+
+    def get_columns(self):
+        return dict(self._columns)
+
+    def close(self):
+        """ Releases the mapping of the block in this process, the data stay available to other processes.
+        """
+        self._columns = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            logging.getLogger(__name__).debug("SharedColumns.close: views of %s are still in use", self._shm.name)
+
+    def unlink(self):
+        """ Closes the block and removes it from the system, called by the owner when all workers are done.
+        """
+        self.close()
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+    def __reduce__(self):
+        return self.__class__.attach, (self.get_handle(),)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+        return False
+
+    def __del__(self):
+        if self._columns:
+            self.close()
+
+
+class SharedDetectionList(SharedColumns):
+    """ A read-only view of a DetectionList stored in shared memory by :meth:`shared_dataset.publish_detections`.
+    Detections are ordered by MCC, selections are computed on columns and only selected detections are turned into
+    DetectionPoints. The view can replace a DetectionList in :meth:`track_management.TrackManager.track_mcc_range`
+    and in :class:`radar_plots.GridHistRenderer`.
+    """
+
+    def __len__(self):
+        return self._columns["mcc"].size
+
+    def get_mcc_interval(self):
+        mcc = self._columns["mcc"]
+        return (int(mcc[0]), int(mcc[-1])) if mcc.size else (0, 0)
+
+    def get_array_detections(self):
+        return {key: self._columns[key] for key in dc.DETECTION_ATTRIBUTES}
+
+    def _select(self, kwarg):
+        selection = kwarg.get('selection')
+        if selection:
+            beam = selection['beam_tp'] or [0, 1, 2, 3]
+            mcc_i = selection['mcc_tp']
+            intervals = [(column, selection[key]) for column, key, _ in _SELECTION_KEYS]
+        else:
+            beam = kwarg.get('beam', [0, 1, 2, 3])
+            mcc_i = kwarg.get('mcc')
+            intervals = [(column, kwarg.get(key)) for column, _, key in _SELECTION_KEYS]
+
+        mcc = self._columns["mcc"]
+        if mcc_i is not None:
+            mcc_i = _interval(mcc_i)
+            first, last = np.searchsorted(mcc, mcc_i[0], 'left'), np.searchsorted(mcc, mcc_i[1], 'right')
+        else:
+            first, last = 0, mcc.size
+        mask = np.isin(self._columns["beam"][first:last], beam)
+        for column, interval in intervals:
+            if interval is not None:
+                interval = _interval(interval)
+                values = self._columns[column][first:last]
+                mask &= (interval[0] <= values) & (values <= interval[1])
+        return first + np.flatnonzero(mask)
+
+    def get_array_detections_selected(self, **kwarg):
+        """ Selects detections with the same keyword arguments as
+        :meth:`data_containers.DetectionList.get_array_detections_selected`, constraints which are not given do not
+        restrict the selection.
+
+        :return: dictionary of arrays of selected detections, copies of shared columns
+        :rtype: dict
+        """
+        index = self._select(kwarg)
+        return {key: self._columns[key][index] for key in dc.DETECTION_ATTRIBUTES}
+
+    def get_lst_detections_selected(self, **kwarg):
+        """ Selects detections like :meth:`data_containers.DetectionList.get_lst_detections_selected`.
+
+        :return: a new list of selected detections
+        :rtype: DetectionList
+        """
+        with instr.timer("select"):
+            index = self._select(kwarg)
+            lst_selected_detection = dc.DetectionList.from_arrays(
+                {key: column[index] for key, column in self._columns.items()})
+        instr.count("detections_selected", len(lst_selected_detection))
+        return lst_selected_detection
+
+    def to_detection_list(self):
+        """ Builds an ordinary DetectionList from all shared detections.
+        """
+        return dc.DetectionList.from_arrays(self._columns)
+
+
+class SharedReferenceList(SharedColumns):
+    """ A read-only view of a ReferenceList stored in shared memory by :meth:`shared_dataset.publish_references`.
+    """
+
+    def __len__(self):
+        return self._columns["mccL"].size
+
+    def get_mccL_interval(self):
+        mcc = self._columns["mccL"]
+        return (int(mcc.min()), int(mcc.max())) if mcc.size else (0, 0)
+
+    def get_mccR_interval(self):
+        mcc = self._columns["mccR"]
+        return (int(mcc.min()), int(mcc.max())) if mcc.size else (0, 0)
+
+    def get_mccB_interval(self):
+        return (min(self.get_mccL_interval()[0], self.get_mccR_interval()[0]),
+                max(self.get_mccL_interval()[1], self.get_mccR_interval()[1]))
+
+    def get_array_references_selected(self, **kwarg):
+        """ Selects references with the same keyword arguments as
+        :meth:`data_containers.ReferenceList.get_array_references_selected`.
+
+        :return: dictionary of arrays of selected references, copies of shared columns
+        :rtype: dict
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key in ("mccL", "mccR"):
+            if kwarg.get(key):
+                interval = _interval(kwarg[key])
+                mask &= (interval[0] <= self._columns[key]) & (self._columns[key] <= interval[1])
+        return {key: self._columns[key][mask] for key in REFERENCE_KEYS}
+
+    def to_reference_list(self):
+        """ Builds an ordinary ReferenceList from all shared references.
+        """
+        return dc.ReferenceList.from_arrays(self._columns)
+
+
+def publish_detections(lst_det):
+    """ Publishes columns of detections into shared memory, detections are ordered by MCC. The returned view owns
+    the memory, it is released by :meth:`shared_dataset.SharedColumns.unlink` or at the end of a with block.
+
+    .. code-block:: Python
+
+        with shared_dataset.publish_detections(lst_det) as shared_det:
+            with multiprocessing.Pool(4) as pool:
+                pool.map(worker, [(shared_det, mcc_interval) for mcc_interval in intervals])
+
+    :param lst_det: list of detections
+    :type lst_det: DetectionList
+    :rtype: SharedDetectionList
+    """
+    radar_data = lst_det.get_array_detections()
+    radar_data["left"] = np.fromiter((elem._y_correction_dir > 0 for elem in lst_det), dtype=bool, count=len(lst_det))
+    radar_data["nodet"] = np.fromiter((elem._nodet for elem in lst_det), dtype=int, count=len(lst_det))
+    radar_data["sensor_y"] = np.fromiter((elem._sensor_y for elem in lst_det), dtype=float, count=len(lst_det))
+    order = np.argsort(radar_data["mcc"], kind='stable')
+    return SharedDetectionList.publish({key: value[order] for key, value in radar_data.items()})
+
+
+def publish_references(lst_ref):
+    """ Publishes columns of DGPS references into shared memory, see :meth:`shared_dataset.publish_detections`.
+
+    :param lst_ref: list of references
+    :type lst_ref: ReferenceList
+    :rtype: SharedReferenceList
+    """
+    return SharedReferenceList.publish(lst_ref.get_array_references_selected())
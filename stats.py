@@ -1,27 +1,28 @@
 
 import math
 from math import cos, sin
-from matplotlib.patches import Ellipse
-import matplotlib.pyplot as plt
 import numpy as np
 import random
 import scipy.linalg as linalg
-import scipy.sparse as sp
-import scipy.sparse.linalg as spln
-import scipy.stats
-from scipy.stats import norm, multivariate_normal
 import warnings
 
 
+# matplotlib and scipy.stats are imported on the first use only, so the tracking core can be imported without them.
 # Older versions of scipy do not support the allow_singular keyword. I could
 # check the version number explicily, but perhaps this is clearer
-_support_singular = True
-try:
-    multivariate_normal.logpdf(1, 1, 1, allow_singular=True)
-except:
-    _support_singular = False
+_support_singular = None
 
 
+def _probe_support_singular():
+    global _support_singular
+    from scipy.stats import multivariate_normal
+    try:
+        multivariate_normal.logpdf(1, 1, 1, allow_singular=True)
+        _support_singular = True
+    except:
+        _support_singular = False
+    return _support_singular
+
 
 def logpdf(x, mean, cov, allow_singular=True):
     """Computes the log of the probability density function of the normal
@@ -36,10 +37,12 @@ def logpdf(x, mean, cov, allow_singular=True):
     `x` and `mean` may be column vectors, row vectors, or lists.
     """
 
+    from scipy.stats import multivariate_normal
+
     flat_mean = np.asarray(mean).flatten()
     flat_x = np.asarray(x).flatten()
 
-    if _support_singular:
+    if _support_singular or (_support_singular is None and _probe_support_singular()):
         return multivariate_normal.logpdf(flat_x, flat_mean, cov, allow_singular)
     else:
         return multivariate_normal.logpdf(flat_x, flat_mean, cov)
@@ -172,7 +175,9 @@ def multivariate_gaussian(x, mu, cov):
     norm_coeff = nx*math.log(2*math.pi) + np.linalg.slogdet(cov)[1]
 
     err = x - mu
+    import scipy.sparse as sp
     if (sp.issparse(cov)):
+        import scipy.sparse.linalg as spln
         numerator = spln.spsolve(cov, err).T.dot(err)
     else:
         numerator = np.linalg.solve(cov, err).T.dot(err)
@@ -273,6 +278,8 @@ def plot_discrete_cdf(xs, ys, ax=None, xlabel=None, ylabel=None,
     -------
         axis of plot
     """
+    import matplotlib.pyplot as plt
+
     if ax is None:
         ax = plt.gca()
 
@@ -322,6 +329,9 @@ def plot_gaussian_cdf(mean=0., variance=1.,
     -------
         axis of plot
     """
+    import matplotlib.pyplot as plt
+    import scipy.stats
+
     if ax is None:
         ax = plt.gca()
 
@@ -382,6 +392,8 @@ def plot_gaussian_pdf(mean=0., variance=1.,
     -------
         axis of plot
     """
+    import matplotlib.pyplot as plt
+    import scipy.stats
 
     if ax is None:
         ax = plt.gca()
@@ -504,6 +516,8 @@ def plot_covariance_ellipse(mean, cov=None, variance = 1.0, std=None,
     plt.show() is not called, allowing you to plot multiple things on the
     same figure.
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Ellipse
 
     assert cov is None or ellipse is None
     assert not (cov is None and ellipse is None)
@@ -589,6 +603,7 @@ def norm_cdf (x_range, mu, var=1, std=None):
     probability : float
         probability that Gaussian is within x_range. E.g. .1 means 10%.
     """
+    from scipy.stats import norm
 
     if std is None:
         std = math.sqrt(var)
@@ -632,6 +647,7 @@ def _to_cov(x, n):
 
 
 def _do_plot_test():
+    import matplotlib.pyplot as plt
 
     from numpy.random import multivariate_normal
     p = np.array([[32, 15],[15., 40.]])
@@ -663,6 +679,7 @@ def _do_plot_test():
 
 
 def plot_std_vs_var():
+    import matplotlib.pyplot as plt
     plt.figure()
     x = (0,0)
     P = np.array([[3,1],[1,3]])
@@ -715,11 +732,47 @@ def NESS(xs, est_xs, ps):
 
     """
 
-    est_err = xs - est_xs
-    ness = []
-    for x, p in zip(est_err, ps):
-        ness.append(np.dot(x.T, linalg.inv(p)).dot(x))
-    return ness
+    est_err = np.asarray(xs) - np.asarray(est_xs)
+    return list(normalized_squared_error(est_err, ps))
+
+
+def normalized_squared_error(errors, covs):
+    """ Computes e' inv(C) e for a whole stack of error vectors and their
+    covariances by one batched solve, no inverse is formed. It gives NEES
+    for state errors and P, or NIS for innovations y and S.
+
+    Parameters
+    ----------
+
+    errors : array-like
+        errors of the shape (n, dim) or (n, dim, 1)
+
+    covs : array-like
+        covariances of the shape (n, dim, dim)
+
+    Returns
+    -------
+
+    nes : numpy.array
+       normalized squared errors of the shape (n,)
+    """
+
+    covs = np.asarray(covs, dtype=float)
+    errors = np.asarray(errors, dtype=float).reshape(covs.shape[:-1])
+    return np.einsum('ni,ni->n', errors, np.linalg.solve(covs, errors[..., np.newaxis])[..., 0])
+
+
+def chi2_bounds(dof, alpha=0.05):
+    """ Returns the two-sided (1 - alpha) confidence interval of a chi-square
+    distribution with `dof` degrees of freedom. A consistent filter has the
+    sum of N normalized squared errors of dimension d within
+    chi2_bounds(N * d).
+
+    scipy.stats is imported on the first call.
+    """
+
+    from scipy.stats import chi2
+    return chi2.ppf(alpha / 2.0, dof), chi2.ppf(1.0 - alpha / 2.0, dof)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules of the package are imported by their names, as the scripts in the root directory do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
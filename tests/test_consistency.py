@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import consistency
+import stats
+
+
+def samples(n, dim=2, scale=1.0, seed=4):
+    rng = np.random.default_rng(seed)
+    A = rng.normal(size=(n, dim, dim))
+    covs = A @ A.swapaxes(1, 2) + np.eye(dim)
+    errors = np.array([rng.multivariate_normal(np.zeros(dim), scale * cov) for cov in covs])
+    return errors, covs
+
+
+def test_normalized_squared_error_equals_quadratic_forms():
+    errors, covs = samples(20, dim=3)
+    expected = [e @ np.linalg.inv(S) @ e for e, S in zip(errors, covs)]
+    np.testing.assert_allclose(stats.normalized_squared_error(errors, covs), expected, rtol=1e-10)
+    np.testing.assert_allclose(stats.normalized_squared_error(errors[:, :, None], covs), expected, rtol=1e-10)
+
+
+def test_track_summary_equals_sums_of_samples():
+    errors, covs = samples(50)
+    monitor = consistency.ConsistencyMonitor(buffer_size=7)
+    tracks = np.arange(50) % 3
+    for track, y, S in zip(tracks, errors, covs):
+        monitor.add_innovation(int(track), y[:, None], S)
+
+    nis = np.array([y @ np.linalg.solve(S, y) for y, S in zip(errors, covs)])
+    log_likelihood = np.array([stats.logpdf(y, np.zeros(2), S) for y, S in zip(errors, covs)])
+    summary = monitor.get_track_summary("nis")
+    assert sorted(summary) == [0, 1, 2]
+    for track, elem in summary.items():
+        selected = tracks == track
+        assert elem["n"] == np.count_nonzero(selected)
+        np.testing.assert_allclose(elem["mean"], nis[selected].mean(), rtol=1e-10)
+        np.testing.assert_allclose(elem["std"], nis[selected].std(), rtol=1e-8)
+        np.testing.assert_allclose(elem["log_likelihood"], log_likelihood[selected].sum(), rtol=1e-10)
+    assert monitor.get_summary("nis")["n"] == 50
+    assert monitor.get_summary("nees")["n"] == 0
+
+
+def test_summary_tells_consistent_from_overconfident_filter():
+    errors, covs = samples(400)
+    consistent = consistency.ConsistencyMonitor()
+    overconfident = consistency.ConsistencyMonitor()
+    for y, S in zip(errors, covs):
+        consistent.add_state_error(0, y, S)
+        overconfident.add_state_error(0, y, S / 4.0)
+    assert consistent.get_summary("nees")["consistent"]
+    assert consistent.get_summary("nees")["outside"] < 0.1
+    assert not overconfident.get_summary("nees")["consistent"]
+    assert overconfident.get_summary("nees")["mean"] > 6.0
+
+
+def test_samples_of_other_dimension_are_rejected():
+    monitor = consistency.ConsistencyMonitor()
+    monitor.add_innovation(0, np.zeros(2), np.eye(2))
+    with pytest.raises(ValueError):
+        monitor.add_innovation(0, np.zeros(3), np.eye(3))
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import data_containers as dc
+import track_management as tm
+
+
+def detection(mcc=1, x=10.0, y=1.0, vel=-5.0, azimuth=0.1):
+    return dc.DetectionPoint.from_attributes(mcc, 0, x, y, np.hypot(x, y), azimuth, vel)
+
+
+def gate(d_rvelocity=1.0, d_razimuth=0.02):
+    return dc.Gate(beam=[0], x=10, y=1, diffx=1, diffy=1, rvelocity=-5, d_rvelocity=d_rvelocity, razimuth=0.1,
+                   d_razimuth=d_razimuth)
+
+
+def test_gate_keyword_velocity_uses_its_own_upper_bound():
+    assert gate().test_detection_in_gate(detection(vel=-5.2), rvel=True)
+    # the upper bound used to be x + d_rvelocity/2
+    assert not gate().test_detection_in_gate(detection(vel=3.0), rvel=True)
+    assert not gate().test_trackpoint_in_gate(dc.TrackPoint(x=10, y=1, rvelocity=3.0), rvel=True)
+
+
+def test_gate_keyword_azimuth_is_tested_under_raz():
+    outside = detection(azimuth=0.5)
+    assert gate().test_detection_in_gate(outside, rvel=True)
+    assert not gate().test_detection_in_gate(outside, raz=True)
+    assert not gate().test_trackpoint_in_gate(dc.TrackPoint(x=10, y=1, razimuth=0.5), raz=True)
+
+
+def test_gate_of_zero_velocity_width_does_not_constrain_velocity():
+    assert gate(d_rvelocity=0).test_detection_in_gate(detection(vel=30.0))
+    assert not gate(d_rvelocity=1).test_detection_in_gate(detection(vel=30.0))
+    assert not gate(d_rvelocity=0).test_detection_in_gate(detection(x=12.0))
+
+
+def test_track_is_not_initiated_outside_of_projected_gate():
+    init_gate, track_gate = tm._gates_from_params(tm.TRACKING_PARAMETERS)
+    lst_unassigned = dc.UnAssignedDetectionList(50.0e-3, init_gate, track_gate)
+    lst_unassigned.new_detection(detection(mcc=1, x=10.0))
+    lst_unassigned.new_detection(detection(mcc=2, x=10.2))
+    # the projection of both detections is at x = 10.4
+    assert not lst_unassigned.new_detection(detection(mcc=3, x=12.0))
+    assert lst_unassigned.new_detection(detection(mcc=4, x=10.4))
+
+
+def test_detection_is_assigned_to_any_gating_track():
+    track_mgmt = tm.TrackManager(visualize=False)
+    for x in (10.0, 30.0):
+        track = dc.Track(len(track_mgmt), track_mgmt._lst_not_assigned_detections._track_gate)
+        track.init_tracker(init_x=np.array([[x, 0, 1.0, 0]]).T)
+        track._last_update = 0
+        track_mgmt.append_track(track)
+    lst_det = dc.DetectionList()
+    lst_det.append_detection(detection(mcc=1, x=10.1))
+    track_mgmt.new_detections(lst_det)
+    # only the gate of the last track used to be tested
+    assert [len(track) for track in track_mgmt] == [1, 0]
+
+
+def random_detections(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(1, 60, n)
+    y = rng.uniform(-20, 20, n)
+    # MCCs are unsorted and some of them have no detections
+    return dc.DetectionList.from_arrays({"mcc": rng.integers(20, 90, n), "beam": rng.integers(0, 4, n), "x": x,
+                                         "y": y, "range": np.hypot(x, y), "razimuth": np.arctan2(y, x),
+                                         "rvelocity": rng.normal(0, 10, n), "trackID": np.zeros(n)})
+
+
+def test_detection_tensor_equals_loop_over_detections(tmp_path):
+    lst_det = random_detections()
+    channels = ("x", "rvelocity", "beam")
+    tensor = lst_det.get_detection_tensor(channels, mcc=(25, 80), min_slots=2)
+
+    expected = np.full((len(channels), tensor.shape[1], 80 - 25 + 1), np.nan)
+    slots = {}
+    for det in lst_det:
+        if 25 <= det._mcc <= 80:
+            slot = slots.setdefault(det._mcc, 0)
+            expected[:, slot, det._mcc - 25] = (det._x, det._vel, det._beam)
+            slots[det._mcc] += 1
+    assert tensor.shape[1] == max(slots.values())
+    np.testing.assert_array_equal(tensor, expected)
+    streamed = lst_det.get_detection_tensor(channels, mcc=(25, 80), min_slots=2, path=str(tmp_path / "t.npy"),
+                                            chunk_mcc=7)
+    np.testing.assert_array_equal(streamed, expected)
+
+
+@pytest.mark.parametrize("extension", [".npz", ".mat"])
+def test_ragged_detections_round_trip(tmp_path, extension):
+    lst_det = random_detections()
+    ragged = dc.RaggedDetections.from_detection_list(lst_det, channels=("x", "rvelocity", "beam"))
+    path = str(tmp_path / ("ragged" + extension))
+    ragged.save(path)
+    loaded = dc.RaggedDetections.load(path)
+
+    assert loaded.get_mcc_interval() == ragged.get_mcc_interval() == lst_det.get_mcc_interval()
+    np.testing.assert_array_equal(loaded.get_counts(), ragged.get_counts())
+    assert sorted(loaded.get_columns()) == ["beam", "rvelocity", "x"]
+    for mcc in range(ragged.get_mcc_interval()[0] - 1, ragged.get_mcc_interval()[1] + 2):
+        expected = [(det._x, det._vel, det._beam) for det in lst_det if det._mcc == mcc]
+        stored = loaded.get_mcc(mcc)
+        np.testing.assert_array_equal(np.column_stack((stored["x"], stored["rvelocity"], stored["beam"])),
+                                      np.reshape(expected, (-1, 3)))
@@ -0,0 +1,21 @@
+import sys
+import types
+import importlib
+import numpy as np
+import data_containers as dc
+
+
+def test_radar_without_selected_detections_is_reported(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "radar_plots", types.SimpleNamespace())
+    data_viewer = importlib.import_module("data_viewer")
+    lst_det = dc.DetectionList.from_arrays({"mcc": np.array([5, 6]), "beam": np.array([0, 1]),
+                                            "x": np.array([10., 11.]), "y": np.array([1., 2.]),
+                                            "range": np.array([10., 11.]), "razimuth": np.array([0.1, 0.2]),
+                                            "rvelocity": np.array([-1., 1.]), "trackID": np.zeros(2)})
+    columns = ("mcc", "rvelocity", "razimuth", "range", "x", "y")
+    data_viewer.print_stats("LR", lst_det.describe(by='radar', columns=columns).get("L"))
+    assert "starting MCC:  5 ending MCC:  6" in capsys.readouterr().out
+
+    data_viewer.print_stats("RR", lst_det.describe(by='radar', columns=columns).get("R"))
+    data_viewer.print_stats("LR", lst_det.describe(by='radar', columns=columns, selection={"vel_tp": (5, 9)}).get("L"))
+    assert capsys.readouterr().out.count("no detections within the selection") == 2
@@ -0,0 +1,66 @@
+import numpy as np
+import data_containers as dc
+import evaluation as ev
+
+MCC = np.arange(100, 110)
+
+
+def references(mcc=MCC):
+    n = mcc.size
+    zeros = np.zeros(n)
+    return dc.ReferenceList.from_arrays({"mccL": mcc, "mccR": mcc, "TAR_dist": 20.0 - 0.5 * (mcc - 100),
+                                         "TAR_distX": 20.0 - 0.5 * (mcc - 100), "TAR_distY": np.full(n, 2.0),
+                                         "TAR_velX": np.full(n, -10.0), "TAR_velY": np.full(n, 1.0),
+                                         "TAR_hdg": zeros, "EGO_velX": zeros, "EGO_velY": zeros,
+                                         "EGO_accX": zeros, "EGO_accY": zeros, "EGO_hdg": zeros})
+
+
+def track(mcc, dx=-10.0, dy=1.0, x_offset=0.0):
+    """ A track whose estimates follow the references, its detections are far from them. """
+    n = mcc.size
+    x = 20.0 - 0.5 * (mcc - 100) + x_offset
+    return {"active": True, "mcc": mcc, "razimuth": np.full(n, 0.3), "rvelocity": np.full(n, -3.0),
+            "x": x + 1.0, "y": np.full(n, 4.0), "beam": np.zeros(n, dtype=int),
+            "x_est": x, "dx_est": np.full(n, dx), "y_est": np.full(n, 2.0), "dy_est": np.full(n, dy)}
+
+
+def test_track_on_the_reference_has_no_error():
+    result = ev.evaluate_tracks([track(MCC)], references())
+    assert result["tracks"][0]["n_joined"] == MCC.size
+    assert result["tracks"][0]["rmse_pos"] == 0.0
+    assert result["tracks"][0]["rmse_vel"] == 0.0
+    assert result["scenario"]["gospa"] == 0.0
+    assert result["scenario"]["coverage"] == 1.0
+
+
+def test_velocity_is_compared_in_both_coordinates():
+    # the velocity along the line of sight is the same, the estimate is wrong across it
+    result = ev.evaluate_tracks([track(MCC, dy=4.0)], references())
+    np.testing.assert_allclose(result["scenario"]["rmse_vel"], 3.0)
+    np.testing.assert_allclose(result["scenario"]["rmse_pos"], 0.0)
+
+
+def test_points_without_estimate_are_not_scored():
+    points = track(MCC, x_offset=1.0)
+    points["x_est"][:5] = np.nan
+    result = ev.evaluate_tracks([points], references())
+    assert result["tracks"][0]["n_points"] == MCC.size
+    assert result["tracks"][0]["n_joined"] == MCC.size - 5
+    np.testing.assert_allclose(result["tracks"][0]["rmse_pos"], 1.0)
+
+
+def test_points_without_reference_are_false_estimates_of_gospa():
+    c, p = 5.0, 2
+    alone = ev.evaluate_tracks([track(MCC)], references(), mcc_interval=(100, 119), c=c, p=p)
+    false_track = track(np.arange(110, 120), x_offset=50.0)
+    result = ev.evaluate_tracks([track(MCC), false_track], references(), mcc_interval=(100, 119), c=c, p=p)
+    assert alone["scenario"]["gospa"] == 0.0
+    # 10 MCCs without error and 10 MCCs with one false estimate
+    np.testing.assert_allclose(result["scenario"]["gospa"], (c ** p / 2.0) ** (1.0 / p) / 2.0)
+    assert result["tracks"][1]["n_joined"] == 0
+
+
+def test_points_outside_of_interval_are_not_scored():
+    result = ev.evaluate_tracks([track(MCC), track(np.arange(110, 120), x_offset=50.0)], references(),
+                                mcc_interval=(100, 109))
+    assert result["scenario"]["gospa"] == 0.0
@@ -0,0 +1,90 @@
+import sys
+import types
+import numpy as np
+import pytest
+import scipy.io as sio
+import scenario_generator as sg
+import filter_framework as ff
+
+N_MCC = 80
+LOGGING = """[loggers]
+keys=root
+
+[handlers]
+keys=fileHandler
+
+[formatters]
+keys=fileFormatter
+
+[logger_root]
+level=WARNING
+handlers=fileHandler
+
+[handler_fileHandler]
+class=FileHandler
+level=WARNING
+formatter=fileFormatter
+args=('filter_framework.log', 'w')
+
+[formatter_fileFormatter]
+format=%(asctime)s - %(name)s - %(levelname)s - %(message)s
+"""
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    generator = sg.ScenarioGenerator(n_targets=2, n_mcc=N_MCC)
+    generator.write(str(tmp_path / "left.mat"), left=True)
+    generator.write(str(tmp_path / "right.mat"), left=False)
+    (tmp_path / "logging.cnf").write_text(LOGGING)
+    monkeypatch.chdir(tmp_path)
+    # attempts to initiate tracks are not plotted
+    monkeypatch.setitem(sys.modules, "radar_plots", types.SimpleNamespace(static_track_init=lambda *args: None))
+    return {"scenario": "SYN", "path_data_folder": str(tmp_path) + "/", "filename_LeftRadar": "left.mat",
+            "filename_RightRadar": "right.mat", "filename_LeftDGPS": None, "filename_RightDGPS": None,
+            "filename_BothDGPS": None, "filename_LOGcfg": str(tmp_path / "logging.cnf"), "EGO_car_width": 1.88,
+            "beams_tp": [0, 1, 2, 3], "radar_tp": "B", "plot_tp": None, "output_folder": str(tmp_path),
+            "number_of_mcc_to_process": N_MCC, "checkpoint_every": None, "resume_from": None, "instrument": None,
+            "shards": None, "shards_overlap": 20, "fuse": False}
+
+
+def run(config, **kwargs):
+    ff.main(dict(config, **kwargs))
+    return sio.loadmat("tracks.mat")
+
+
+def n_points(tracks):
+    return sum(elem["mcc"][0, 0].size for elem in np.ravel(tracks))
+
+
+def test_shards_track_the_right_radar_alone(config):
+    tracks = run(config, filename_LeftRadar=None, shards=2)
+    assert "track_RR" not in tracks
+    assert n_points(tracks["track"]) > N_MCC
+
+
+def test_shards_track_both_radars(config):
+    tracks = run(config, shards=2)
+    assert n_points(tracks["track"]) > N_MCC
+    assert n_points(tracks["track_RR"]) > N_MCC
+
+
+def track_arrays(tracks):
+    return [{key: np.ravel(elem[key][0, 0]) for key in ("mcc", "x", "y", "x_est", "dx_est", "y_est", "dy_est")}
+            for elem in np.ravel(tracks)]
+
+
+@pytest.mark.parametrize("fuse", [False, True])
+def test_resumed_run_gives_tracks_of_uninterrupted_run(config, tmp_path, fuse):
+    uninterrupted = track_arrays(run(config, fuse=fuse)["track"])
+    checkpointed = track_arrays(run(config, fuse=fuse, checkpoint_every=30)["track"])
+    checkpoints = sorted(tmp_path.glob("checkpoint_SYN_*.ckpt"))
+    assert len(checkpoints) == 2
+    resumed = track_arrays(run(config, fuse=fuse, resume_from=str(checkpoints[0]))["track"])
+
+    assert len(uninterrupted) > 0
+    for tracks in (checkpointed, resumed):
+        assert len(tracks) == len(uninterrupted)
+        for track, expected in zip(tracks, uninterrupted):
+            for key, value in expected.items():
+                np.testing.assert_array_equal(track[key], value, err_msg=key)
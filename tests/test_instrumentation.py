@@ -0,0 +1,54 @@
+import csv
+import json
+import pytest
+import instrumentation as instr
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    instr.reset()
+    yield
+    instr.disable()
+    instr.reset()
+
+
+def test_disabled_instrumentation_collects_nothing():
+    with instr.timer("gating"):
+        instr.count("aim_comparisons", 3)
+    instr.end_mcc(1)
+    summary = instr.get_summary()
+    assert summary["timers"] == {} and summary["counters"] == {} and summary["mcc"]["number_of_mcc"] == 0
+
+
+def test_timers_and_counters_are_collected_per_mcc():
+    instr.enable()
+    instr.begin_mcc()
+    for mcc, n in ((1, 2), (2, 0), (3, 5)):
+        with instr.timer("gating"):
+            instr.count("aim_comparisons", n)
+        instr.end_mcc(mcc)
+    summary = instr.get_summary()
+    assert summary["mcc"]["number_of_mcc"] == 3
+    assert summary["timers"]["gating"]["calls"] == 3
+    assert summary["counters"]["aim_comparisons"] == {"total": 7, "mean_per_mcc": 7 / 3.0, "max_per_mcc": 5.0}
+    counts, edges = instr.histogram(bins=4)
+    assert counts.sum() == 3
+
+
+def test_export_aligns_stages_which_appear_later(tmp_path):
+    instr.enable()
+    instr.begin_mcc()
+    instr.end_mcc(10)
+    instr.count("fused_updates", 4)
+    instr.end_mcc(11)
+    instr.export(str(tmp_path / "instr.csv"))
+    instr.export(str(tmp_path / "instr.json"))
+
+    with open(str(tmp_path / "instr.csv")) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["mcc"] for row in rows] == ["10", "11"]
+    assert [row["fused_updates"] for row in rows] == ["0", "4"]
+    with open(str(tmp_path / "instr.json")) as f:
+        summary = json.load(f)
+    assert summary["counters"]["fused_updates"]["total"] == 4
+    assert sum(summary["histograms"]["mcc"]["counts"]) == 2
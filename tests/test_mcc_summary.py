@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pytest
+import data_containers as dc
+import mcc_summary as ms
+
+BUCKET_SIZES = (10, 100, 1000)
+
+
+@pytest.fixture(scope="module")
+def detections():
+    rng = np.random.default_rng(11)
+    n = 5000
+    mcc = np.sort(rng.integers(1003, 4517, n))
+    x = rng.uniform(0, 60, n)
+    y = rng.uniform(-20, 20, n)
+    return dc.DetectionList.from_arrays({"mcc": mcc, "beam": rng.integers(0, 4, n), "x": x, "y": y,
+                                         "range": np.hypot(x, y), "razimuth": np.arctan2(y, x),
+                                         "rvelocity": rng.normal(0, 10, n), "trackID": np.zeros(n)})
+
+
+def brute_force(data, pyramid, mcc_interval):
+    # query rounds the interval out to buckets of the finest level
+    size = BUCKET_SIZES[0]
+    start = pyramid._mcc_start + (mcc_interval[0] - pyramid._mcc_start) // size * size
+    end = pyramid._mcc_start + -(-(mcc_interval[1] + 1 - pyramid._mcc_start) // size) * size
+    inside = (start <= data["mcc"]) & (data["mcc"] < end)
+    summary = {"counts": np.count_nonzero(inside),
+               "counts_per_beam": np.bincount(data["beam"][inside].astype(int), minlength=4)}
+    for column in ms.SUMMARY_COLUMNS:
+        values = data[column][inside]
+        edges = pyramid.get_edges(column)
+        bins = edges.size - 1
+        summary[column + "_min"] = values.min() if values.size else np.nan
+        summary[column + "_max"] = values.max() if values.size else np.nan
+        idx = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+        summary[column + "_hist"] = np.bincount(idx, minlength=bins)
+    return summary
+
+
+@pytest.mark.parametrize("mcc_interval", [(1003, 4516), (1000, 1000), (1234, 1240), (1999, 3001), (1095, 4404),
+                                          (4600, 4700), (0, 900)])
+def test_query_equals_brute_force(detections, mcc_interval):
+    pyramid = ms.MCCSummaryPyramid.from_detection_list(detections, BUCKET_SIZES)
+    summary = pyramid.query(mcc_interval)
+    expected = brute_force(detections.get_array_detections(), pyramid, mcc_interval)
+    assert summary.keys() == expected.keys()
+    for key, value in expected.items():
+        np.testing.assert_array_equal(summary[key], value, err_msg=key)
+
+
+def test_empty_list_has_empty_summary():
+    pyramid = ms.MCCSummaryPyramid.from_detection_list(dc.DetectionList(), BUCKET_SIZES)
+    summary = pyramid.query((0, 100))
+    assert summary["counts"] == 0
+    assert np.isnan(summary["x_min"])
+    assert pyramid.get_level(100)["counts"].size == 0
+
+
+def test_summary_is_rebuilt_for_other_settings(detections, tmp_path):
+    data_path = str(tmp_path / "left.mat")
+    open(data_path, "w").close()
+    first = ms.load_or_build(detections, data_path, BUCKET_SIZES, bins=16)
+    assert os.path.exists(ms.summary_path(data_path))
+    assert ms.load_or_build(detections, data_path, BUCKET_SIZES, bins=16).get_bins() == first.get_bins() == 16
+    assert ms.load_or_build(detections, data_path, BUCKET_SIZES, bins=8).get_bins() == 8
+    assert ms.load_or_build(detections, data_path, BUCKET_SIZES, bins=8, n_beams=6).get_n_beams() == 6
+
+
+def test_summary_of_read_only_folder_is_stored_in_cache(detections, tmp_path, monkeypatch):
+    data_path = str(tmp_path / "data" / "left.mat")
+    os.makedirs(os.path.dirname(data_path))
+    open(data_path, "w").close()
+    save = ms.MCCSummaryPyramid.save
+
+    def read_only_save(self, path):
+        if path == ms.summary_path(data_path):
+            raise PermissionError("Read-only file system")
+        save(self, path)
+    monkeypatch.setattr(ms.MCCSummaryPyramid, "save", read_only_save)
+
+    cache_folder = str(tmp_path / "cache")
+    pyramid = ms.load_or_build(detections, data_path, BUCKET_SIZES, cache_folder=cache_folder)
+    assert not os.path.exists(ms.summary_path(data_path))
+    assert os.path.exists(ms.summary_path(data_path, cache_folder))
+    monkeypatch.setattr(ms.MCCSummaryPyramid, "from_detection_list", None)
+    loaded = ms.load_or_build(detections, data_path, BUCKET_SIZES, cache_folder=cache_folder)
+    np.testing.assert_array_equal(loaded.get_level(10)["counts"], pyramid.get_level(10)["counts"])
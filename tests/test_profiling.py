@@ -0,0 +1,48 @@
+import os
+import pytest
+import profiling
+
+
+def work(conf_data, n, offset=0):
+    return sum(i * i for i in range(n)) + offset
+
+
+def test_profile_off_only_calls_the_function(tmp_path):
+    prefix = str(tmp_path / "profile")
+    conf_data = {"profile": "off", "profile_output": prefix}
+    assert profiling.run_profiled(work, conf_data, 10, offset=1) == 286
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_cprofile_writes_stats_and_summary(tmp_path):
+    prefix = str(tmp_path / "profile")
+    conf_data = {"profile": "cprofile", "profile_output": prefix, "profile_top": 5}
+    assert profiling.run_profiled(work, conf_data, 10) == 285
+    assert os.path.getsize(prefix + ".prof") > 0
+    with open(prefix + ".txt") as f:
+        assert "work" in f.read()
+
+
+def test_sampling_writes_collapsed_stacks(tmp_path):
+    prefix = str(tmp_path / "profile")
+    conf_data = {"profile": "sampling", "profile_output": prefix, "profile_interval": 1.0e-4}
+    profiling.run_profiled(work, conf_data, 1000000)
+    with open(prefix + ".collapsed") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("work (test_profiling.py" in line for line in lines)
+
+
+def test_unknown_profile_mode_is_rejected():
+    with pytest.raises(ValueError):
+        profiling.run_profiled(work, {"profile": "perf"}, 1)
+
+
+def test_summary_of_samples_orders_functions_by_own_samples(tmp_path):
+    stacks = {("main", "predict"): 3, ("main", "update"): 1, ("main",): 1}
+    summary = profiling.summarize_samples(stacks, top=2).splitlines()
+    assert len(summary) == 3
+    assert summary[1].split()[:3] == ["3", "60.0%", "60.0%"] and summary[1].endswith("predict")
+    profiling.write_collapsed(stacks, str(tmp_path / "stacks.collapsed"))
+    with open(str(tmp_path / "stacks.collapsed")) as f:
+        assert f.read() == "main 1\nmain;predict 3\nmain;update 1\n"
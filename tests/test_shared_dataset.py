@@ -0,0 +1,49 @@
+import multiprocessing
+import numpy as np
+import data_containers as dc
+import shared_dataset as sd
+
+
+def detections():
+    rng = np.random.default_rng(2)
+    n = 60
+    mcc = rng.integers(10, 30, n)
+    x = rng.uniform(1, 40, n)
+    y = rng.uniform(-10, 10, n)
+    # every MCC of the radar file holds a number of detections which differs per MCC
+    return dc.DetectionList.from_arrays({"mcc": mcc, "beam": rng.integers(0, 4, n), "x": x, "y": y,
+                                         "range": np.hypot(x, y), "razimuth": np.arctan2(y, x),
+                                         "rvelocity": rng.normal(0, 5, n), "trackID": np.zeros(n),
+                                         "left": rng.random(n) < 0.5, "nodet": 100 + mcc,
+                                         "sensor_y": np.where(rng.random(n) < 0.5, 0.94, -0.94)})
+
+
+def read_selection(shared_det, mcc_interval):
+    # runs in a child process, shared_det is attached there by unpickling its handle
+    lst_det = shared_det.get_lst_detections_selected(mcc=mcc_interval)
+    return (len(shared_det), shared_det.get_mcc_interval(),
+            [(det._mcc, det._x, det._nodet, det._y_correction_dir > 0, det._sensor_y) for det in lst_det])
+
+
+def test_child_process_reads_published_detections():
+    lst_det = detections()
+    expected = sorted(((det._mcc, det._x, det._nodet, det._y_correction_dir > 0, det._sensor_y) for det in lst_det
+                       if 15 <= det._mcc <= 20), key=lambda point: point[0])
+    with sd.publish_detections(lst_det) as shared_det:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            n, mcc_interval, points = pool.apply(read_selection, (shared_det, (15, 20)))
+    assert n == len(lst_det)
+    assert mcc_interval == lst_det.get_mcc_interval()
+    # detections are published ordered by MCC, detections of one MCC keep their order
+    assert points == expected
+    assert all(nodet == 100 + mcc for mcc, x, nodet, left, sensor_y in points)
+
+
+def test_shared_columns_are_read_only_views_of_one_block():
+    columns = {"a": np.arange(5), "b": np.linspace(0, 1, 3)}
+    with sd.SharedColumns.publish(columns) as shared:
+        attached = sd.SharedColumns.attach(shared.get_handle())
+        np.testing.assert_array_equal(attached.get_columns()["a"], columns["a"])
+        np.testing.assert_array_equal(attached.get_columns()["b"], columns["b"])
+        assert not attached.get_columns()["a"].flags.writeable
+        attached.close()
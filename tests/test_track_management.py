@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+import data_containers as dc
+import track_management as tm
+import tracking_filters as tf
+import scenario_generator as sg
+
+SELECTION = {"beam_tp": [0, 1, 2, 3], "mcc_tp": None, "x_tp": None, "y_tp": None, "rng_tp": None,
+             "vel_tp": None, "az_tp": None, "trackID_tp": None}
+N_MCC = 100
+
+
+@pytest.fixture(scope="module")
+def detections(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("scenario") / "scenario.mat")
+    sg.ScenarioGenerator(n_targets=2, n_mcc=N_MCC).write(path)
+    lst_det = dc.DetectionList()
+    with np.errstate(divide="ignore"):
+        lst_det.append_data_from_m_file(path, True, 1.88)
+    return lst_det
+
+
+def run_tracking(lst_det, params):
+    track_mgmt = tm.TrackManager.from_params(params, visualize=False)
+    mcc_start = lst_det.get_mcc_interval()[0]
+    track_mgmt.track_mcc_range(lst_det, SELECTION, mcc_start, mcc_start + N_MCC)
+    return track_mgmt
+
+
+def test_tracks_are_updated_after_initiation(detections):
+    track_mgmt = run_tracking(detections, {})
+    assert max(len(track) for track in track_mgmt) > 3
+
+
+def test_track_points_hold_estimates_of_tracker(detections):
+    track_mgmt = run_tracking(detections, {})
+    for track in track_mgmt:
+        points = track.get_array_trackpoints()
+        assert np.all(np.isfinite(points["x_est"])) and np.all(np.isfinite(points["dy_est"]))
+        # estimates are taken after the update by the point, they stay close to it
+        assert np.max(np.abs(points["x_est"] - points["x"])) < 2.0
+
+
+def test_gate_settings_change_tracking(detections):
+    narrow = run_tracking(detections, {"gate_track_init_x": 0.1, "gate_track_init_y": 0.1})
+    wide = run_tracking(detections, {"gate_track_init_x": 2, "gate_track_init_y": 2})
+    assert len(narrow) != len(wide)
+
+
+def test_update_gate_changes_track_lengths(detections):
+    narrow = run_tracking(detections, {"gate_update_x": 0.5, "gate_update_y": 0.5})
+    wide = run_tracking(detections, {"gate_update_x": 4, "gate_update_y": 4})
+    assert sum(len(track) for track in narrow) != sum(len(track) for track in wide)
+
+
+def test_cnf_tracking_parser_converts_and_rejects_options(tmp_path):
+    path = tmp_path / "tracking.cnf"
+    path.write_text("[Track_management]\nunassigned_dets_memory: 5\n[TrackerKF]\ngate_update_x: 3\n")
+    params = dc.cnf_tracking_parser(str(path))
+    assert params == {"unassigned_dets_memory": 5, "gate_update_x": 3.0}
+    assert isinstance(params["unassigned_dets_memory"], int)
+    assert isinstance(params["gate_update_x"], float)
+
+    path.write_text("[TrackerKF]\nmax_velocity: 150\n")
+    with pytest.raises(ValueError):
+        dc.cnf_tracking_parser(str(path))
+
+
+def test_from_params_rejects_unknown_parameters():
+    with pytest.raises(ValueError):
+        tm.TrackManager.from_params({"max_velocity": 150})
+
+
+def test_from_params_keeps_defaults_of_init():
+    track_mgmt = tm.TrackManager.from_params({})
+    assert track_mgmt._visualize == tm.TrackManager()._visualize
+
+
+def update_alone(filters, zs, sensors):
+    for kf, z, sensor in zip(filters, zs, sensors):
+        if kf.polar:
+            kf.update(z, sensor=sensor)
+        else:
+            kf.update(z)
+
+
+@pytest.mark.parametrize("filter_type", ["imm", "extended_kalman_filter", "unscented_kalman_filter",
+                                         "coordinated_turn"])
+def test_trackers_of_a_frame_equal_trackers_alone(detections, monkeypatch, filter_type):
+    tracker_type = {'filter_type': filter_type, 'dim_x': 4, 'dim_z': 2}
+    stacked = tm.TrackManager(tracker_type=tracker_type, visualize=False)
+    mcc_start = detections.get_mcc_interval()[0]
+    stacked.track_mcc_range(detections, SELECTION, mcc_start, mcc_start + N_MCC)
+
+    # every tracker is predicted and updated on its own
+    monkeypatch.setattr(tf, "predict_filters", lambda filters: [kf.predict() for kf in filters])
+    monkeypatch.setattr(tf, "update_filters", update_alone)
+    alone = tm.TrackManager(tracker_type=tracker_type, visualize=False)
+    alone.track_mcc_range(detections, SELECTION, mcc_start, mcc_start + N_MCC)
+
+    assert max(len(track) for track in stacked) > 3
+    assert [len(track) for track in stacked] == [len(track) for track in alone]
+    for track_stacked, track_alone in zip(stacked, alone):
+        np.testing.assert_allclose(track_stacked._tracker.x, track_alone._tracker.x, rtol=1e-10)
+        np.testing.assert_allclose(track_stacked._tracker.P, track_alone._tracker.P, rtol=1e-10, atol=1e-12)
+
+
+def test_fused_detection_losing_its_best_track_goes_to_next_gating_track():
+    track_mgmt = tm.FusedTrackManager(visualize=False)
+    for x in (10.0, 11.0):
+        track = dc.Track(len(track_mgmt), track_mgmt._lst_not_assigned_detections._track_gate)
+        track.init_tracker(type='information_filter', init_x=np.array([[x, 0, 1.0, 0]]).T)
+        track._last_update = 0
+        track_mgmt.append_track(track)
+    lst_det = dc.DetectionList()
+    # both detections of the left radar are closest to the first track, the first one is closer to it
+    for x in (10.0, 10.3):
+        lst_det.append_detection(dc.DetectionPoint.from_attributes(1, 0, x, 1.0, np.hypot(x, 1.0), 0.1, -5.0))
+    track_mgmt.new_detections(lst_det)
+    assert [[point.x for point in track] for track in track_mgmt] == [[10.0], [10.3]]
+    assert not track_mgmt._lst_not_assigned_detections
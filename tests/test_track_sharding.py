@@ -0,0 +1,41 @@
+import numpy as np
+import track_sharding as ts
+
+
+def test_split_mcc_range_adds_warm_up_to_later_shards():
+    assert ts.split_mcc_range(100, 200, 4, 10) == [{"mcc_start": 100, "mcc_from": 100, "mcc_end": 125},
+                                                   {"mcc_start": 115, "mcc_from": 125, "mcc_end": 150},
+                                                   {"mcc_start": 140, "mcc_from": 150, "mcc_end": 175},
+                                                   {"mcc_start": 165, "mcc_from": 175, "mcc_end": 200}]
+    # the warm-up does not reach before the interval, empty shards are dropped
+    assert ts.split_mcc_range(100, 103, 6, 50) == [{"mcc_start": 100, "mcc_from": 100, "mcc_end": 101},
+                                                   {"mcc_start": 100, "mcc_from": 101, "mcc_end": 102},
+                                                   {"mcc_start": 100, "mcc_from": 102, "mcc_end": 103}]
+
+
+def track(mcc, y=0.0):
+    mcc = np.asarray(mcc)
+    return {"active": True, "mcc": mcc, "razimuth": np.zeros(mcc.size), "rvelocity": np.zeros(mcc.size),
+            "x": 10.0 + 0.1 * mcc, "y": np.full(mcc.size, y), "beam": np.zeros(mcc.size, dtype=int),
+            "x_est": 10.0 + 0.1 * mcc, "dx_est": np.full(mcc.size, 2.0), "y_est": np.full(mcc.size, y),
+            "dy_est": np.zeros(mcc.size)}
+
+
+def test_track_crossing_the_overlap_is_stitched_into_one():
+    shards = ts.split_mcc_range(0, 100, 2, 10)
+    first = [track(np.arange(0, 50)), track(np.arange(0, 20), y=5.0)]
+    # the second shard sees the crossing track from its warm-up, a new track and a track ending in the warm-up
+    second = [track(np.arange(40, 100)), track(np.arange(60, 100), y=-5.0), track(np.arange(42, 48), y=8.0)]
+    stitched = ts.stitch_tracks([first, second], shards)
+
+    assert len(stitched) == 3
+    np.testing.assert_array_equal(stitched[0]["mcc"], np.arange(0, 100))
+    np.testing.assert_allclose(stitched[0]["x"], 10.0 + 0.1 * np.arange(0, 100))
+    np.testing.assert_array_equal(stitched[1]["mcc"], np.arange(0, 20))
+    np.testing.assert_array_equal(stitched[2]["mcc"], np.arange(60, 100))
+
+
+def test_tracks_apart_in_the_overlap_are_not_stitched():
+    shards = ts.split_mcc_range(0, 100, 2, 10)
+    stitched = ts.stitch_tracks([[track(np.arange(0, 50))], [track(np.arange(40, 100), y=3.0)]], shards)
+    assert [elem["mcc"].min() for elem in stitched] == [0, 50]
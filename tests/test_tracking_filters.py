@@ -0,0 +1,215 @@
+import copy
+import numpy as np
+import data_containers as dc
+import tracking_filters as tf
+
+
+def imm_filters(n):
+    rng = np.random.default_rng(3)
+    filters = []
+    for i in range(n):
+        kf = tf.constant_velocity_filter(x=np.array([[10. + i, -3., 1. + i, 0.5]]).T, filter_type='imm')
+        kf.predict()
+        kf.update(np.array([[10. + i + rng.normal(), 1. + i + rng.normal()]]).T)
+        filters.append(kf)
+    return filters
+
+
+def assert_filters_equal(stacked, alone, attributes):
+    for kf_stacked, kf_alone in zip(stacked, alone):
+        for attribute in attributes:
+            np.testing.assert_allclose(getattr(kf_stacked, attribute), getattr(kf_alone, attribute),
+                                       rtol=1e-12, atol=1e-12)
+
+
+def test_imm_frame_equals_filters_alone():
+    stacked = imm_filters(6)
+    alone = copy.deepcopy(stacked)
+    zs = [np.array([[9. + i, 1.5 + i]]).T for i in range(6)]
+
+    tf.predict_filters(stacked)
+    tf.update_filters(stacked, zs)
+    for kf, z in zip(alone, zs):
+        kf.predict()
+        kf.update(z)
+    assert_filters_equal(stacked, alone, ("x", "P", "xs", "Ps", "mu", "y", "S", "log_likelihood"))
+
+
+def test_filters_are_stacked_by_class_and_models():
+    filters = imm_filters(3) + [tf.constant_velocity_filter(x=np.array([[5., 1., 0., 0.]]).T)]
+    other_models = tf.constant_velocity_filter(x=np.array([[7., 1., 0., 0.]]).T, filter_type='imm')
+    other_models.set_models(turn_rates=(0.0, 0.2))
+    filters.append(other_models)
+    alone = copy.deepcopy(filters)
+
+    tf.predict_filters(filters)
+    for kf in alone:
+        kf.predict()
+    assert [len(stack) for key, stack in tf._filter_stacks(filters)] == [3, 1, 1]
+    assert_filters_equal(filters, alone, ("x", "P"))
+
+
+def test_polar_measurement_from_ego_origin_and_sensor():
+    xs = np.array([[3., 1., 4., 0.], [3., 1., 5., 0.]])
+    np.testing.assert_allclose(tf.polar_measurement(xs[0]), [5., np.arctan(4. / 3.), 0.6])
+    np.testing.assert_allclose(tf.polar_measurement(xs, np.array([0., 1.]))[1], [5., np.arctan(4. / 3.), 0.6])
+
+
+def test_polar_jacobian_equals_finite_differences():
+    rng = np.random.default_rng(7)
+    xs = np.column_stack((rng.uniform(2, 40, 5), rng.normal(0, 5, 5), rng.uniform(-10, 10, 5), rng.normal(0, 5, 5)))
+    sensors = np.column_stack((np.zeros(5), rng.choice([-0.94, 0.94], 5)))
+    eps = 1e-6
+    numeric = np.stack([(tf.polar_measurement(xs + eps * e, sensors) - tf.polar_measurement(xs - eps * e, sensors))
+                        / (2 * eps) for e in np.eye(4)], axis=-1)
+    np.testing.assert_allclose(tf.polar_jacobian(xs, sensors), numeric, atol=1e-7)
+
+
+def test_polar_residual_wraps_azimuth():
+    ys = tf.polar_residual(np.array([[10., np.pi / 2 - 0.01, 1.]]), np.array([[9., -np.pi / 2 + 0.01, 2.]]))
+    np.testing.assert_allclose(ys, [[1., -0.02, -1.]], atol=1e-12)
+
+
+def test_polar_measurement_of_track_point_is_measured_from_its_radar():
+    car_width = 1.88
+    state = np.array([12., -4., 2.5, 0.8])
+    for left in (True, False):
+        # the radar is mounted at y = +-car_width/2 and mirrors y of the right one, see DetectionPoint
+        x_r, y_r = state[0], (1 if left else -1) * state[2] - car_width / 2
+        dy_r = (1 if left else -1) * state[3]
+        rng = np.hypot(x_r, y_r)
+        det = dc.DetectionPoint(rng=rng, azimuth=np.arctan2(y_r, x_r), vel=(x_r * state[1] + y_r * dy_r) / rng,
+                                left=left, car_width=car_width)
+        track = dc.Track(1)
+        track.append_detection(det)
+        z = np.ravel(track[-1].get_polar_z_array())
+        sensor = track[-1].get_sensor_array()
+        np.testing.assert_allclose(z, tf.polar_measurement(state, sensor), atol=1e-12)
+        assert abs(z[0] - rng) < 1e-12
+        assert abs(tf.polar_measurement(state)[0] - rng) > 0.1
+
+
+def polar_filters(filter_type, n):
+    filters = []
+    for i in range(n):
+        kf = tf.constant_velocity_filter(x=np.array([[10. + 3 * i, -2., 1. - i, 0.3]]).T, filter_type=filter_type)
+        kf.predict()
+        filters.append(kf)
+    return filters
+
+
+def test_polar_frame_equals_filters_alone():
+    for filter_type in ("extended_kalman_filter", "unscented_kalman_filter"):
+        stacked = polar_filters(filter_type, 5)
+        alone = copy.deepcopy(stacked)
+        sensors = [np.array([0., 0.94 if i % 2 else -0.94]) for i in range(5)]
+        zs = [np.array([[np.hypot(10. + 3 * i, 1.5 - i), np.arctan2(1.5 - i, 10. + 3 * i), -1.8]]).T
+              for i in range(5)]
+
+        tf.update_filters(stacked, zs, sensors)
+        for kf, z, sensor in zip(alone, zs, sensors):
+            kf.update(z, sensor=sensor)
+        assert len(list(tf._filter_stacks(stacked))) == 1
+        assert_filters_equal(stacked, alone, ("x", "P", "y", "S", "H", "log_likelihood"))
+
+
+def test_coordinated_turn_filters_of_a_frame_follow_the_turn():
+    omega, dt = 0.4, 50.0e-3
+    filters = []
+    for speed in (10., 20., 30.):
+        kf = tf.constant_velocity_filter(dt, x=np.array([[5., speed, 1., 0.]]).T, filter_type='coordinated_turn')
+        kf.x[4] = omega
+        filters.append(kf)
+    alone = copy.deepcopy(filters)
+
+    tf.predict_filters(filters)
+    for kf in alone:
+        kf.predict()
+    assert_filters_equal(filters, alone, ("x", "P", "F"))
+    for kf, speed in zip(filters, (10., 20., 30.)):
+        exact = tf.turn_transition(dt, omega) @ np.array([5., speed, 1., 0.])
+        np.testing.assert_allclose(np.ravel(kf.x)[:4], exact, rtol=1e-7)
+        assert kf.x.shape == (5, 1) and kf.P.shape == (5, 5)
+
+
+def test_information_filter_fuses_measurements_as_sequential_updates():
+    zs = [np.array([[10.2, 1.1]]).T, np.array([[9.9, 0.8]]).T]
+    Rs = [np.diag([0.2, 0.1]), np.diag([0.5, 0.05])]
+    fused = tf.constant_velocity_filter(x=np.array([[10., -3., 1., 0.5]]).T, filter_type='information_filter')
+    sequential = tf.constant_velocity_filter(x=np.array([[10., -3., 1., 0.5]]).T)
+    for kf in (fused, sequential):
+        kf.predict()
+
+    fused.update_multiple(zs, Rs)
+    for z, R in zip(zs, Rs):
+        sequential.update(z, R)
+    np.testing.assert_allclose(fused.x, sequential.x, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(fused.P, sequential.P, rtol=1e-10, atol=1e-12)
+    assert fused.ys.shape == (2, 2, 1) and fused.Ss.shape == (2, 2, 2)
+
+
+def test_information_filter_update_equals_kalman_filter_update():
+    information = tf.constant_velocity_filter(x=np.array([[10., -3., 1., 0.5]]).T, filter_type='information_filter')
+    kalman = tf.constant_velocity_filter(x=np.array([[10., -3., 1., 0.5]]).T)
+    for kf in (information, kalman):
+        kf.predict()
+        kf.update(np.array([[9.7, 1.3]]).T)
+    for attribute in ("x", "P", "y", "S", "log_likelihood"):
+        np.testing.assert_allclose(getattr(information, attribute), getattr(kalman, attribute), rtol=1e-10,
+                                   atol=1e-12)
+
+
+def sequences(n_seq=4, n=12, seed=9):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 50.0e-3
+    zs = np.stack([np.column_stack((10. + i - 3. * t, 1. + 0.5 * t)) + rng.normal(0, 0.3, (n, 2))
+                   for i in range(n_seq)])
+    x0 = np.array([[10. + i, -3., 1., 0.5] for i in range(n_seq)])
+    # padded sequences end early, one of them misses a measurement in the middle
+    mask = np.ones((n_seq, n), dtype=bool)
+    mask[1, 8:] = False
+    mask[2, 5] = False
+    return zs, x0, mask
+
+
+def test_sequences_filtered_and_smoothed_at_once_equal_each_sequence_alone():
+    zs, x0, mask = sequences()
+    kf = tf.constant_velocity_filter()
+    means, covariances, means_p, covariances_p = kf.batch_filter_sequences(zs, mask, x0)
+    smoothed, smoothed_P, gains = kf.rts_smoother_sequences(means, covariances)
+
+    for s in range(zs.shape[0]):
+        alone = tf.constant_velocity_filter(x=x0[s].reshape(4, 1))
+        xs, Ps = [], []
+        for z, measured in zip(zs[s], mask[s]):
+            alone.predict()
+            if measured:
+                alone.update(z.reshape(2, 1))
+            xs.append(np.ravel(alone.x))
+            Ps.append(alone.P.copy())
+        xs, Ps = np.array(xs), np.array(Ps)
+        np.testing.assert_allclose(means[s], xs, rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(covariances[s], Ps, rtol=1e-10, atol=1e-12)
+        x_smoothed, P_smoothed, K = alone.rts_smoother(xs, Ps)
+        np.testing.assert_allclose(smoothed[s], x_smoothed, rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(smoothed_P[s], P_smoothed, rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(gains[s], K, rtol=1e-8, atol=1e-10)
+
+
+def test_workspace_kalman_filter_equals_kalman_filter():
+    zs, x0, mask = sequences(n=30)
+    workspace = tf.constant_velocity_filter(x=x0[0].reshape(4, 1), filter_type='workspace_kalman_filter')
+    kalman = tf.constant_velocity_filter(x=x0[0].reshape(4, 1))
+    assert isinstance(workspace, tf.WorkspaceKalmanFilter)
+    buffers = None
+    for z in zs[0]:
+        for kf in (workspace, kalman):
+            kf.predict()
+            kf.update(z.reshape(2, 1))
+        for attribute in ("x", "P", "y", "S", "K"):
+            np.testing.assert_allclose(getattr(workspace, attribute), getattr(kalman, attribute), rtol=1e-10,
+                                       atol=1e-12)
+        # results are written into the same buffers in every step
+        if buffers is None:
+            buffers = [id(getattr(workspace, attribute)) for attribute in ("x", "P", "y", "S", "K")]
+        assert buffers == [id(getattr(workspace, attribute)) for attribute in ("x", "P", "y", "S", "K")]
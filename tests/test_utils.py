@@ -0,0 +1,29 @@
+import numpy as np
+from utils import runge_kutta4, runge_kutta4_batch
+
+
+def turn(ys, t, omega):
+    # coordinated turn of states [x, dx, y, dy] at per-state turn rates
+    return np.stack((ys[:, 1], -omega * ys[:, 3], ys[:, 3], omega * ys[:, 1]), axis=1)
+
+
+def test_runge_kutta4_batch_equals_runge_kutta4():
+    rng = np.random.default_rng(1)
+    ys = rng.normal(0, 5, (6, 4))
+    omega = rng.normal(0, 0.3, 6)
+    for n_steps in (1, 4):
+        batch = runge_kutta4_batch(ys, 0.5, 0.2, turn, n_steps, args=(omega,))
+        for y, w, y_batch in zip(ys, omega, batch):
+            f = lambda y, t: turn(y[np.newaxis], t, w)[0]
+            for step in range(n_steps):
+                y = runge_kutta4(y, 0.5 + step * 0.2 / n_steps, 0.2 / n_steps, f)
+            np.testing.assert_allclose(y_batch, y, rtol=1e-13, atol=1e-13)
+
+
+def test_runge_kutta4_batch_keeps_n_steps_apart_from_args():
+    ys = np.array([[0., 1., 0., 0.]])
+    one_step = runge_kutta4_batch(ys, 0., 1., turn, args=(np.array([0.5]),))
+    np.testing.assert_allclose(one_step, runge_kutta4_batch(ys, 0., 1., turn, 1, (np.array([0.5]),)))
+    exact = [np.sin(0.5) / 0.5, np.cos(0.5), (1 - np.cos(0.5)) / 0.5, np.sin(0.5)]
+    np.testing.assert_allclose(runge_kutta4_batch(ys, 0., 1., turn, 20, args=(np.array([0.5]),))[0], exact,
+                               rtol=1e-7)
@@ -1,30 +1,129 @@
 import numpy as np
 import logging
 import data_containers as dc
-import radar_plots as rp
+import tracking_filters as tf
+import instrumentation as instr
+
+# Default parameters of the track management keyed by their names in the sections [Track_management] and
+# [TrackerKF] of analysis.cnf, see :meth:`data_containers.cnf_tracking_parser`. Types of values are the types the
+# configuration file is converted to.
+TRACKING_PARAMETERS = {"unassigned_dets_memory": 10,
+                       "track_life_memory": 10,
+                       "gate_track_init_x": 0.5,
+                       "gate_track_init_y": 0.3,
+                       "gate_track_init_dx": 0.65,
+                       "gate_track_init_dy": 0.3,
+                       "gate_track_init_rvel": 0.0,
+                       "gate_track_init_raz": 0.0,
+                       "gate_track_init_rrng": 0.0,
+                       "gate_update_x": 2.0,
+                       "gate_update_y": 2.0,
+                       "gate_update_dx": 0.0,
+                       "gate_update_dy": 0.0,
+                       "gate_update_rvel": 0.0,
+                       "gate_update_raz": 0.0,
+                       "gate_update_rrng": 0.0,
+                       "projection_dist": 2.0,
+                       "projection_vel": 0.2,
+                       "process_noise_var": 0.001,
+                       "measurement_noise_x": 0.2,
+                       "measurement_noise_y": 0.1,
+                       "measurement_noise_range": 0.04,
+                       "measurement_noise_azimuth": 3.0e-4,
+                       "measurement_noise_rvelocity": 0.01}
+
+
+def _gates_from_params(p):
+    # the gate initiating tracks and the pattern of gates of tracks
+    gate = dc.Gate(beam=[], x=0, y=0, diffx=p["gate_track_init_x"], diffy=p["gate_track_init_y"], dx=0, dy=0,
+                   diffdx=p["gate_track_init_dx"], diffdy=p["gate_track_init_dy"],
+                   rvelocity=0, d_rvelocity=p["gate_track_init_rvel"], razimuth=0,
+                   d_razimuth=p["gate_track_init_raz"], rrange=0, d_rrange=p["gate_track_init_rrng"])
+    track_gate = dc.Gate(beam=[], x=0, y=0, diffx=p["gate_update_x"], diffy=p["gate_update_y"], dx=0, dy=0,
+                         diffdx=p["gate_update_dx"], diffdy=p["gate_update_dy"], rvelocity=0,
+                         d_rvelocity=p["gate_update_rvel"], razimuth=0, d_razimuth=p["gate_update_raz"], rrange=0,
+                         d_rrange=p["gate_update_rrng"])
+    return gate, track_gate
+
+
+def _noise_from_params(p):
+    # noise variances passed to tracking filters by tracker_type
+    return {"q_var": p["process_noise_var"],
+            "r_x": p["measurement_noise_x"],
+            "r_y": p["measurement_noise_y"],
+            "r_polar": (p["measurement_noise_range"], p["measurement_noise_azimuth"],
+                        p["measurement_noise_rvelocity"])}
+
 
 class TrackManager(list):
 
-    def __init__(self, gate = None, tracker_type={'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2}, Tsampling=50.0e-3):
+    def __init__(self, gate = None, tracker_type={'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2}, Tsampling=50.0e-3,
+                 visualize=True, track_gate=None, unassigned_memory=TRACKING_PARAMETERS["unassigned_dets_memory"],
+                 track_life=TRACKING_PARAMETERS["track_life_memory"],
+                 projection_dist=TRACKING_PARAMETERS["projection_dist"],
+                 projection_vel=TRACKING_PARAMETERS["projection_vel"], monitor=None):
+        """ Creates an empty list of tracks together with a list of unassigned detections. Defaults are taken from
+        TRACKING_PARAMETERS.
+
+        :param gate: pattern of the gate used to initiate new tracks from unassigned detections
+        :param tracker_type: type and dimensions of tracking filters of new tracks, noise variances *q_var*, *r_x*,
+                             *r_y* and *r_polar* which are not given are taken from TRACKING_PARAMETERS
+        :param Tsampling: sampling period of the radar
+        :param visualize: plots every attempt to initiate a track when True
+        :param track_gate: pattern of the gate of every track used to assign new detections
+        :param unassigned_memory: number of MCCs unassigned detections are kept for
+        :param track_life: number of MCCs without an update after which a track is deactivated
+        :param projection_dist: the largest distance of two detections which can be projected to a third one
+        :param projection_vel: the largest difference of radar velocities of two projected detections
+        :param monitor: monitor of consistency which receives innovations of every update of tracks
+
+        :type gate: Gate
+        :type track_gate: Gate
+        :type monitor: consistency.ConsistencyMonitor
+        """
         super().__init__()
-        if gate is None:
-            self._gate = dc.Gate(beam=[], x=0, y=0, diffx=0.5, diffy=0.3, dx=0, dy=0, diffdx=0.65, diffdy=0.3,
-            rvelocity=0, d_rvelocity = 0, razimuth=0, d_razimuth=0, rrange=0, d_rrange=0)
-            #{'x': 3, 'y': 1, 'dx': 0.65, 'dy': 0.3}
-        else:
-            self._gate = gate
+        default_gate, default_track_gate = _gates_from_params(TRACKING_PARAMETERS)
+        self._gate = default_gate if gate is None else gate
+        track_gate = default_track_gate if track_gate is None else track_gate
         self._Tsampling = Tsampling
-        self._tracker_type = tracker_type
+        self._tracker_type = dict(_noise_from_params(TRACKING_PARAMETERS), **tracker_type)
+        self._visualize = visualize
+        self._unassigned_memory = unassigned_memory
+        self._track_life = track_life
+        self._monitor = monitor
         self._n_of_Tracks = np.array([0])
         logging.getLogger(__name__).debug("__init__: A new track manager will be created with a gate:")
         logging.getLogger(__name__).debug("__init__: \t \t %s", self._gate)
         logging.getLogger(__name__).debug("__init__: \t \t tracker_type %s,",  self._tracker_type)
         logging.getLogger(__name__).debug("__init__: \t \t Tsampl %s, number of tracks %s",
                                                                 self._Tsampling, self._n_of_Tracks)
-        self._lst_not_assigned_detections = dc.UnAssignedDetectionList(self._Tsampling, self._gate)
+        self._lst_not_assigned_detections = dc.UnAssignedDetectionList(self._Tsampling, self._gate, track_gate,
+                                                                       projection_dist, projection_vel)
         logging.getLogger(__name__).debug("__init__: \t just created, number of unassigned dets %s",
                                                             len(self._lst_not_assigned_detections))
 
+    @classmethod
+    def from_params(cls, params, tracker_type={'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2},
+                    Tsampling=50.0e-3, visualize=True, monitor=None):
+        """ Creates a track manager from parameters named as in analysis.cnf. Parameters which are not given keep
+        their values from TRACKING_PARAMETERS, noise variances are passed to tracking filters by *tracker_type*.
+
+        :param params: dictionary of parameters, see TRACKING_PARAMETERS
+        :param monitor: monitor of consistency, see :meth:`track_management.TrackManager.__init__`
+        :return: the track manager
+        :rtype: TrackManager
+        """
+        unknown = sorted(set(params) - set(TRACKING_PARAMETERS))
+        if unknown:
+            raise ValueError("Unknown tracking parameters: %s" % ", ".join(unknown))
+        p = dict(TRACKING_PARAMETERS)
+        p.update(params)
+        gate, track_gate = _gates_from_params(p)
+        tracker_type = dict(tracker_type, **_noise_from_params(p))
+        return cls(gate, tracker_type, Tsampling, visualize, track_gate,
+                   unassigned_memory=int(p["unassigned_dets_memory"]), track_life=int(p["track_life_memory"]),
+                   projection_dist=p["projection_dist"], projection_vel=p["projection_vel"], monitor=monitor)
+
 
     def append_track(self,track):
         """ Appends an existing track to the list of tracks, a new tracking filter is also created
@@ -47,29 +146,38 @@ class TrackManager(list):
         aim=[]
         logger.debug("new_detections: In a _lst_not_assigned_detections is %s detections.",
                      len(self._lst_not_assigned_detections))
-        self._lst_not_assigned_detections.remove_detections_by_mcc([0, lst_detections[0].get_mcc() - 10])
-        logger.debug("new_detections: \t after 10 mccs removal: %s detections.",
-                     len(self._lst_not_assigned_detections))
+        self._lst_not_assigned_detections.remove_detections_by_mcc(
+            [0, lst_detections[0].get_mcc() - self._unassigned_memory])
+        logger.debug("new_detections: \t after %s mccs removal: %s detections.",
+                     self._unassigned_memory, len(self._lst_not_assigned_detections))
 
         # track update loop - each new detection as assigned to an existing track
-        # triggers the update cycle of the track
+        # triggers the update cycle of the track, trackers of all tracks assigned in an MCC are updated together
+        # before detections of the next MCC are gated
+        updated = []
         for det in lst_detections:
+            if updated and det._mcc != self[updated[0]]._last_update:
+                self._update_trackers(updated)
+                updated.clear()
             if self:
                 logger.debug("new_detections, tracks exist: Currently some tracks exist in a list. Will be scrutinized. Number of tracks: %d",
                               len(self))
-                for elem in self:
-                    if elem._active and elem._last_update != det._mcc:
-                        aim.append(elem.test_detection_in_gate(det))
-                        logger.debug("new_detections, tracks exist: The vector of all distances from each track's gate center, the aim, is: %5.3f", aim[-1])
-                    else:
-                        logger.debug("new_detections, tracks exist: none of tracks is active or they have been updated in this mcc")
-                        aim.append(0)
-                if aim[-1]:
+                with instr.timer("gating"):
+                    for elem in self:
+                        if elem._active and elem._last_update != det._mcc:
+                            aim.append(elem.test_detection_in_gate(det))
+                            logger.debug("new_detections, tracks exist: The vector of all distances from each track's gate center, the aim, is: %5.3f", aim[-1])
+                        else:
+                            logger.debug("new_detections, tracks exist: none of tracks is active or they have been updated in this mcc")
+                            aim.append(0)
+                instr.count("aim_comparisons", len(aim))
+                if max(aim):
                     logger.debug("new_detections, tracks exist: max(aim) is %5.3f pointing at the track number: %d",max(aim),aim.index(max(aim)))
                     self[aim.index(max(aim))].append_detection(det)
                     logger.debug("new_detections, tracks exist: The detection was assigned to a track number: %d", aim.index(max(aim)))
-                    self[aim.index(max(aim))].update_tracker()
-                    logger.debug("new_detections, tracks exist: track updated")
+                    # the track takes no other detection of this MCC
+                    self[aim.index(max(aim))]._last_update = det._mcc
+                    updated.append(aim.index(max(aim)))
                     unassigned = False
                 else:
                     logger.debug("new_detections, tracks exist: currently tested detection doesn't fit in.")
@@ -79,52 +187,81 @@ class TrackManager(list):
             aim.clear()
 
             if unassigned:
-                # The detection 'det' was not assigned to an existing track, will be passed to
-                # the list of unassigned detections.
-                logger.debug("new_detections, no track exists yet. Processing detection at mcc: %d" ,det._mcc)
-                # test unassigned detections
-                newly_formed_track = self._lst_not_assigned_detections.new_detection(det)
-                if newly_formed_track:
-                    title = 'A new track created at {0}. Incomming {1} new detections, {2} unassigned '.format(det._mcc,
-                                                                                                               len(lst_detections),
-                                                                                                               len(self._lst_not_assigned_detections)
-                                                                                                               )
-                    rp.static_track_init(3,
-                                         lst_detections,
-                                         self._lst_not_assigned_detections,
-                                         det,
-                                         newly_formed_track['best_fit_gate'],
-                                         newly_formed_track['new_track'].get_array_trackpoints(),
-                                         title)
-
-                     # a new track is started with a detection "det"
-                    self.append_track(newly_formed_track['new_track'])
-                    logger.debug("new_detections, no tracks: A new track was created. Currently %d tracks is in the list.",len(self))
-                    self[-1].init_tracker(type=self._tracker_type['filter_type'],
-                                          dim_x=self._tracker_type['dim_x'],
-                                          dim_z=self._tracker_type['dim_z'],
-                                          dt=self._Tsampling,
-                                          init_x=self[-1][0].get_xy_array())
-                    logger.debug("new_detections, no tracks: tracker initialized for the new track: %s",self[-1]._tracker)
-                    self[-1].start_tracker()
-                    logger.debug("new_detections, no tracks: new track's first 3 points: %s",self[-1])
-                else:
-                    title = 'No track created at {0}. Incomming {1} new detections, {2} unassigned '.format(det._mcc,
-                                                                                                            len(lst_detections),
-                                                                                                            len(self._lst_not_assigned_detections)
-                                                                                                            )
-                    rp.static_track_init(3,
-                                         lst_detections,
-                                         self._lst_not_assigned_detections,
-                                         None,
-                                         None,
-                                         None,
-                                         title)
+                self._initiate_track(det, lst_detections)
             else:
                 # TODO: tracker update to finish here
                 # The detection 'det' was assigned to an existing track and its appropriate tracker
                 # needs to update.
                 pass
+        if updated:
+            self._update_trackers(updated)
+
+    def _update_trackers(self, indices):
+        # trackers of tracks assigned in one MCC are updated by their last points at once, filters sharing their
+        # parameters are stacked, see tracking_filters.update_filters
+        tracks = [self[idx] for idx in indices]
+        measurements = [elem.get_measurement(elem[-1]) for elem in tracks]
+        with instr.timer("kf_update"):
+            tf.update_filters([elem._tracker for elem in tracks], [z for z, sensor in measurements],
+                              [sensor for z, sensor in measurements])
+        for idx, elem in zip(indices, tracks):
+            elem.tracker_updated()
+            if self._monitor is not None:
+                self._monitor.add_innovation(idx, elem._tracker.y, elem._tracker.S)
+        logging.getLogger(__name__).debug("new_detections: %s tracks updated", len(tracks))
+
+    def _initiate_track(self, det, lst_detections):
+        logger = logging.getLogger(__name__)
+        # The detection 'det' was not assigned to an existing track, will be passed to
+        # the list of unassigned detections.
+        logger.debug("new_detections, no track exists yet. Processing detection at mcc: %d" ,det._mcc)
+        # test unassigned detections
+        with instr.timer("initiation"):
+            newly_formed_track = self._lst_not_assigned_detections.new_detection(det)
+        if newly_formed_track:
+            title = 'A new track created at {0}. Incomming {1} new detections, {2} unassigned '.format(det._mcc,
+                                                                                                       len(lst_detections),
+                                                                                                       len(self._lst_not_assigned_detections)
+                                                                                                       )
+            if self._visualize:
+                import radar_plots as rp
+                rp.static_track_init(3,
+                                     lst_detections,
+                                     self._lst_not_assigned_detections,
+                                     det,
+                                     newly_formed_track['best_fit_gate'],
+                                     newly_formed_track['new_track'].get_array_trackpoints(),
+                                     title)
+
+             # a new track is started with a detection "det"
+            self.append_track(newly_formed_track['new_track'])
+            logger.debug("new_detections, no tracks: A new track was created. Currently %d tracks is in the list.",len(self))
+            self[-1].init_tracker(type=self._tracker_type['filter_type'],
+                                  dim_x=self._tracker_type['dim_x'],
+                                  dim_z=self._tracker_type['dim_z'],
+                                  dt=self._Tsampling,
+                                  init_x=self[-1][0].get_xy_array(),
+                                  q_var=self._tracker_type['q_var'],
+                                  r_x=self._tracker_type['r_x'],
+                                  r_y=self._tracker_type['r_y'],
+                                  r_polar=self._tracker_type['r_polar'])
+            logger.debug("new_detections, no tracks: tracker initialized for the new track: %s",self[-1]._tracker)
+            self[-1].start_tracker()
+            logger.debug("new_detections, no tracks: new track's first 3 points: %s",self[-1])
+        else:
+            title = 'No track created at {0}. Incomming {1} new detections, {2} unassigned '.format(det._mcc,
+                                                                                                    len(lst_detections),
+                                                                                                    len(self._lst_not_assigned_detections)
+                                                                                                    )
+            if self._visualize:
+                import radar_plots as rp
+                rp.static_track_init(3,
+                                     lst_detections,
+                                     self._lst_not_assigned_detections,
+                                     None,
+                                     None,
+                                     None,
+                                     title)
 
     def port_data(self,requested_data):
         logger = logging.getLogger(__name__)
@@ -146,13 +283,157 @@ class TrackManager(list):
             else:
                 logger.debug("track_mgmt: porting tracks_aray data. No track in the list, None ported.")
                 return None
+        if requested_data == "tracks_padded":
+            return self._port_tracks_padded()
+
+    def _port_tracks_padded(self):
+        # One step per MCC from the first to the last point of every track, tracks are aligned to their first MCC
+        tracks = [elem.get_array_trackpoints() for elem in self]
+        spans = [int(track["mcc"].max() - track["mcc"].min()) + 1 if track["mcc"].size else 0 for track in tracks]
+        n_steps = max(spans, default=0)
+        padded = {"mcc0": np.zeros(len(tracks), dtype=int),
+                  "z": np.zeros((len(tracks), n_steps, 2)),
+                  "mask": np.zeros((len(tracks), n_steps), dtype=bool),
+                  "x0": np.zeros((len(tracks), 4)),
+                  "length": np.array(spans, dtype=int),
+                  "trackID": np.array([elem.get_ID() for elem in self], dtype=int)}
+        for n, (elem, track) in enumerate(zip(self, tracks)):
+            if not track["mcc"].size:
+                continue
+            padded["mcc0"][n] = track["mcc"].min()
+            step = track["mcc"].astype(int) - padded["mcc0"][n]
+            # the last point of an MCC wins when a track holds more of them
+            padded["z"][n, step, 0] = track["x"]
+            padded["z"][n, step, 1] = track["y"]
+            padded["mask"][n, step] = True
+            padded["x0"][n] = np.ravel(elem[int(np.argmin(track["mcc"]))].get_xy_array())
+        logging.getLogger(__name__).debug("track_mgmt: porting tracks_padded data. %s tracks padded to %s MCCs",
+                                          len(tracks), n_steps)
+        return padded
+
+    def smooth_tracks(self):
+        """ Filters and smooths all tracks offline by one batched call of
+        :meth:`tracking_filters.KalmanFilter.batch_filter_sequences` and
+        :meth:`tracking_filters.KalmanFilter.rts_smoother_sequences`. Tracks are padded by
+        :meth:`track_management.TrackManager.port_data` ("tracks_padded"), filters are configured as filters of
+        new tracks.
+
+        :return: the padded tracks extended by keys *x_filtered*, *P_filtered*, *x_smoothed* and *P_smoothed*,
+                 states are [x, dx, y, dy] of the shape (n_tracks, n_steps, 4)
+        :rtype: dict
+        """
+        padded = self.port_data("tracks_padded")
+        kf = tf.constant_velocity_filter(self._Tsampling, self._tracker_type['q_var'], self._tracker_type['r_x'],
+                                         self._tracker_type['r_y'])
+        with instr.timer("smoothing"):
+            # the first point gives the prior of the first step, every step is updated before the prediction follows
+            xs, Ps, _, _ = kf.batch_filter_sequences(padded["z"], padded["mask"], padded["x0"], update_first=True)
+            padded["x_filtered"], padded["P_filtered"] = xs, Ps
+            padded["x_smoothed"], padded["P_smoothed"], _ = kf.rts_smoother_sequences(xs, Ps)
+        return padded
 
     def predict(self,mcc):
+        live = []
         for elem in self:
-            if elem._last_update < mcc-10:
+            if elem._last_update < mcc - self._track_life:
                 elem.deactivate()
             else:
-                elem.predict()
+                live.append(elem)
+        # trackers of all live tracks are predicted at once, see tracking_filters.predict_filters
+        with instr.timer("kf_predict"):
+            tf.predict_filters([elem._tracker for elem in live])
+        for elem in live:
+            elem.tracker_predicted()
+        if instr.is_enabled():
+            instr.count("active_tracks", sum(1 for elem in self if elem._active))
+            instr.count("unassigned_detections", len(self._lst_not_assigned_detections))
+
+    def track_mcc_range(self, lst_det, selection, mcc_start, mcc_end, mcc_step=1):
+        """ Runs the filtering loop over an interval of MCCs. Detections of every MCC are selected from *lst_det*
+        and passed to :meth:`track_management.TrackManager.new_detections`, the predict cycle follows.
+
+        :param lst_det: all detections available for the tracking
+        :param selection: a selection structure constraining detections which enter the tracker
+        :param mcc_start: the first MCC to process
+        :param mcc_end: the MCC where the processing stops, it is not processed itself
+        :param mcc_step: number of MCCs processed in one loop cycle
+        :type lst_det: DetectionList
+        :type selection: dict
+        """
+        selection = dict(selection)
+        i_prev = mcc_start
+        for i in range(mcc_start, mcc_end, mcc_step):
+            selection["mcc_tp"] = (i_prev, i)
+            lst_det_per_loop_cycle = lst_det.get_lst_detections_selected(selection=selection)
+            if lst_det_per_loop_cycle:
+                lst_det_per_loop_cycle.calculate_intervals()
+                self.new_detections(lst_det_per_loop_cycle)
+            self.predict(i)
+            instr.end_mcc(i)
+            i_prev = i + 1
+
+
+class FusedTrackManager(TrackManager):
+
+    def __init__(self, gate=None, tracker_type={'filter_type': 'information_filter', 'dim_x': 4, 'dim_z': 2},
+                 Tsampling=50.0e-3, visualize=True, *args, **kwargs):
+        """ Tracks detections of the left and the right radar by one list of tracks. Detections of both radars are
+        already in the common EGO frame, :class:`data_containers.DetectionPoint` mirrors y of the right radar and
+        shifts both by a half of EGO_car_width. In every MCC detections are assigned greedily, the closest pairs of a
+        detection and a gating track first, each track takes at most one detection of each radar. When both radars
+        see the target their detections are fused by one update of the information filter, see
+        :meth:`tracking_filters.InformationFilter.update_multiple`. Other arguments are the same as of
+        :meth:`track_management.TrackManager.__init__`.
+
+        .. code-block:: Python
+
+            lst_det = dc.DetectionList()
+            lst_det.append_data_from_m_file(leftradar_path, True, car_width)
+            lst_det.append_data_from_m_file(rightradar_path, False, car_width)
+            track_mgmt = tm.FusedTrackManager(visualize=False)
+            track_mgmt.track_mcc_range(lst_det, selection, mcc_start, mcc_end)
+        """
+        super().__init__(gate, tracker_type, Tsampling, visualize, *args, **kwargs)
+
+    def new_detections(self, lst_detections):
+        logger = logging.getLogger(__name__)
+        self._lst_not_assigned_detections.remove_detections_by_mcc(
+            [0, lst_detections[0].get_mcc() - self._unassigned_memory])
+
+        # pairs of detections and gating tracks, updates wait until all detections are gated
+        candidates = []
+        for n, det in enumerate(lst_detections):
+            with instr.timer("gating"):
+                aim = [elem.test_detection_in_gate(det) if elem._active and elem._last_update != det._mcc else 0
+                       for elem in self]
+            instr.count("aim_comparisons", len(aim))
+            candidates.extend((value, n, idx) for idx, value in enumerate(aim) if value)
 
+        # greedy assignment, the closest pairs first, every track takes at most one detection of every radar and a
+        # detection which loses its best track is tried on the next gating one
+        assigned = {}
+        used = set()
+        for value, n, idx in sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1], candidate[2])):
+            key = (idx, lst_detections[n]._y_correction_dir)
+            if n not in used and key not in assigned:
+                assigned[key] = (value, lst_detections[n])
+                used.add(n)
+        unassigned = [det for n, det in enumerate(lst_detections) if n not in used]
 
+        by_track = {}
+        for (idx, sensor), (aim, det) in sorted(assigned.items(), key=lambda item: item[0]):
+            by_track.setdefault(idx, []).append(det)
+        for idx, dets in by_track.items():
+            for det in dets:
+                self[idx].append_detection(det)
+            self[idx].update_tracker(len(dets))
+            if self._monitor is not None:
+                tracker = self[idx]._tracker
+                for y, S in zip(getattr(tracker, "ys", [tracker.y]), getattr(tracker, "Ss", [tracker.S])):
+                    self._monitor.add_innovation(idx, y, S)
+        instr.count("fused_updates", sum(1 for dets in by_track.values() if len(dets) > 1))
+        logger.debug("new_detections: %s tracks updated, %s of them by both radars, %s detections unassigned",
+                     len(by_track), sum(1 for dets in by_track.values() if len(dets) > 1), len(unassigned))
 
+        for det in unassigned:
+            self._initiate_track(det, lst_detections)
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import numpy as np
+import track_management as tm
+import shared_dataset as sd
+
+TRACK_KEYS = ("mcc", "razimuth", "rvelocity", "x", "y", "beam", "x_est", "dx_est", "y_est", "dy_est")
+
+
+def split_mcc_range(mcc_start, mcc_end, n_shards, overlap):
+    """ Splits an interval of MCCs into shards of (almost) equal length. Every shard except the first one starts
+    *overlap* MCCs before the MCCs it owns, these MCCs are used to warm up its TrackManager.
+
+    +-------------+-------------------------------------------------------------+
+    | Key         | Description                                                 |
+    +=============+=============================================================+
+    | mcc_start   | the first MCC processed by the shard (warm-up included)     |
+    +-------------+-------------------------------------------------------------+
+    | mcc_from    | the first MCC owned by the shard                            |
+    +-------------+-------------------------------------------------------------+
+    | mcc_end     | the end of the shard, the MCC is not processed itself       |
+    +-------------+-------------------------------------------------------------+
+
+    :param mcc_start: the first MCC to process
+    :param mcc_end: the MCC where the processing stops
+    :param n_shards: number of shards
+    :param overlap: number of warm-up MCCs
+    :return: list of shards
+    :rtype: list of dict
+    """
+    bounds = np.linspace(mcc_start, mcc_end, n_shards + 1).astype(int)
+    shards = []
+    for n in range(0, n_shards):
+        if bounds[n + 1] > bounds[n]:
+            shards.append({"mcc_start": max(mcc_start, int(bounds[n]) - overlap) if n else int(bounds[n]),
+                           "mcc_from": int(bounds[n]),
+                           "mcc_end": int(bounds[n + 1])})
+    return shards
+
+
+def _track_shard(shard_args):
+    lst_det, selection, shard, tracker_type, Tsampling = shard_args
+    track_mgmt = tm.TrackManager(tracker_type=tracker_type, Tsampling=Tsampling, visualize=False)
+    track_mgmt.track_mcc_range(lst_det, selection, shard["mcc_start"], shard["mcc_end"])
+    list_of_tracks = track_mgmt.port_data("tracks_array")
+    logging.getLogger(__name__).debug("_track_shard: shard from %s to %s produced %s tracks",
+                                      shard["mcc_start"], shard["mcc_end"],
+                                      len(list_of_tracks) if list_of_tracks else 0)
+    return list_of_tracks if list_of_tracks else []
+
+
+def _trim_track(track, mcc_from):
+    keep = track["mcc"] >= mcc_from
+    trimmed = {key: track[key][keep] for key in TRACK_KEYS}
+    trimmed["active"] = track["active"]
+    return trimmed
+
+
+def _join_tracks(track_left, track_right, mcc_from):
+    keep = track_right["mcc"] >= mcc_from
+    joined = {key: np.concatenate((track_left[key], track_right[key][keep])) for key in TRACK_KEYS}
+    joined["active"] = track_right["active"]
+    return joined
+
+
+def _overlap_distance(track_left, track_right, mcc_i):
+    in_left = (mcc_i[0] <= track_left["mcc"]) & (track_left["mcc"] < mcc_i[1])
+    in_right = (mcc_i[0] <= track_right["mcc"]) & (track_right["mcc"] < mcc_i[1])
+    common, i_left, i_right = np.intersect1d(track_left["mcc"][in_left], track_right["mcc"][in_right],
+                                             return_indices=True)
+    if not common.size:
+        return np.inf
+    dx = track_left["x"][in_left][i_left] - track_right["x"][in_right][i_right]
+    dy = track_left["y"][in_left][i_left] - track_right["y"][in_right][i_right]
+    return np.mean(np.hypot(dx, dy))
+
+
+def stitch_tracks(shard_tracks, shards, max_distance=1.0):
+    """ Stitches tracks produced by independent shards into one list of tracks. Tracks of two neighbouring shards
+    are matched by their positions at common MCCs of the warm-up region, pairs with the smallest mean distance
+    under *max_distance* are joined. Warm-up points of unmatched tracks are dropped.
+
+    :param shard_tracks: list of tracks (as ported by TrackManager) for every shard
+    :param shards: shards as returned by :meth:`track_sharding.split_mcc_range`
+    :param max_distance: the largest mean distance in meters between two tracks which can be joined
+    :return: list of stitched tracks
+    :rtype: list of dict
+    """
+    logger = logging.getLogger(__name__)
+    stitched = list(shard_tracks[0]) if shard_tracks else []
+
+    for shard, tracks in zip(shards[1:], shard_tracks[1:]):
+        mcc_i = (shard["mcc_start"], shard["mcc_from"])
+        candidates = [n for n, elem in enumerate(stitched) if elem["mcc"].size and elem["mcc"][-1] >= mcc_i[0]]
+        pairs = []
+        for n_right, track_right in enumerate(tracks):
+            for n_left in candidates:
+                dist = _overlap_distance(stitched[n_left], track_right, mcc_i)
+                if dist < max_distance:
+                    pairs.append((dist, n_left, n_right))
+        pairs.sort()
+
+        used_left, used_right = set(), set()
+        for dist, n_left, n_right in pairs:
+            if n_left not in used_left and n_right not in used_right:
+                stitched[n_left] = _join_tracks(stitched[n_left], tracks[n_right], shard["mcc_from"])
+                used_left.add(n_left)
+                used_right.add(n_right)
+        logger.debug("stitch_tracks: %s tracks joined at MCC %s", len(used_right), shard["mcc_from"])
+
+        for n_right, track_right in enumerate(tracks):
+            if n_right not in used_right:
+                trimmed = _trim_track(track_right, shard["mcc_from"])
+                if trimmed["mcc"].size:
+                    stitched.append(trimmed)
+    return stitched
+
+
+def track_sharded(lst_det, selection, mcc_start, mcc_end, n_shards, overlap=50, processes=None,
+                  tracker_type={'filter_type': 'kalman_filter', 'dim_x': 4, 'dim_z': 2}, Tsampling=50.0e-3,
+                  max_distance=1.0):
+    """ Tracks an interval of MCCs split into shards, each shard is tracked by its own TrackManager in a separate
+    process. Tracks are stitched across shard boundaries afterwards, see :meth:`track_sharding.stitch_tracks`.
+
+    :param lst_det: all detections available for the tracking
+    :param selection: a selection structure constraining detections which enter the tracker
+    :param mcc_start: the first MCC to process
+    :param mcc_end: the MCC where the processing stops
+    :param n_shards: number of shards
+    :param overlap: number of warm-up MCCs preceding each shard
+    :param processes: number of worker processes, number of CPUs is used if None
+    :return: list of stitched tracks
+    :rtype: list of dict
+    """
+    shards = split_mcc_range(mcc_start, mcc_end, n_shards, overlap)
+    logging.getLogger(__name__).info("track_sharded: %s shards from %s to %s with an overlap of %s MCCs",
+                                     len(shards), mcc_start, mcc_end, overlap)
+
+    # Detections are published once, every shard attaches to them and selects its own MCCs
+    with sd.publish_detections(lst_det) as shared_det:
+        shard_args = [(shared_det, selection, shard, tracker_type, Tsampling) for shard in shards]
+        with multiprocessing.Pool(processes) as pool:
+            shard_tracks = pool.map(_track_shard, shard_args)
+
+    return stitch_tracks(shard_tracks, shards, max_distance)
@@ -1,10 +1,11 @@
 import math
+import functools
 import numpy as np
 from numpy import dot, zeros, eye, isscalar, shape
 import data_containers as dc
 import scipy.linalg as linalg
 from numpy import dot, zeros, eye, asarray
-from utils import setter, setter_scalar, dot3, setter_1d
+from utils import setter, setter_scalar, dot3, setter_1d, Q_discrete_white_noise, runge_kutta4_batch
 from stats import logpdf
 
 
@@ -33,6 +34,8 @@ class TrackingFilter(object):
         self._I = np.eye(dim_x)
 
 class KalmanFilter(object):
+    # measurements are Cartesian [x, y], polar filters take [range, azimuth, radial velocity]
+    polar = False
 
     def __init__(self, dim_x, dim_z, dim_u=0):
         assert dim_x > 0
@@ -261,7 +264,7 @@ class KalmanFilter(object):
 
 
     def batch_filter(self, zs, Fs=None, Qs=None, Hs=None, Rs=None, Bs=None, us=None, update_first=False):
-        n = np.size(zs,0)
+        n = len(zs)
         if Fs is None:
             Fs = [self.F] * n
         if Qs is None:
@@ -339,13 +342,102 @@ class KalmanFilter(object):
         for k in range(n-2,-1,-1):
             P_pred = dot3(Fs[k+1], P[k], Fs[k+1].T) + Qs[k+1]
 
-            K[k]  = dot3(P[k], Fs[k+1].T, linalg.inv(P_pred))
+            # K = P F' inv(P_pred), solved as P_pred K' = F P since P and P_pred are symmetric
+            K[k]  = linalg.solve(P_pred, dot(Fs[k+1], P[k]), assume_a='pos').T
             x[k] += dot(K[k], x[k+1] - dot(Fs[k+1], x[k]))
             P[k] += dot3(K[k], P[k+1] - P_pred, K[k].T)
 
         return (x, P, K)
 
 
+    def batch_filter_sequences(self, zs, mask=None, x0=None, P0=None, update_first=False):
+        """ Filters many measurement sequences at once, i.e. all tracks of a scenario padded to the same number of
+        steps (see :meth:`track_management.TrackManager.port_data`, "tracks_padded"). The loop runs over time steps
+        only, every step is computed for all sequences by stacked matrix products and solves. Matrices F, Q, H and R
+        of the filter are shared by all sequences, the filter itself is not changed.
+
+        :param zs: measurements of the shape (n_seq, n, dim_z)
+        :param mask: boolean array of the shape (n_seq, n), False marks missing measurements which are only predicted
+        :param x0: initial states of the shape (n_seq, dim_x), the state of the filter is used if None
+        :param P0: initial covariances of the shape (n_seq, dim_x, dim_x) or (dim_x, dim_x), P of the filter if None
+        :param update_first: the update precedes the predict step in each step when True, as in batch_filter
+        :return: means, covariances, predicted means and predicted covariances of the shapes (n_seq, n, dim_x) and
+                 (n_seq, n, dim_x, dim_x)
+        :rtype: tuple of numpy.array
+        """
+        zs = np.asarray(zs, dtype=float).reshape(np.shape(zs)[:2] + (self.dim_z,))
+        n_seq, n = zs.shape[:2]
+        if mask is None:
+            mask = np.ones((n_seq, n), dtype=bool)
+        F, Q, H, R = (np.asarray(M, dtype=float) for M in (self.F, self.Q, self.H, self.R))
+        x = np.broadcast_to(np.ravel(self.x) if x0 is None else np.asarray(x0, dtype=float).reshape(-1, self.dim_x),
+                            (n_seq, self.dim_x)).copy()
+        P = np.broadcast_to(self.P if P0 is None else P0, (n_seq, self.dim_x, self.dim_x)).astype(float)
+
+        means = zeros((n_seq, n, self.dim_x))
+        covariances = zeros((n_seq, n, self.dim_x, self.dim_x))
+        means_p = zeros((n_seq, n, self.dim_x))
+        covariances_p = zeros((n_seq, n, self.dim_x, self.dim_x))
+
+        def predict(x, P):
+            return x @ F.T, self._alpha_sq * (F @ P @ F.T) + Q
+
+        def update(x, P, z, measured):
+            S = H @ P @ H.T + R
+            # K = P H' inv(S), solved as S K' = H P
+            K = np.linalg.solve(S, H @ P).swapaxes(1, 2)
+            I_KH = self.I - K @ H
+            x_new = x + (K @ (z - x @ H.T)[..., np.newaxis])[..., 0]
+            P_new = I_KH @ P @ I_KH.swapaxes(1, 2) + K @ R @ K.swapaxes(1, 2)
+            return np.where(measured[:, np.newaxis], x_new, x), np.where(measured[:, np.newaxis, np.newaxis], P_new, P)
+
+        for i in range(n):
+            if update_first:
+                x, P = update(x, P, zs[:, i], mask[:, i])
+                means[:, i], covariances[:, i] = x, P
+                x, P = predict(x, P)
+                means_p[:, i], covariances_p[:, i] = x, P
+            else:
+                x, P = predict(x, P)
+                means_p[:, i], covariances_p[:, i] = x, P
+                x, P = update(x, P, zs[:, i], mask[:, i])
+                means[:, i], covariances[:, i] = x, P
+
+        return (means, covariances, means_p, covariances_p)
+
+
+    def rts_smoother_sequences(self, Xs, Ps, Fs=None, Qs=None):
+        """ Smooths many sequences filtered by :meth:`tracking_filters.KalmanFilter.batch_filter_sequences` at
+        once. Steps after the last measurement of a padded sequence are pure predictions, they do not change the
+        smoothed states of measured steps.
+
+        :param Xs: means of the shape (n_seq, n, dim_x)
+        :param Ps: covariances of the shape (n_seq, n, dim_x, dim_x)
+        :param Fs: state transition matrix of the shape (dim_x, dim_x) or one per step (n, dim_x, dim_x), F if None
+        :param Qs: process noise of the shape (dim_x, dim_x) or one per step (n, dim_x, dim_x), Q if None
+        :return: smoothed means, smoothed covariances and smoother gains
+        :rtype: tuple of numpy.array
+        """
+        n_seq, n, dim_x = np.shape(Xs)
+        Fs = np.broadcast_to(self.F if Fs is None else Fs, (n, dim_x, dim_x))
+        Qs = np.broadcast_to(self.Q if Qs is None else Qs, (n, dim_x, dim_x))
+
+        # smoother gain
+        K = zeros((n_seq, n, dim_x, dim_x))
+
+        x, P = np.array(Xs, dtype=float), np.array(Ps, dtype=float)
+
+        for k in range(n-2,-1,-1):
+            F = Fs[k+1]
+            P_pred = F @ P[:, k] @ F.T + Qs[k+1]
+
+            K[:, k] = np.linalg.solve(P_pred, F @ P[:, k]).swapaxes(1, 2)
+            x[:, k] += (K[:, k] @ (x[:, k+1] - x[:, k] @ F.T)[..., np.newaxis])[..., 0]
+            P[:, k] += K[:, k] @ (P[:, k+1] - P_pred) @ K[:, k].swapaxes(1, 2)
+
+        return (x, P, K)
+
+
     def get_prediction(self, u=0):
         x = dot(self.F, self.x) + dot(self.B, u)
         P = self._alpha_sq * dot3(self.F, self.P, self.F.T) + self.Q
@@ -376,3 +468,772 @@ class KalmanFilter(object):
         assert value > 0
 
         self._alpha_sq = value**2
+
+
+    def _stack_key(self):
+        # filters of one class with equal keys share parameters and are stacked, see predict_filters
+        return None
+
+
+    @classmethod
+    def predict_stack(cls, filters):
+        """ Predicts filters of many tracks. They are predicted one by one, subclasses with stacked array
+        implementations override it, see :meth:`tracking_filters.predict_filters`.
+        """
+        for kf in filters:
+            kf.predict()
+
+
+    @classmethod
+    def update_stack(cls, filters, zs, sensors=None):
+        """ Updates filters of many tracks, each one by its measurement. They are updated one by one, subclasses
+        with stacked array implementations override it, see :meth:`tracking_filters.update_filters`.
+        """
+        for kf, z in zip(filters, zs):
+            kf.update(z)
+
+
+class WorkspaceKalmanFilter(KalmanFilter):
+
+    def __init__(self, dim_x, dim_z, dim_u=0):
+        """ A KalmanFilter which computes predict and update in place. Every filter owns work buffers allocated
+        once by :meth:`tracking_filters.WorkspaceKalmanFilter.allocate`, products are written into them by out=
+        and shapes are validated only there. The attributes x, P, y, S and K are the buffers themselves, their
+        values change in place by every step, so copy them when they have to be kept.
+
+        Measurements z must be shaped as H x, i.e. (dim_z, 1). S is inverted in a closed form when dim_z is 2.
+        """
+        super().__init__(dim_x, dim_z, dim_u)
+        self._ws = None
+
+    def allocate(self):
+        """ Validates dimensions of x, P, F, Q, H and R by test_matrix_dimensions and allocates work buffers. It
+        is called by the first predict or update, call it again after a matrix is replaced by one of another shape.
+        """
+        dim_x, dim_z = self.dim_x, self.dim_z
+        self.x = np.array(self.x, dtype=float).reshape(dim_x, 1)
+        self.P = np.array(self.P, dtype=float)
+        self.F, self.Q, self.H = (np.array(M, dtype=float) for M in (self.F, self.Q, self.H))
+        self.R = np.array(self.R, dtype=float)
+        self.test_matrix_dimensions()
+
+        self.y = zeros((dim_z, 1))
+        self.S = zeros((dim_z, dim_z))
+        self.K = zeros((dim_x, dim_z))
+        self._ws = {"x": zeros((dim_x, 1)),
+                    "Hx": zeros((dim_z, 1)),
+                    "Ky": zeros((dim_x, 1)),
+                    "PHT": zeros((dim_x, dim_z)),
+                    "KR": zeros((dim_x, dim_z)),
+                    "SI": zeros((dim_z, dim_z)),
+                    "FP": zeros((dim_x, dim_x)),
+                    "I_KH": zeros((dim_x, dim_x)),
+                    "T": zeros((dim_x, dim_x))}
+
+    def predict(self, u=0, B=None, F=None, Q=None):
+        if self._ws is None:
+            self.allocate()
+        ws = self._ws
+        if F is None:
+            F = self.F
+        if Q is None:
+            Q = self.Q
+        elif isscalar(Q):
+            Q = eye(self.dim_x) * Q
+
+        # x = Fx + Bu
+        dot(F, self.x, out=ws["x"])
+        if np.any(u):
+            ws["x"] += dot(self.B if B is None else B, u)
+        self.x[...] = ws["x"]
+
+        # P = FPF' + Q
+        dot(F, self.P, out=ws["FP"])
+        dot(ws["FP"], F.T, out=self.P)
+        if self._alpha_sq != 1.:
+            self.P *= self._alpha_sq
+        self.P += Q
+
+    def update(self, z, R=None, H=None):
+        if z is None:
+            return
+        if self._ws is None:
+            self.allocate()
+        ws = self._ws
+        if R is None:
+            R = self.R
+        elif isscalar(R):
+            R = eye(self.dim_z) * R
+        if H is None:
+            H = self.H
+
+        # y = z - Hx
+        dot(H, self.x, out=ws["Hx"])
+        np.subtract(z, ws["Hx"], out=self.y)
+
+        # S = HPH' + R
+        dot(self.P, H.T, out=ws["PHT"])
+        dot(H, ws["PHT"], out=self.S)
+        self.S += R
+
+        SI = ws["SI"]
+        if self.dim_z == 2:
+            S = self.S
+            det = S[0, 0] * S[1, 1] - S[0, 1] * S[1, 0]
+            SI[0, 0], SI[0, 1], SI[1, 0], SI[1, 1] = S[1, 1] / det, -S[0, 1] / det, -S[1, 0] / det, S[0, 0] / det
+        else:
+            SI[...] = linalg.inv(self.S)
+            det = np.linalg.det(self.S)
+
+        # K = PH'inv(S)
+        dot(ws["PHT"], SI, out=self.K)
+
+        # the same as logpdf(z, Hx, S) of the prior x
+        self.log_likelihood = -0.5 * (dot(self.y.T, dot(SI, self.y)).item() +
+                                      math.log(det) + self.dim_z * math.log(2 * math.pi))
+
+        # x = x + Ky
+        dot(self.K, self.y, out=ws["Ky"])
+        self.x += ws["Ky"]
+
+        # P = (I-KH)P(I-KH)' + KRK'
+        I_KH = ws["I_KH"]
+        dot(self.K, H, out=I_KH)
+        np.subtract(self.I, I_KH, out=I_KH)
+        dot(I_KH, self.P, out=ws["T"])
+        dot(ws["T"], I_KH.T, out=self.P)
+        dot(self.K, R, out=ws["KR"])
+        dot(ws["KR"], self.K.T, out=ws["T"])
+        self.P += ws["T"]
+
+
+def _relative_positions(x, y, sensors):
+    # positions of targets relative to radars mounted at sensors [x, y] in the EGO frame
+    if sensors is None:
+        return x, y
+    sensors = np.asarray(sensors, dtype=float)
+    return x - sensors[..., 0], y - sensors[..., 1]
+
+
+def polar_measurement(xs, sensors=None):
+    """ Measures states [x, dx, y, dy] by the radar: range, azimuth and radial velocity (range-rate). The azimuth
+    is arctan(y/x) as in :class:`data_containers.DetectionPoint`. All three are measured from the mount of the radar,
+    the raw radial velocity of a detection is relative to its radar, see
+    :meth:`data_containers.TrackPoint.get_polar_z_array`.
+
+    :param xs: states of the shape (..., 4)
+    :param sensors: positions [x, y] of radars in the EGO frame broadcastable to the shape (..., 2), the origin of
+                    the EGO frame if None
+    :return: measurements of the shape (..., 3)
+    :rtype: numpy.array
+    """
+    x, dx, y, dy = np.moveaxis(xs, -1, 0)
+    x, y = _relative_positions(x, y, sensors)
+    rng = np.maximum(np.hypot(x, y), 1e-9)
+    return np.stack((rng, np.arctan(y / np.where(x == 0, 1e-9, x)), (x * dx + y * dy) / rng), axis=-1)
+
+
+def polar_jacobian(xs, sensors=None):
+    """ Jacobians of :meth:`tracking_filters.polar_measurement` at states of the shape (n, 4).
+
+    :return: Jacobians of the shape (n, 3, 4)
+    :rtype: numpy.array
+    """
+    x, dx, y, dy = np.moveaxis(np.asarray(xs, dtype=float), -1, 0)
+    x, y = _relative_positions(x, y, sensors)
+    r2 = np.maximum(x ** 2 + y ** 2, 1e-18)
+    r = np.sqrt(r2)
+    rdot = (x * dx + y * dy) / r
+    H = zeros(np.shape(x) + (3, 4))
+    H[..., 0, 0], H[..., 0, 2] = x / r, y / r
+    H[..., 1, 0], H[..., 1, 2] = -y / r2, x / r2
+    H[..., 2, 0], H[..., 2, 1] = dx / r - x * rdot / r2, x / r
+    H[..., 2, 2], H[..., 2, 3] = dy / r - y * rdot / r2, y / r
+    return H
+
+
+def polar_residual(zs, hxs):
+    """ Differences of polar measurements, azimuths are wrapped into [-pi/2, pi/2) as arctan(y/x) is periodic by pi.
+    """
+    ys = np.asarray(zs, dtype=float) - hxs
+    ys[..., 1] = (ys[..., 1] + np.pi / 2) % np.pi - np.pi / 2
+    return ys
+
+
+def ekf_update(xs, Ps, zs, R, sensors=None):
+    """ Updates a stack of extended Kalman filters by polar measurements, all Jacobians, gains and covariances are
+    computed by stacked matrix products and one batched solve.
+
+    :param xs: states of the shape (n, 4)
+    :param Ps: covariances of the shape (n, 4, 4)
+    :param zs: measurements [range, azimuth, radial velocity] of the shape (n, 3)
+    :param R: covariance of measurements of the shape (3, 3) or (n, 3, 3)
+    :param sensors: positions of radars of the shape (2,) or (n, 2), see :meth:`tracking_filters.polar_measurement`
+    :return: updated states, updated covariances, residuals and their covariances S
+    :rtype: tuple of numpy.array
+    """
+    H = polar_jacobian(xs, sensors)
+    ys = polar_residual(zs, polar_measurement(xs, sensors))
+    HT = H.swapaxes(1, 2)
+    S = H @ Ps @ HT + R
+    # K = PH'inv(S), solved as S K' = HP
+    K = np.linalg.solve(S, H @ Ps).swapaxes(1, 2)
+    xs = xs + (K @ ys[..., np.newaxis])[..., 0]
+    I_KH = eye(np.shape(xs)[-1]) - K @ H
+    Ps = I_KH @ Ps @ I_KH.swapaxes(1, 2) + K @ R @ K.swapaxes(1, 2)
+    return xs, Ps, ys, S
+
+
+def merwe_weights(n, alpha=.1, beta=2., kappa=None):
+    """ Weights of means and covariances of the scaled sigma points of Van der Merwe.
+
+    :param n: dimension of the state
+    :param kappa: 3 - n if None
+    :return: weights of means, weights of covariances and the scaling (n + lambda)
+    :rtype: (numpy.array, numpy.array, float)
+    """
+    kappa = 3. - n if kappa is None else kappa
+    lambda_ = alpha ** 2 * (n + kappa) - n
+    Wm = np.full(2 * n + 1, 0.5 / (n + lambda_))
+    Wc = Wm.copy()
+    Wm[0] = lambda_ / (n + lambda_)
+    Wc[0] = Wm[0] + 1. - alpha ** 2 + beta
+    return Wm, Wc, n + lambda_
+
+
+def sigma_points(xs, Ps, scale):
+    """ Scaled sigma points of a stack of states, the centre is the first point.
+
+    :param xs: states of the shape (n, dim_x)
+    :param Ps: covariances of the shape (n, dim_x, dim_x)
+    :param scale: (dim_x + lambda), see :meth:`tracking_filters.merwe_weights`
+    :return: sigma points of the shape (n, 2 * dim_x + 1, dim_x)
+    :rtype: numpy.array
+    """
+    # columns of the Cholesky factor are the offsets of points
+    U = np.linalg.cholesky(scale * Ps).swapaxes(1, 2)
+    return np.concatenate((xs[:, np.newaxis], xs[:, np.newaxis] + U, xs[:, np.newaxis] - U), axis=1)
+
+
+def ukf_update(xs, Ps, zs, R, alpha=.1, beta=2., kappa=None, sensors=None):
+    """ Updates a stack of unscented Kalman filters by polar measurements. Sigma points of all filters are
+    propagated through :meth:`tracking_filters.polar_measurement` at once.
+
+    :param xs: states of the shape (n, 4)
+    :param Ps: covariances of the shape (n, 4, 4)
+    :param zs: measurements [range, azimuth, radial velocity] of the shape (n, 3)
+    :param R: covariance of measurements of the shape (3, 3) or (n, 3, 3)
+    :param alpha: spread of sigma points, see :meth:`tracking_filters.merwe_weights`
+    :param sensors: positions of radars of the shape (2,) or (n, 2), see :meth:`tracking_filters.polar_measurement`
+    :return: updated states, updated covariances, residuals and their covariances S
+    :rtype: tuple of numpy.array
+    """
+    Wm, Wc, scale = merwe_weights(np.shape(xs)[-1], alpha, beta, kappa)
+    sigmas = sigma_points(xs, Ps, scale)
+    Z = polar_measurement(sigmas, None if sensors is None else np.asarray(sensors, dtype=float)[..., np.newaxis, :])
+    # the mean azimuth is averaged from differences to the centre so it does not jump at the wrap
+    z_mean = Z[:, 0] + np.einsum('s,nsk->nk', Wm, polar_residual(Z, Z[:, :1]))
+    dZ = polar_residual(Z, z_mean[:, np.newaxis])
+    dX = sigmas - xs[:, np.newaxis]
+    S = np.einsum('s,nsi,nsj->nij', Wc, dZ, dZ) + R
+    Pxz = np.einsum('s,nsi,nsj->nij', Wc, dX, dZ)
+    # K = Pxz inv(S), solved as S K' = Pxz'
+    K = np.linalg.solve(S, Pxz.swapaxes(1, 2)).swapaxes(1, 2)
+    ys = polar_residual(zs, z_mean)
+    xs = xs + (K @ ys[..., np.newaxis])[..., 0]
+    Ps = Ps - K @ S @ K.swapaxes(1, 2)
+    return xs, Ps, ys, S
+
+
+class ExtendedKalmanFilter(KalmanFilter):
+    """ A KalmanFilter of one track updated by polar measurements [range, azimuth, radial velocity] of the shape
+    (3, 1), see :meth:`tracking_filters.ekf_update`. The prediction is the linear one of KalmanFilter, R is the 3 x 3
+    covariance of polar measurements. The *sensor* of an update is the position [x, y] of the radar in the EGO frame
+    which measured *z*. Filters of all tracks updated in a frame are updated by one call of ekf_update, see
+    :meth:`tracking_filters.update_filters`.
+    """
+    polar = True
+
+    def _update_stack(self, x, P, z, R, sensors=None):
+        return ekf_update(x, P, z, R, sensors)
+
+    def _update_filters(self, filters, zs, Rs, sensors):
+        # self gives parameters of the stacked update shared by all filters, i.e. sigma points of UKF
+        n = len(filters)
+        sensors = None if sensors is None else np.reshape(np.asarray(sensors, dtype=float), (n, 2))
+        x, P, y, S = self._update_stack(np.array([np.ravel(kf.x) for kf in filters], dtype=float),
+                                        np.array([kf.P for kf in filters], dtype=float),
+                                        np.reshape(np.asarray(zs, dtype=float), (n, self.dim_z)), Rs, sensors)
+        H = polar_jacobian(x, sensors)
+        sign, logdet = np.linalg.slogdet(2 * np.pi * S)
+        log_likelihood = -0.5 * (np.einsum('ni,ni->n', y, np.linalg.solve(S, y[..., np.newaxis])[..., 0]) + logdet)
+        for i, kf in enumerate(filters):
+            kf.x = x[i].reshape(np.shape(kf.x))
+            kf.P = P[i]
+            kf.y = y[i].reshape(kf.dim_z, 1)
+            kf.S = S[i]
+            kf.H = H[i]
+            kf.log_likelihood = float(log_likelihood[i])
+
+    @classmethod
+    def update_stack(cls, filters, zs, sensors=None):
+        """ Updates all filters by one stacked update, each filter by its own R and *sensors* of its measurement.
+        """
+        filters[0]._update_filters(filters, zs, np.array([kf.R for kf in filters], dtype=float), sensors)
+
+    def update(self, z, R=None, H=None, sensor=None):
+        if z is None:
+            return
+        if R is None:
+            R = self.R
+        elif isscalar(R):
+            R = eye(self.dim_z) * R
+        self._update_filters([self], [z], np.asarray(R, dtype=float)[np.newaxis],
+                             None if sensor is None else [sensor])
+
+
+class UnscentedKalmanFilter(ExtendedKalmanFilter):
+    """ The same as ExtendedKalmanFilter, the update propagates sigma points instead of a linearization, see
+    :meth:`tracking_filters.ukf_update`. Filters sharing their parameters of sigma points are updated together.
+    """
+
+    def __init__(self, dim_x, dim_z, dim_u=0, alpha=.1, beta=2., kappa=None):
+        super().__init__(dim_x, dim_z, dim_u)
+        self.alpha_sigma, self.beta_sigma, self.kappa_sigma = alpha, beta, kappa
+
+    def _stack_key(self):
+        return (self.alpha_sigma, self.beta_sigma, self.kappa_sigma)
+
+    def _update_stack(self, x, P, z, R, sensors=None):
+        return ukf_update(x, P, z, R, self.alpha_sigma, self.beta_sigma, self.kappa_sigma, sensors)
+
+
+def turn_transition(dt, omega):
+    """ State transition of the state [x, dx, y, dy] by a coordinated turn at the turn rate *omega* in rad/s, the
+    constant velocity model when *omega* is 0.
+    """
+    if abs(omega) < 1e-9:
+        return np.array([[1, dt, 0, 0],
+                         [0, 1, 0, 0],
+                         [0, 0, 1, dt],
+                         [0, 0, 0, 1]], dtype=float)
+    sin_wt, cos_wt = math.sin(omega * dt), math.cos(omega * dt)
+    return np.array([[1, sin_wt / omega, 0, -(1 - cos_wt) / omega],
+                     [0, cos_wt, 0, -sin_wt],
+                     [0, (1 - cos_wt) / omega, 1, sin_wt / omega],
+                     [0, sin_wt, 0, cos_wt]])
+
+
+@functools.lru_cache(maxsize=32)
+def imm_models(dt=50.0e-3, q_var=0.001, turn_rates=(0.0, 0.1, -0.1)):
+    """ Discretized models of an IMM, a coordinated turn for every turn rate and the constant velocity model for the
+    rate 0. Models are cached by their parameters and shared by all filters, the arrays are read-only.
+
+    :param turn_rates: tuple of turn rates in rad/s
+    :return: transitions of the shape (n_models, 4, 4) and process noises of the same shape
+    :rtype: (numpy.array, numpy.array)
+    """
+    Fs = np.array([turn_transition(dt, omega) for omega in turn_rates])
+    q = Q_discrete_white_noise(dim=2, dt=dt, var=q_var)
+    Qs = np.repeat(linalg.block_diag(q, q)[np.newaxis], len(turn_rates), axis=0)
+    Fs.flags.writeable = False
+    Qs.flags.writeable = False
+    return Fs, Qs
+
+
+def imm_predict(xs, Ps, mu, Fs, Qs, transition):
+    """ Mixes the estimates of models and predicts them, all tracks and models at once.
+
+    :param xs: states of models of the shape (n, n_models, dim_x)
+    :param Ps: covariances of the shape (n, n_models, dim_x, dim_x)
+    :param mu: probabilities of models of the shape (n, n_models)
+    :param Fs: transitions of models of the shape (n_models, dim_x, dim_x)
+    :param Qs: process noises of models of the shape (n_models, dim_x, dim_x)
+    :param transition: Markov matrix of switching from the model i (row) to the model j (column)
+    :return: predicted states, covariances and probabilities of models
+    :rtype: tuple of numpy.array
+    """
+    c = mu @ transition
+    # weights of mixing the model i into the model j
+    w = transition[np.newaxis] * mu[:, :, np.newaxis] / c[:, np.newaxis, :]
+    x0 = np.einsum('nij,nid->njd', w, xs)
+    dx = xs[:, :, np.newaxis, :] - x0[:, np.newaxis, :, :]
+    P0 = np.einsum('nij,nide->njde', w, Ps) + np.einsum('nij,nijd,nije->njde', w, dx, dx)
+    xs = np.einsum('mde,nme->nmd', Fs, x0)
+    Ps = Fs @ P0 @ Fs.swapaxes(1, 2) + Qs
+    return xs, Ps, c
+
+
+def imm_update(xs, Ps, mu, zs, H, R):
+    """ Updates every model of every track by linear measurements and updates probabilities of models by their
+    likelihoods.
+
+    :param zs: measurements of the shape (n, dim_z)
+    :return: updated states, covariances, probabilities and log-likelihoods of models of the shape (n, n_models)
+    :rtype: tuple of numpy.array
+    """
+    ys = zs[:, np.newaxis] - xs @ H.T
+    S = H @ Ps @ H.T + R
+    # K = PH'inv(S), solved as S K' = HP
+    K = np.linalg.solve(S, H @ Ps).swapaxes(-1, -2)
+    xs = xs + (K @ ys[..., np.newaxis])[..., 0]
+    I_KH = eye(xs.shape[-1]) - K @ H
+    Ps = I_KH @ Ps @ I_KH.swapaxes(-1, -2) + K @ R @ K.swapaxes(-1, -2)
+    sign, logdet = np.linalg.slogdet(2 * np.pi * S)
+    log_likelihood = -0.5 * (np.einsum('nmi,nmi->nm', ys, np.linalg.solve(S, ys[..., np.newaxis])[..., 0]) + logdet)
+    log_mu = np.log(mu) + log_likelihood
+    log_mu -= log_mu.max(axis=1, keepdims=True)
+    mu = np.exp(log_mu)
+    return xs, Ps, mu / mu.sum(axis=1, keepdims=True), log_likelihood
+
+
+def imm_combine(xs, Ps, mu):
+    """ Combines estimates of models into one estimate per track by their probabilities.
+
+    :return: states of the shape (n, dim_x) and covariances of the shape (n, dim_x, dim_x)
+    :rtype: (numpy.array, numpy.array)
+    """
+    x = np.einsum('nm,nmd->nd', mu, xs)
+    dx = xs - x[:, np.newaxis]
+    P = np.einsum('nm,nmde->nde', mu, Ps + dx[..., :, np.newaxis] * dx[..., np.newaxis, :])
+    return x, P
+
+
+def coordinated_turn_derivative(xs, t=0.):
+    """ Derivative of states [x, dx, y, dy, omega] of the nonlinear coordinated turn with the turn rate omega in the
+    state, for states of the shape (N, 5).
+    """
+    dx, dy, omega = xs[:, 1], xs[:, 3], xs[:, 4]
+    return np.stack((dx, -omega * dy, dy, omega * dx, np.zeros_like(omega)), axis=1)
+
+
+def propagate_states(xs, f, dt, t=0., n_steps=1):
+    """ Propagates states of all tracks through a nonlinear motion model by :meth:`utils.runge_kutta4_batch`.
+
+    :param xs: states of the shape (N, dim_x)
+    :param f: vectorized derivative f(xs, t), i.e. :meth:`tracking_filters.coordinated_turn_derivative`
+    :param n_steps: number of RK4 sub-steps within dt
+    :return: states of the shape (N, dim_x)
+    """
+    return runge_kutta4_batch(xs, t, dt, f, n_steps=n_steps)
+
+
+def predict_nonlinear(xs, Ps, f, dt, Q, t=0., n_steps=1, eps=1e-6):
+    """ The EKF prediction of all tracks through a nonlinear motion model. Transition Jacobians are central
+    differences of the propagation, the states and their 2 * dim_x perturbations are integrated by one batched RK4
+    call, so the cost is a few array operations regardless of the number of tracks.
+
+    :param xs: states of the shape (N, dim_x)
+    :param Ps: covariances of the shape (N, dim_x, dim_x)
+    :param f: vectorized derivative f(xs, t)
+    :param Q: process noise of the shape (dim_x, dim_x) or (N, dim_x, dim_x)
+    :param eps: step of the differences
+    :return: predicted states, predicted covariances and transition Jacobians of the shape (N, dim_x, dim_x)
+    :rtype: tuple of numpy.array
+    """
+    xs = np.asarray(xs, dtype=float)
+    n, dim_x = xs.shape
+    delta = eye(dim_x) * eps
+    points = np.concatenate((xs[:, np.newaxis], xs[:, np.newaxis] + delta, xs[:, np.newaxis] - delta), axis=1)
+    propagated = propagate_states(points.reshape(-1, dim_x), f, dt, t, n_steps).reshape(n, 2 * dim_x + 1, dim_x)
+    # columns of the Jacobian are derivatives by components of the state
+    Fs = ((propagated[:, 1:dim_x + 1] - propagated[:, dim_x + 1:]) / (2 * eps)).swapaxes(1, 2)
+    Ps = Fs @ Ps @ Fs.swapaxes(1, 2) + Q
+    return propagated[:, 0], Ps, Fs
+
+
+class CoordinatedTurnFilter(KalmanFilter):
+
+    def __init__(self, dim_x, dim_z, dim_u=0):
+        """ A KalmanFilter of one track moving by the nonlinear coordinated turn, the turn rate omega is estimated
+        as the fifth component of the state [x, dx, y, dy, omega]. Measurements are [x, y]. The prediction
+        integrates :meth:`tracking_filters.coordinated_turn_derivative` by RK4 and linearizes it by differences, see
+        :meth:`tracking_filters.predict_nonlinear`, filters of all live tracks of a frame are predicted by one call.
+        The filter is set up by :meth:`tracking_filters.CoordinatedTurnFilter.set_turn_model`.
+        """
+        super().__init__(dim_x, dim_z, dim_u)
+        self.dt = 50.0e-3
+        self.n_steps = 1
+
+    def set_turn_model(self, dt=50.0e-3, omega_var=0.1, omega_q_var=0.01, n_steps=1):
+        """ Extends the constant velocity filter of the state [x, dx, y, dy] by the turn rate, which starts at 0.
+
+        :param dt: sampling period
+        :param omega_var: initial variance of the turn rate in rad^2/s^2
+        :param omega_q_var: variance of the process noise of the turn rate per second
+        :param n_steps: number of RK4 sub-steps within dt
+        """
+        self.dt, self.n_steps = dt, n_steps
+        self.x = np.vstack((np.reshape(self.x, (self.dim_x, 1)), [[0.]]))
+        self.P = linalg.block_diag(self.P, omega_var)
+        self.Q = linalg.block_diag(self.Q, omega_q_var * dt)
+        self.F = linalg.block_diag(self.F, 1.)
+        self.H = np.hstack((self.H, zeros((self.dim_z, 1))))
+        self.dim_x += 1
+        self.I = np.eye(self.dim_x)
+
+    def _stack_key(self):
+        return (self.dt, self.n_steps)
+
+    @classmethod
+    def predict_stack(cls, filters):
+        """ Predicts all filters by one call of :meth:`tracking_filters.predict_nonlinear`, F of every filter is
+        set to the Jacobian of its transition.
+        """
+        xs, Ps, Fs = predict_nonlinear(np.array([np.ravel(kf.x) for kf in filters]),
+                                       np.array([kf.P for kf in filters]), coordinated_turn_derivative,
+                                       filters[0].dt, np.array([kf.Q for kf in filters]),
+                                       n_steps=filters[0].n_steps)
+        for i, kf in enumerate(filters):
+            kf.x = xs[i].reshape(kf.dim_x, 1)
+            kf.P = Ps[i]
+            kf.F = Fs[i]
+
+    def predict(self, u=0, B=None, F=None, Q=None):
+        self.predict_stack([self])
+
+
+class IMMFilter(KalmanFilter):
+
+    def __init__(self, dim_x, dim_z, dim_u=0):
+        """ An interacting multiple model filter of one track with linear measurements, see
+        :meth:`tracking_filters.imm_predict` and :meth:`tracking_filters.imm_update`. Models are set by
+        :meth:`tracking_filters.IMMFilter.set_models`. The attributes x and P hold the combined estimate, y and S the
+        residual and its covariance of the combined prediction, so the filter replaces a KalmanFilter of a track.
+        Filters of all tracks of a frame sharing their models are predicted and updated as one stack of models x
+        tracks by :meth:`tracking_filters.predict_filters` and :meth:`tracking_filters.update_filters`.
+        """
+        super().__init__(dim_x, dim_z, dim_u)
+        self.xs = None
+        self.Ps = None
+        self.mu = None
+        self.transition = None
+        self._models = None
+        self._model_params = None
+
+    def set_models(self, dt=50.0e-3, q_var=0.001, turn_rates=(0.0, 0.1, -0.1), p_stay=0.95):
+        """ Sets models of the filter, see :meth:`tracking_filters.imm_models`.
+
+        :param p_stay: probability that a model stays active for the next step
+        """
+        self._model_params = (dt, q_var, tuple(turn_rates))
+        self._models = imm_models(*self._model_params)
+        n_models = len(turn_rates)
+        p_stay = p_stay if n_models > 1 else 1.
+        self.transition = np.full((n_models, n_models), (1. - p_stay) / max(n_models - 1, 1))
+        np.fill_diagonal(self.transition, p_stay)
+        self.mu = np.full(n_models, 1. / n_models)
+        self.xs = None
+
+    def _init_models(self):
+        # models start from the estimate set by x and P
+        n_models = len(self.mu)
+        self.xs = np.tile(np.ravel(self.x), (n_models, 1)).astype(float)
+        self.Ps = np.tile(self.P, (n_models, 1, 1)).astype(float)
+
+    def _stack_key(self):
+        return (self._model_params, self.transition.tobytes(), np.asarray(self.H, dtype=float).tobytes(),
+                np.asarray(self.R, dtype=float).tobytes())
+
+    @staticmethod
+    def _stack_models(filters):
+        for kf in filters:
+            if kf.xs is None:
+                kf._init_models()
+        return (np.array([kf.xs for kf in filters]), np.array([kf.Ps for kf in filters]),
+                np.array([kf.mu for kf in filters]))
+
+    @staticmethod
+    def _scatter_models(filters, xs, Ps, mu):
+        x, P = imm_combine(xs, Ps, mu)
+        for n, kf in enumerate(filters):
+            kf.xs, kf.Ps, kf.mu = xs[n], Ps[n], mu[n]
+            kf.x = x[n].reshape(np.shape(kf.x))
+            kf.P = P[n]
+
+    @classmethod
+    def predict_stack(cls, filters):
+        """ Mixes and predicts models of all filters by one call of :meth:`tracking_filters.imm_predict`, the
+        filters have to share their models.
+        """
+        Fs, Qs = filters[0]._models
+        xs, Ps, mu = imm_predict(*cls._stack_models(filters), Fs, Qs, filters[0].transition)
+        cls._scatter_models(filters, xs, Ps, mu)
+
+    @classmethod
+    def update_stack(cls, filters, zs, sensors=None):
+        """ Updates models of all filters by one call of :meth:`tracking_filters.imm_update`, the filters have to
+        share their models, H and R.
+        """
+        cls._update_models(filters, zs, filters[0].H, filters[0].R)
+
+    @classmethod
+    def _update_models(cls, filters, zs, H, R):
+        n, dim_z = len(filters), filters[0].dim_z
+        zs = np.reshape(np.asarray(zs, dtype=float), (n, dim_z))
+        xs, Ps, mu_prior = cls._stack_models(filters)
+        # residuals of the combined prediction
+        x = np.array([np.ravel(kf.x) for kf in filters])
+        P = np.array([kf.P for kf in filters])
+        ys = zs - x @ H.T
+        S = H @ P @ H.T + R
+        xs, Ps, mu, log_likelihood = imm_update(xs, Ps, mu_prior, zs, H, R)
+        # likelihood of the mixture of models
+        ll_max = log_likelihood.max(axis=1)
+        mixture = np.log(np.einsum('nm,nm->n', mu_prior, np.exp(log_likelihood - ll_max[:, np.newaxis]))) + ll_max
+        for i, kf in enumerate(filters):
+            kf.y = ys[i].reshape(dim_z, 1)
+            kf.S = S[i]
+            kf.log_likelihood = float(mixture[i])
+        cls._scatter_models(filters, xs, Ps, mu)
+
+    def predict(self, u=0, B=None, F=None, Q=None):
+        self.predict_stack([self])
+
+    def update(self, z, R=None, H=None):
+        if z is None:
+            return
+        if R is None:
+            R = self.R
+        elif isscalar(R):
+            R = eye(self.dim_z) * R
+        if H is None:
+            H = self.H
+        self._update_models([self], [z], H, R)
+
+
+def _filter_stacks(filters):
+    # indices of filters of the same class and stack key, in the order of their first filters
+    stacks = {}
+    for n, kf in enumerate(filters):
+        stacks.setdefault((type(kf), kf._stack_key()), []).append(n)
+    return stacks.items()
+
+
+def predict_filters(filters):
+    """ Predicts filters of all live tracks of a frame. Filters of the same class sharing their parameters are
+    predicted by one call of the predict_stack of their class, i.e. models x tracks of all IMM filters at once, see
+    :meth:`tracking_filters.IMMFilter.predict_stack`.
+
+    :param filters: list of filters
+    """
+    for (cls, key), stack in _filter_stacks(filters):
+        cls.predict_stack([filters[n] for n in stack])
+
+
+def update_filters(filters, zs, sensors=None):
+    """ Updates filters of all tracks updated in a frame, each one by its measurement. Filters of the same class
+    sharing their parameters are updated by one call of the update_stack of their class, see
+    :meth:`tracking_filters.predict_filters`.
+
+    :param filters: list of filters
+    :param zs: list of measurements of filters
+    :param sensors: list of positions [x, y] of radars which measured zs, used by polar filters
+    """
+    for (cls, key), stack in _filter_stacks(filters):
+        cls.update_stack([filters[n] for n in stack], [zs[n] for n in stack],
+                         None if sensors is None else [sensors[n] for n in stack])
+
+
+class InformationFilter(KalmanFilter):
+    """ A KalmanFilter whose update is computed in the information form. Measurements of several sensors taken in
+    the same MCC are fused by :meth:`tracking_filters.InformationFilter.update_multiple`, which adds information
+    contributions H' inv(R) H and H' inv(R) z of all of them to the information of the prediction at once. The
+    prediction and the attributes x and P stay in the covariance form, so the filter replaces a KalmanFilter of a
+    track.
+    """
+
+    @property
+    def information_matrix(self):
+        return linalg.inv(self.P)
+
+    @property
+    def information_vector(self):
+        return linalg.solve(self.P, self.x)
+
+    def update(self, z, R=None, H=None):
+        if z is None:
+            return
+        self.update_multiple([z], None if R is None else [R], None if H is None else [H])
+
+    def update_multiple(self, zs, Rs=None, Hs=None):
+        """ Fuses measurements of several sensors into the state.
+
+        :param zs: list of measurements, each of the shape (dim_z, 1)
+        :param Rs: list of covariances of measurements, R of the filter is used for all of them if None
+        :param Hs: list of measurement functions, H of the filter is used for all of them if None
+        """
+        n = len(zs)
+        if not n:
+            return
+        zs = np.reshape(np.asarray(zs, dtype=float), (n, self.dim_z, 1))
+        Rs = np.broadcast_to(self.R if Rs is None else [eye(self.dim_z) * R if isscalar(R) else R for R in Rs],
+                             (n, self.dim_z, self.dim_z))
+        Hs = np.broadcast_to(self.H if Hs is None else Hs, (n, self.dim_z, self.dim_x))
+        x = np.reshape(self.x, (self.dim_x, 1))
+        HT = Hs.swapaxes(1, 2)
+
+        # residuals of every measurement against the common prediction, kept for consistency checks
+        self.ys = zs - Hs @ x
+        self.Ss = Hs @ self.P @ HT + Rs
+        self.y, self.S = self.ys[-1], self.Ss[-1]
+        sign, logdet = np.linalg.slogdet(2 * np.pi * self.Ss)
+        self.log_likelihood = float(np.sum(-0.5 * (np.einsum('nij,nij->n', self.ys,
+                                                             np.linalg.solve(self.Ss, self.ys)) + logdet)))
+
+        # information contributions H' inv(R) H and H' inv(R) z of all measurements
+        HT_RI = np.linalg.solve(Rs, Hs).swapaxes(1, 2)
+        Y = linalg.inv(self.P) + np.sum(HT_RI @ Hs, axis=0)
+        info = linalg.solve(self.P, x, assume_a='pos') + np.sum(HT_RI @ zs, axis=0)
+        self.P = linalg.inv(Y)
+        self.P = (self.P + self.P.T) / 2
+        self.x = dot(self.P, info).reshape(np.shape(self.x))
+
+
+# Filters which can be requested by the filter_type of a tracker, see constant_velocity_filter
+FILTER_TYPES = {"kalman_filter": KalmanFilter,
+                "workspace_kalman_filter": WorkspaceKalmanFilter,
+                "extended_kalman_filter": ExtendedKalmanFilter,
+                "unscented_kalman_filter": UnscentedKalmanFilter,
+                "imm": IMMFilter,
+                "coordinated_turn": CoordinatedTurnFilter,
+                "information_filter": InformationFilter}
+
+
+def constant_velocity_filter(dt=50.0e-3, q_var=0.001, r_x=0.2, r_y=0.1, x=None, P=None, filter_type='kalman_filter',
+                             r_polar=(0.04, 3.0e-4, 0.01)):
+    """ Creates the Kalman filter of a track with the state [x, dx, y, dy] and measurements [x, y], or polar
+    measurements [range, azimuth, radial velocity] when the filter type is polar. The coordinated turn extends the
+    state by the turn rate.
+
+    :param dt: sampling period
+    :param q_var: variance of the process noise, see :meth:`utils.Q_discrete_white_noise`
+    :param r_x: variance of measurements of x in m^2
+    :param r_y: variance of measurements of y in m^2
+    :param x: initial state, zeros if None
+    :param P: initial covariance, 5 * I if None
+    :param filter_type: a key of FILTER_TYPES
+    :param r_polar: variances of polar measurements of range in m^2, azimuth in rad^2 and radial velocity in m^2/s^2
+    :rtype: KalmanFilter
+    """
+    if filter_type not in FILTER_TYPES:
+        raise ValueError("Unknown filter_type %s, one of %s is expected" % (filter_type, ', '.join(FILTER_TYPES)))
+    polar = FILTER_TYPES[filter_type].polar
+    kf = FILTER_TYPES[filter_type](dim_x=4, dim_z=3 if polar else 2)
+    kf.F = np.array([[1, dt, 0, 0],
+                     [0, 1, 0, 0],
+                     [0, 0, 1, dt],
+                     [0, 0, 0, 1]])
+    q = Q_discrete_white_noise(dim=2, dt=dt, var=q_var)
+    kf.Q = linalg.block_diag(q, q)
+    if x is not None:
+        kf.x = x
+    kf.P = np.eye(4) * 5.0 if P is None else P
+    kf.H = np.array([[1, 0, 0, 0],
+                     [0, 0, 1, 0]])
+    kf.R = np.diag(r_polar) if polar else np.array([[r_x, 0], [0, r_y]])
+    if isinstance(kf, IMMFilter):
+        kf.set_models(dt, q_var)
+    if isinstance(kf, CoordinatedTurnFilter):
+        kf.set_turn_model(dt)
+    return kf
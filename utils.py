@@ -22,6 +22,30 @@ def runge_kutta4(y, x, dx, f):
     return y + (k1 + 2*k2 + 2*k3 + k4) / 6.
 
 
+def runge_kutta4_batch(ys, x, dx, f, n_steps=1, args=()):
+    """ Advances many states at once by the classical Runge-Kutta method. Unlike runge_kutta4 the derivative is
+    evaluated for all states by one call, the interval *dx* is divided into *n_steps* fixed sub-steps.
+
+    :param ys: states of the shape (N, dim_x)
+    :param x: the independent variable (time) at the start
+    :param dx: length of the interval
+    :param f: vectorized derivative f(ys, x, *args) returning an array of the shape of ys
+    :param n_steps: number of sub-steps
+    :param args: tuple of additional arguments of f, i.e. per-state parameters of the shape (N, ...)
+    :return: states at x + dx
+    """
+    ys = asarray(ys, dtype=float)
+    h = dx / n_steps
+    for step in range(n_steps):
+        x_step = x + step * h
+        k1 = h * f(ys, x_step, *args)
+        k2 = h * f(ys + 0.5*k1, x_step + 0.5*h, *args)
+        k3 = h * f(ys + 0.5*k2, x_step + 0.5*h, *args)
+        k4 = h * f(ys + k3, x_step + h, *args)
+        ys = ys + (k1 + 2*k2 + 2*k3 + k4) / 6.
+    return ys
+
+
 def setter(value, dim_x, dim_y):
     v = array(value, dtype=float)
     if v.shape != (dim_x, dim_y):